@@ -0,0 +1,369 @@
+# api_server.py
+"""
+Async HTTP JSON API over the headless RecommendationEngine (no Streamlit).
+
+    python api_server.py --port 8080 --workers 8
+    python api_server.py --port 8080 --processes 4     # shared read-only catalog snapshot
+
+Requests are accepted on an asyncio loop (HTTP/1.1 keep-alive, Content-Length
+bodies) and engine calls run on a dedicated thread pool, so slow LLM calls don't
+block other connections. When more than --max-inflight calls are pending the
+server answers 503 instead of queueing without bound.
+
+Requests are appended to the query log (warmup.QUERY_LOG_PATH) and, unless
+--no-warmup is given, each worker replays the most frequent recent ones in the
+background at start-up so the first users after a deploy hit warm caches.
+
+Routes (POST bodies are JSON):
+    GET  /healthz
+    POST /v1/parse         {"query"}
+    POST /v1/destinations  {"user_id" | "profile", "query" | "parsed", "limit"}
+    POST /v1/hotels        {... same, "past_trips"}
+    POST /v1/flights       {"from", "to", "max_price", "max_stops", "limit"}
+    POST /v1/trains        {"from", "to", "seat_class", "max_price", "limit"}
+    POST /v1/pois          {"query", "destination_id", "limit"}
+    POST /v1/journeys      {"from", "to", "depart_after", "max_price", "max_transfers", "modes", "limit"}
+    POST /v1/explore       {... user, "destination_id" | "query" | "parsed"}
+    POST /v1/bundle        {... user, "query" | "parsed", "deadline_s"}
+    POST /v1/events        {"event", "user_id", "item_id"}   (queued; 202-style {"accepted"})
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from engine import RecommendationEngine, BUNDLE_DEADLINE_S
+from shared_catalog import attach_snapshot, publish_snapshot
+from events import EventSink
+from warmup import CacheWarmer, log_query
+
+MAX_BODY_BYTES = 1 << 20
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_INFLIGHT = 64
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _strip_pois(pois):
+    # travel_to rows are per-destination matrices; not useful to API clients
+    return [{k: v for k, v in p.items() if k != "travel_to"} for p in pois or []]
+
+
+def _strip_itinerary(it):
+    if not it:
+        return it
+    days = []
+    for day in it.get("days", []):
+        d = dict(day)
+        for slot in ["morning", "afternoon", "evening"]:
+            if slot in d:
+                d[slot] = _strip_pois(d[slot])
+        days.append(d)
+    return dict(it, days=days)
+
+
+class RecommendationAPI:
+    """Maps JSON request bodies to engine calls; every handler runs on a worker thread."""
+
+    def __init__(self, engine: RecommendationEngine, events: Optional[EventSink] = None):
+        self.engine = engine
+        # stored events feed the engine's live popularity
+        self.events = engine.attach_event_sink(events or EventSink()).start()
+        self.routes = {
+            "/v1/parse": self.parse,
+            "/v1/destinations": self.destinations,
+            "/v1/hotels": self.hotels,
+            "/v1/flights": self.flights,
+            "/v1/trains": self.trains,
+            "/v1/journeys": self.journeys,
+            "/v1/pois": self.pois,
+            "/v1/explore": self.explore,
+            "/v1/bundle": self.bundle,
+            "/v1/events": self.event,
+        }
+
+    # request helpers
+    def _user(self, body):
+        """(user_id, profile, past_trips) from a known user_id or an inline profile."""
+        user_id = body.get("user_id")
+        if user_id:
+            user = self.engine.user_map.get(user_id)
+            if not user:
+                raise ApiError(404, f"unknown user_id: {user_id}")
+            return user_id, body.get("profile") or user["profile"], body.get("past_trips")
+        profile = body.get("profile")
+        if not isinstance(profile, dict):
+            raise ApiError(400, "user_id or profile is required")
+        past_trips = body.get("past_trips") or []
+        # stable id for anonymous profiles so the explore memo can still be shared
+        anon = hashlib.sha1(json.dumps([profile, past_trips], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return f"anon_{anon}", profile, past_trips
+
+    def _parsed(self, body):
+        if isinstance(body.get("parsed"), dict):
+            return body["parsed"]
+        return self.engine.parse_search(body.get("query") or "")
+
+    def _log(self, body, user_id=None, dest_id=None):
+        # inline (anon_*) profiles can't be replayed at warm-up, their queries still can
+        log_query(body.get("query"), None if (user_id or "").startswith("anon_") else user_id, dest_id)
+
+    def _limit(self, body, default):
+        try:
+            return max(1, min(int(body.get("limit", default)), 200))
+        except (TypeError, ValueError):
+            raise ApiError(400, "limit must be an integer")
+
+    # handlers
+    def parse(self, body):
+        if not body.get("query"):
+            raise ApiError(400, "query is required")
+        self._log(body)
+        return {"parsed": self.engine.parse_search(body["query"])}
+
+    def destinations(self, body):
+        user_id, profile, _ = self._user(body)
+        parsed = self._parsed(body)
+        self._log(body, user_id, parsed.get("destination_id"))
+        return {"parsed": parsed, "destinations": self.engine.destination_recommendations(profile, parsed, limit=self._limit(body, 6))}
+
+    def hotels(self, body):
+        user_id, profile, past_trips = self._user(body)
+        parsed = self._parsed(body)
+        self._log(body, user_id, parsed.get("destination_id"))
+        res = self.engine.hotel_recommendations(profile, parsed, limit=self._limit(body, 6), user_id=user_id, past_trips=past_trips)
+        return {"parsed": parsed, "hotels": res}
+
+    def flights(self, body):
+        filters = {k: body.get(k) for k in ("from", "to", "max_price", "max_stops")}
+        return {"flights": self.engine.filter_flights(filters)[:self._limit(body, 20)]}
+
+    def trains(self, body):
+        filters = {k: body.get(k) for k in ("from", "to", "seat_class", "max_price")}
+        return {"trains": self.engine.filter_trains(filters)[:self._limit(body, 20)]}
+
+    def pois(self, body):
+        if not body.get("query"):
+            raise ApiError(400, "'query' is required")
+        dest_id = body.get("destination_id")
+        if dest_id is not None and dest_id not in self.engine.catalog.dest_map:
+            raise ApiError(404, f"unknown destination_id {dest_id!r}")
+        return {"pois": self.engine.search_pois(body["query"], dest_id=dest_id, limit=self._limit(body, 10))}
+
+    def journeys(self, body):
+        if not body.get("from") or not body.get("to"):
+            raise ApiError(400, "'from' and 'to' are required")
+        filters = {k: body.get(k) for k in ("from", "to", "depart_after", "max_price", "max_transfers", "modes")}
+        filters["limit"] = self._limit(body, 10)
+        return {"journeys": self.engine.search_journeys(filters)}
+
+    def explore(self, body):
+        user_id, profile, past_trips = self._user(body)
+        parsed = self._parsed(body)
+        dest_id = body.get("destination_id") or parsed.get("destination_id")
+        if not dest_id:
+            raise ApiError(400, "destination_id is required (directly or via query)")
+        self._log(body, user_id, dest_id)
+        view = self.engine.build_explore_view(dest_id, profile, parsed, user_id, past_trips=past_trips)
+        if view is None:
+            raise ApiError(404, f"unknown destination_id: {dest_id}")
+        view = dict(view, pois=_strip_pois(view["pois"]), itinerary=_strip_itinerary(view["itinerary"]))
+        return {"parsed": parsed, "explore": view}
+
+    def bundle(self, body):
+        user_id, profile, past_trips = self._user(body)
+        parsed = self._parsed(body)
+        try:
+            deadline_s = float(body.get("deadline_s", BUNDLE_DEADLINE_S))
+        except (TypeError, ValueError):
+            raise ApiError(400, "deadline_s must be a number")
+        b = self.engine.build_itinerary_bundle(profile, parsed, user_id, deadline_s=deadline_s, past_trips=past_trips)
+        if b is None:
+            raise ApiError(404, "no destination found for this request")
+        self._log(body, user_id, b["destination"]["id"])
+        b = dict(b, itineraries={pace: _strip_itinerary(it) for pace, it in b["itineraries"].items()})
+        return {"parsed": parsed, "bundle": b}
+
+    def event(self, body):
+        if not isinstance(body.get("event"), str) or not body["event"]:
+            raise ApiError(400, "'event' is required")
+        # only enqueued here; False when the writer is behind and the buffer is full
+        return {"accepted": self.events.emit(body["event"], body.get("user_id"), body.get("item_id"))}
+
+
+class AsyncJSONServer:
+    def __init__(self, api: RecommendationAPI, workers: int = DEFAULT_WORKERS, max_inflight: int = DEFAULT_MAX_INFLIGHT):
+        self.api = api
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="travel-reco-api")
+        self.max_inflight = max_inflight
+        self._inflight = 0
+
+    async def _dispatch(self, method, path, raw):
+        if path == "/healthz":
+            return 200, {"status": "ok", "pid": os.getpid(), "catalog_version": self.api.engine.catalog.version}
+        handler = self.api.routes.get(path)
+        if handler is None:
+            return 404, {"error": f"no route for {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            return 400, {"error": "body is not valid JSON"}
+        if not isinstance(body, dict):
+            return 400, {"error": "body must be a JSON object"}
+        if self._inflight >= self.max_inflight:
+            return 503, {"error": "server busy"}
+        self._inflight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(self.pool, handler, body)
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self._inflight -= 1
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # the body can't be skipped reliably, so the connection ends after the reply
+                    status, payload = 400, {"error": "invalid Content-Length"}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "body too large"}
+                    keep_alive = False
+                else:
+                    raw = await reader.readexactly(length) if length else b""
+                    status, payload = await self._dispatch(method.upper(), target.split("?")[0], raw)
+                    conn = headers.get("connection", "").lower()
+                    keep_alive = conn == "keep-alive" if version == "HTTP/1.0" else conn != "close"
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                              f"Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, ready: Optional[threading.Event] = None, reuse_port: bool = False):
+        server = await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port or None)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+
+def serve(host="127.0.0.1", port=8080, workers=DEFAULT_WORKERS, max_inflight=DEFAULT_MAX_INFLIGHT,
+          engine: Optional[RecommendationEngine] = None, warmup: bool = True):
+    engine = engine or RecommendationEngine.from_mock_data()
+    if warmup:
+        CacheWarmer(engine).start()
+    server = AsyncJSONServer(RecommendationAPI(engine), workers=workers, max_inflight=max_inflight)
+    asyncio.run(server.serve(host, port))
+
+
+def _serve_worker(snapshot, host, port, workers, max_inflight, warmup=True):
+    catalog, users = attach_snapshot(snapshot)
+    engine = RecommendationEngine(catalog, users)
+    if warmup:
+        CacheWarmer(engine).start()
+    server = AsyncJSONServer(RecommendationAPI(engine), workers=workers, max_inflight=max_inflight)
+    asyncio.run(server.serve(host, port, reuse_port=True))
+
+
+def serve_processes(processes, host="127.0.0.1", port=8080, workers=DEFAULT_WORKERS, max_inflight=DEFAULT_MAX_INFLIGHT,
+                    seed=42, snapshot_path=None, warmup=True):
+    """
+    Build the catalog once, publish it as a read-only snapshot (shared memory, or
+    snapshot_path if given) and run `processes` workers that attach to it and
+    share host:port via SO_REUSEPORT. Workers rebuild records and indexes from
+    the snapshot; only POI travel matrices stay shared (see shared_catalog).
+    """
+    engine = RecommendationEngine.from_mock_data(seed)
+    snap = publish_snapshot(engine.catalog, engine.users, path=snapshot_path)
+    source = snapshot_path or snap.name
+    del engine
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_serve_worker, args=(source, host, port, workers, max_inflight, warmup),
+                         name=f"travel-reco-api-{i}", daemon=True) for i in range(processes)]
+    for p in procs:
+        p.start()
+    # run the cleanup below on SIGTERM too, so the shared memory block isn't leaked
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        if not snapshot_path:
+            snap.close()
+            snap.unlink()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Travel-reco recommendation API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--processes", type=int, default=1, help="worker processes sharing one catalog snapshot")
+    ap.add_argument("--snapshot-path", default=None, help="publish the snapshot to this file instead of shared memory")
+    ap.add_argument("--no-warmup", dest="warmup", action="store_false", help="don't replay recent queries at start-up")
+    args = ap.parse_args()
+    print(f"serving on http://{args.host}:{args.port}")
+    if args.processes > 1:
+        serve_processes(args.processes, args.host, args.port, args.workers, args.max_inflight, args.seed, args.snapshot_path,
+                        warmup=args.warmup)
+        return
+    serve(args.host, args.port, args.workers, args.max_inflight, RecommendationEngine.from_mock_data(args.seed), warmup=args.warmup)
+
+
+if __name__ == "__main__":
+    main()
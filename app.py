@@ -2,9 +2,6 @@
 
 import streamlit as st
 import streamlit.components.v1 as components
-import random
-import json
-import time
 import re
 import urllib.parse
 import html as _html
@@ -12,13 +9,22 @@ from datetime import date, timedelta
 from dateutil import parser as dateparser
 
 from scorer import score_item
-from gemini_wrapper import explain_with_gemini, parse_search_with_gemini, choose_hotel_with_gemini, USE_GEMINI
-from itinerary import generate_itinerary
-from pois_real import get_pois_map   # keep the same external files you had
+from gemini_wrapper import explain_with_gemini, parse_search_with_gemini, USE_GEMINI
+from prompts import ITINERARY_FIELDS
+from engine import RecommendationEngine, format_rupee, _normalize_max_price
+from poi_index import NEARBY_MINUTES
+from tracing import start_run, finish_run, span, TRACE_ENABLED
+import metrics
+from metrics import CACHE_REQUESTS, CACHE_EVICTIONS
+from warmup import CacheWarmer, log_query
+from events import EventSink
 
 # page config
 st.set_page_config(page_title="Travel Reco — Fixed Parser", layout="wide")
 
+# per-rerun stage timings (on when TRAVEL_RECO_TRACE is set or the parser debug panel is open)
+run_trace = start_run("rerun", enabled=TRACE_ENABLED or bool(st.session_state.get("parser_debug")))
+
 # --------------------------- CSS ---------------------------
 APP_CSS = """
 <style>
@@ -51,15 +57,6 @@ st.markdown(APP_CSS, unsafe_allow_html=True)
 PALETTE = ["#ea1e63", "#131314", "#e8e4f2", "#f6a4c8", "#ca356c", "#fdd5ed", "#86838b", "#dc6a96"]
 
 
-def format_rupee(amt):
-    try:
-        return f"₹{int(amt):,}"
-    except Exception:
-        try:
-            return f"₹{float(amt):,}"
-        except Exception:
-            return f"₹{amt}"
-
 
 def make_svg_thumbnail(text, bg_color="#e8e4f2", fg_color="#131314", w=320, h=180):
     label = "".join([p[0] for p in text.split()][:2]).upper()
@@ -168,336 +165,68 @@ def render_parsed_summary(parsed, dest_map):
         return None
     return " · ".join(parts)
 
-# --------------------------- Mock data generation (unchanged) ---------------------------
-@st.cache_data
-def generate_mock_data(seed=42):
-    random.seed(seed)
-    city_list = [
-        "Mumbai","Delhi","Bengaluru","Chennai","Kolkata","Goa","Jaipur","Udaipur","Agra","Varanasi",
-        "Amritsar","Lucknow","Shimla","Manali","Srinagar","Leh","Munnar","Kochi","Pune","Hyderabad"
-    ]
-    destinations = []
-    for i, city in enumerate(city_list):
-        destinations.append({
-            "id": f"dest_{i}",
-            "name": city,
-            "avg_price": random.randint(4000,15000),
-            "tags": random.sample(["beach","culture","mountains","adventure","nature","relax","city","heritage","shopping","spiritual"], 2),
-            "seasonality": round(random.uniform(0.4,1.0),2)
-        })
-
-    hotels=[]
-    for i in range(30):
-        dest = random.choice(destinations)
-        price = random.randint(500,10000)
-        rating = round(random.uniform(2.0,4.9),1)
-        hotels.append({
-            "id": f"hotel_{i}",
-            "name": f"{dest['name']} Hotel {i}",
-            "destination_id": dest["id"],
-            "price": price,
-            "rating": rating,
-            "tags": random.sample(dest["tags"] + ["pool","spa","wifi","family","budget","luxury","boutique"], 3),
-            "popularity": round(random.random(),2)
-        })
-
-    airlines = ["Air India","IndiGo","SpiceJet","Vistara","GoAir","AirAsia"]
-    flights=[]
-    total_targets = 400
-    per_dest_min = 10
-    for idx_dest, dest in enumerate(destinations):
-        nd = random.randint(per_dest_min, max(per_dest_min, 20))
-        for idx in range(nd):
-            dep = random.choice(["Mumbai","Delhi","Bengaluru","Chennai","Kolkata","Hyderabad","Pune"])
-            arr = dest["name"]
-            stops = random.choice([0,0,0,1])
-            duration = random.randint(60, 600) + stops*60
-            price = random.randint(1500, 15000)
-            flights.append({
-                "id": f"flight_{dest['id']}_{idx}",
-                "airline": random.choice(airlines),
-                "from": dep,
-                "to": arr,
-                "stops": stops,
-                "duration_mins": duration,
-                "price": price,
-                "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
-                "arrival_time": None,
-                "layovers": [] if stops==0 else [random.choice(["DXB","SIN","BKK","DEL","BLR"])]
-            })
-    while len(flights) < total_targets:
-        dest = random.choice(destinations)
-        idx = len(flights)
-        dep = random.choice(["Mumbai","Delhi","Bengaluru"])
-        arr = dest["name"]
-        stops = random.choice([0,1])
-        duration = random.randint(60, 600) + stops*60
-        price = random.randint(1500,15000)
-        flights.append({
-            "id": f"flight_extra_{idx}",
-            "airline": random.choice(airlines),
-            "from": dep,
-            "to": arr,
-            "stops": stops,
-            "duration_mins": duration,
-            "price": price,
-            "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
-            "arrival_time": None,
-            "layovers": [] if stops==0 else [random.choice(["SIN","DXB","KUL","DEL"])]
-        })
-
-    train_dest_candidates = random.sample(destinations, 15)
-    trains=[]
-    total_train_target = 300
-    for dest in train_dest_candidates:
-        for t in range(12 + random.randint(0,8)):
-            trains.append({
-                "id": f"train_{dest['id']}_{t}",
-                "from": random.choice(["Mumbai","Delhi","Chennai","Kolkata","Bengaluru","Hyderabad"]),
-                "to": dest["name"],
-                "duration_mins": random.randint(120, 1800),
-                "price": random.randint(300, 3000),
-                "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
-                "arrival_time": None,
-                "class": random.choice(["Sleeper","3A","2A","CC"])
-            })
-    while len(trains) < total_train_target:
-        dest = random.choice(train_dest_candidates)
-        idx = len(trains)
-        trains.append({
-            "id": f"train_extra_{idx}",
-            "from": random.choice(["Mumbai","Delhi","Chennai"]),
-            "to": dest["name"],
-            "duration_mins": random.randint(120, 1800),
-            "price": random.randint(300, 3000),
-            "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
-            "arrival_time": None,
-            "class": random.choice(["Sleeper","3A","2A","CC"])
-        })
-
-    users = [
-        {"id":"user_anna","name":"Anna (Budget Beach Lover)","profile":{"trip_type":"solo","budget":{"min":5000,"max":12000},"interests":["beach","nightlife"]},
-         "past_trips":[{"destination_id":"dest_5","year":2023,"tags":["beach","nightlife"]},{"destination_id":"dest_3","year":2022,"tags":["relax","culture"]}]},
-        {"id":"user_raj","name":"Raj (Adventure Seeker)","profile":{"trip_type":"couple","budget":{"min":10000,"max":20000},"interests":["adventure","nature","photography"]},
-         "past_trips":[{"destination_id":"dest_2","year":2024,"tags":["adventure"]},{"destination_id":"dest_14","year":2021,"tags":["photography","nature"]}]},
-        {"id":"user_sara","name":"Sara (Family Relax)","profile":{"trip_type":"family","budget":{"min":8000,"max":15000},"interests":["family","relax","culture"]},
-         "past_trips":[{"destination_id":"dest_12","year":2022,"tags":["family","mountains"]},{"destination_id":"dest_8","year":2020,"tags":["heritage","culture"]}]}
-    ]
-
-    return {
-        "destinations": destinations,
-        "hotels": hotels,
-        "flights": flights,
-        "trains": trains,
-        "users": users
-    }
-
-data = generate_mock_data()
-destinations = data["destinations"]
-hotels = data["hotels"]
-flights = data["flights"]
-trains = data["trains"]
-users = data["users"]
-user_map = {u["id"]:u for u in users}
-dest_map = {d["id"]:d for d in destinations}
-pois_map = get_pois_map(destinations, seed=42)
-
-# --------------------------- City resolution & other helpers (unchanged) ---------------------------
-KNOWN_CITY_NAMES = set([d["name"].lower() for d in destinations] + ["mumbai","delhi","bengaluru","chennai","kolkata","hyderabad","pune","goa","jaipur","udaipur","agra","varanasi","amritsar","lucknow","shimla","manali","srinagar","leh","munnar","kochi"])
-
-
-def resolve_city_name(name):
-    if not name: return None
-    s = str(name).strip().lower()
-    if s in KNOWN_CITY_NAMES:
-        for d in destinations:
-            if d["name"].lower() == s:
-                return d["name"]
-        return s.title()
-    for d in destinations:
-        dn = d["name"].lower()
-        if dn.startswith(s) or s.startswith(dn) or s in dn or dn in s:
-            return d["name"]
-    s2 = re.sub(r'\b(to|from)\b', '', s).strip()
-    for d in destinations:
-        dn = d["name"].lower()
-        if s2 and (s2 == dn or s2 in dn or dn in s2):
-            return d["name"]
-    return None
-
-
-def detect_destination_in_text(text):
-    if not text: return None
-    t_lower = text.lower()
-    matches = []
-    for d in destinations:
-        name_lower = d["name"].lower()
-        for m in re.finditer(r'\b' + re.escape(name_lower) + r'\b', t_lower):
-            matches.append((d["id"], name_lower, m.start(), m.end()))
-    if not matches: return None
-    to_match = re.search(r'\bto\b', t_lower)
-    if to_match:
-        to_pos = to_match.end()
-        after_to = [m for m in matches if m[2] >= to_pos]
-        if after_to:
-            chosen = sorted(after_to, key=lambda x: x[2])[0]
-            return chosen[0]
-    chosen = sorted(matches, key=lambda x: x[2])[-1]
-    return chosen[0]
-
-
-def detect_origin_in_text(text):
-    if not text: return None
-    t_lower = text.lower()
-    matches = []
-    for cname in KNOWN_CITY_NAMES:
-        for m in re.finditer(r'\b' + re.escape(cname) + r'\b', t_lower):
-            matches.append((cname, m.start(), m.end()))
-    if not matches: return None
-    from_match = re.search(r'\bfrom\b', t_lower)
-    if from_match:
-        from_pos = from_match.end()
-        after_from = [m for m in matches if m[1] >= from_pos]
-        if after_from:
-            chosen = sorted(after_from, key=lambda x: x[1])[0]
-            return resolve_city_name(chosen[0])
-    to_match = re.search(r'\bto\b', t_lower)
-    if to_match:
-        to_pos = to_match.start()
-        before_to = [m for m in matches if m[2] <= to_pos]
-        if before_to:
-            chosen = sorted(before_to, key=lambda x: x[1])[-1]
-            return resolve_city_name(chosen[0])
-    chosen = sorted(matches, key=lambda x: x[1])[0]
-    return resolve_city_name(chosen[0])
-
-# budget parsing helpers
-def _parse_budget_string(s):
-    if s is None: return None
-    s = str(s).lower().strip()
-    s = s.replace("₹", "").replace("rs.", "").replace("rs", "").replace("inr", "").replace("$", "").replace("usd", "").strip()
-    m = re.search(r"([0-9]+(?:[.,][0-9]+)?)\s*([km]?)", s)
-    if m:
-        num = m.group(1).replace(",", "")
-        suf = m.group(2)
-        try:
-            val = float(num)
-            if suf == "k":
-                val = val * 1000.0
-            elif suf == "m":
-                val = val * 1000000.0
-            return int(val)
-        except:
-            return None
-    m2 = re.search(r"([0-9][0-9,\.]+)", s)
-    if m2:
-        try:
-            return int(float(m2.group(1).replace(",", "")))
-        except:
-            return None
-    return None
+# --------------------------- Engine (data, indexes, shared caches) ---------------------------
+@st.cache_resource
+def load_engine(seed=42):
+    # shared across sessions so incremental updates (catalog.apply_deltas) are seen by everyone
+    return RecommendationEngine.from_mock_data(seed)
 
+with span("data_load"):
+    engine = load_engine()
+    catalog = engine.catalog
 
-def _normalize_max_price(p):
-    if p is None: return None
-    if isinstance(p, (int, float)):
-        try:
-            return int(p)
-        except:
-            return None
+
+@st.cache_resource
+def start_metrics_server():
+    # /metrics next to the Streamlit server (TRAVEL_RECO_METRICS_PORT=0 disables it)
+    if not metrics.METRICS_PORT:
+        return None
     try:
-        return _parse_budget_string(p)
-    except:
+        return metrics.start_http_server()
+    except OSError:
         return None
 
-# Wrapper parse_search (uses gemini_wrapper.parse_search_with_gemini but falls back)
+start_metrics_server()
+
+
+@st.cache_resource
+def start_cache_warmer():
+    # replays the most frequent recent queries into the shared engine caches, in the background
+    return CacheWarmer(engine).start()
+
+start_cache_warmer()
+
+
+@st.cache_resource
+def load_event_sink():
+    # one writer thread per process; sessions only enqueue. Stored events also feed live popularity.
+    return engine.attach_event_sink(EventSink()).start()
+
+event_sink = load_event_sink()
+destinations = catalog.destinations
+hotels = catalog.hotels
+flights = catalog.flights
+trains = catalog.trains
+users = engine.users
+user_map = engine.user_map
+dest_map = catalog.dest_map
+pois_map = catalog.pois_map
+
+resolve_city_name = engine.resolve_city_name
+destination_recommendations = engine.destination_recommendations
+filter_flights = engine.filter_flights
+filter_trains = engine.filter_trains
+build_explore_view = engine.build_explore_view
+build_itinerary_bundle = engine.build_itinerary_bundle
+
+
 def parse_search(text):
-    if not text or text.strip() == "": return {}
+    # engine parse with this session's search cache
     if "search_cache" not in st.session_state:
         st.session_state["search_cache"] = {}
-    if text in st.session_state["search_cache"]:
-        return st.session_state["search_cache"][text]
-
-    field_sources = {}
-    parsed = {}
-    try:
-        parsed = parse_search_with_gemini(text) or {}
-        for k in parsed.keys():
-            field_sources[k] = "gemini" if USE_GEMINI else "heuristic"
-    except Exception:
-        parsed = {}
-    parsed.setdefault("tags", [])
-
-    if parsed.get("from") and not parsed.get("origin"):
-        parsed["origin"] = parsed.get("from"); field_sources.setdefault("origin", "gemini")
-
-    if parsed.get("destination_id"):
-        if parsed.get("destination_id") not in dest_map:
-            parsed.pop("destination_id", None)
-            field_sources.pop("destination_id", None)
-    if not parsed.get("destination_id"):
-        if parsed.get("destination") and isinstance(parsed.get("destination"), str):
-            resolved = resolve_city_name(parsed.get("destination"))
-            if resolved:
-                for did, d in dest_map.items():
-                    if d["name"].lower() == resolved.lower():
-                        parsed["destination_id"] = did
-                        field_sources["destination_id"] = field_sources.get("destination", "heuristic")
-                        break
-        if not parsed.get("destination_id"):
-            dest_id_local = detect_destination_in_text(text)
-            if dest_id_local:
-                parsed["destination_id"] = dest_id_local
-                field_sources["destination_id"] = "heuristic"
-
-    origin_val = parsed.get("origin") or parsed.get("from") or parsed.get("source") or None
-    if origin_val:
-        resolved_origin = resolve_city_name(origin_val)
-        if resolved_origin:
-            parsed["origin"] = resolved_origin
-            field_sources["origin"] = field_sources.get("origin", "gemini" if parsed.get("from") or parsed.get("origin") else "heuristic")
-        else:
-            parsed["origin"] = origin_val
-            field_sources["origin"] = field_sources.get("origin","gemini")
-    else:
-        detected_origin = detect_origin_in_text(text)
-        if detected_origin:
-            parsed["origin"] = detected_origin
-            field_sources["origin"] = "heuristic"
-
-    budget_val = None
-    if isinstance(parsed.get("budget_max"), (int, float)):
-        budget_val = int(parsed.get("budget_max")); field_sources.setdefault("budget_max", "gemini")
-    elif parsed.get("max_price") and isinstance(parsed.get("max_price"), (int, float)):
-        budget_val = int(parsed.get("max_price")); field_sources.setdefault("max_stops", "gemini")
-    elif parsed.get("budget_max"):
-        budget_val = _parse_budget_string(parsed.get("budget_max")); field_sources.setdefault("budget_max", "gemini")
-    elif parsed.get("max_price"):
-        budget_val = _parse_budget_string(parsed.get("max_price")); field_sources.setdefault("max_price", "gemini")
-    elif parsed.get("budget"):
-        budget_val = _parse_budget_string(parsed.get("budget")); field_sources.setdefault("budget", "gemini")
-    if budget_val is None:
-        m = re.search(r"(?:under|below|less than|up to|upto)\s*([0-9\.,kKmM₹$usd ]+)", text, flags=re.IGNORECASE)
-        if m:
-            budget_val = _parse_budget_string(m.group(1))
-            field_sources["budget_max"] = "heuristic"
-    if budget_val is not None:
-        parsed["budget_max"] = int(budget_val)
-
-    if parsed.get("nights") is None:
-        m = re.search(r'(\d+)\s*(?:nights|night)', text, flags=re.IGNORECASE)
-        if m:
-            try:
-                parsed["nights"] = int(m.group(1)); field_sources["nights"] = "heuristic"
-            except:
-                pass
-
-    parsed["_field_sources"] = field_sources
-    st.session_state["search_cache"][text] = parsed
-    return parsed
+    return engine.parse_search(text, cache=st.session_state["search_cache"])
 
 # --------------------------- Session state bootstrap ---------------------------
-if "events" not in st.session_state: st.session_state["events"] = []
 if "search_cache" not in st.session_state: st.session_state["search_cache"] = {}
 if "explain_cache" not in st.session_state: st.session_state["explain_cache"] = {}
 if "show_sidebar" not in st.session_state: st.session_state["show_sidebar"] = True
@@ -511,269 +240,55 @@ if "explore_dest" not in st.session_state: st.session_state["explore_dest"] = No
 if "only_show_mode" not in st.session_state:
     st.session_state["only_show_mode"] = None
 
-def log_event(event_type, user_id, item_id):
-    st.session_state["events"].append({"event":event_type,"user":user_id,"item":item_id,"ts": int(time.time())})
 
-# --------------------------- Helper functions ---------------------------
+def invalidate_stale_session_caches():
+    """Drop only the session cache entries that depend on destinations changed by catalog updates."""
+    seen = st.session_state.get("catalog_version")
+    if seen == catalog.version:
+        return
+    if seen is not None:
+        changed = catalog.changed_since(seen)
+        if changed is None:
+            CACHE_EVICTIONS.inc(len(st.session_state["explain_cache"]), cache="explain")
+            CACHE_EVICTIONS.inc(len(st.session_state["quick_explore_cache"]), cache="quick_explore")
+            st.session_state["explain_cache"] = {}
+            st.session_state["quick_explore_cache"] = {}
+        elif changed:
+            # explain_cache keys: "<user>::<hotel_id>"
+            for k in list(st.session_state["explain_cache"].keys()):
+                h = catalog.get("hotel", k.rsplit("::", 1)[-1])
+                if not h or h["destination_id"] in changed:
+                    st.session_state["explain_cache"].pop(k, None)
+                    CACHE_EVICTIONS.inc(cache="explain")
+            # quick_explore_cache keys: "quick_explore::<user>::<dest_id>"
+            for k in list(st.session_state["quick_explore_cache"].keys()):
+                if k.rsplit("::", 1)[-1] in changed:
+                    st.session_state["quick_explore_cache"].pop(k, None)
+                    CACHE_EVICTIONS.inc(cache="quick_explore")
+    st.session_state["catalog_version"] = catalog.version
+
+invalidate_stale_session_caches()
+
+
+def cached_explanation(hotel, user_id, user_profile, parsed_signals):
+    key = f"{user_id}::{hotel['id']}"
+    if key in st.session_state["explain_cache"]:
+        CACHE_REQUESTS.inc(cache="explain", result="hit")
+    else:
+        CACHE_REQUESTS.inc(cache="explain", result="miss")
+        st.session_state["explain_cache"][key] = explain_with_gemini(hotel, user_profile, parsed_signals)
+    return st.session_state["explain_cache"][key]
 
-def destination_recommendations(user_profile, parsed_signals, limit=6):
-    interests = (user_profile.get("interests") or []) + (parsed_signals.get("tags") or [])
-    budget_max = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max")
-    def score_dest(d):
-        s = 0.0
-        for t in interests:
-            if t in d.get("tags", []):
-                s += 2.0
-        s += float(d.get("seasonality", 0.6))
-        if budget_max:
-            s += max(0, (1.0 - abs(d.get("avg_price",0) - budget_max) / (budget_max + 1)) ) * 0.5
-        return s
-    ranked = sorted(destinations, key=score_dest, reverse=True)[:limit]
-    return ranked
+def log_event(event_type, user_id, item_id):
+    event_sink.emit(event_type, user_id, item_id)
 
 
-def hotel_recommendations(user_profile, parsed_signals, limit=6):
-    dest_id = parsed_signals.get("destination_id")
-    cand = hotels
-    if dest_id:
-        cand = [h for h in hotels if h["destination_id"] == dest_id]
-    budget = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max")
-    if budget:
-        cand = [h for h in cand if h.get("price", 999999) <= budget or abs(h.get("price",0)-budget) < budget*0.5]
-    scored = sorted(cand, key=lambda x: score_item(x, user_profile, user_past_trips=user_map.get(st.session_state.get("active_user_id", users[0]["id"]), {}).get("past_trips", [])), reverse=True)
-    return scored[:limit]
-
-
-def filter_flights(filters: dict):
-    res = flights
-    f_from = filters.get("from")
-    f_to = filters.get("to")
-    max_price = filters.get("max_price")
-    max_stops = filters.get("max_stops")
-    if f_from:
-        res = [f for f in res if f["from"].lower() == f_from.lower()]
-    if f_to:
-        res = [f for f in res if f["to"].lower() == f_to.lower()]
-    if max_price:
-        res = [f for f in res if f["price"] <= max_price]
-    if max_stops is not None:
-        res = [f for f in res if f["stops"] <= max_stops]
-    res = sorted(res, key=lambda x: (x["price"], x["duration_mins"]))
-    return res
-
-
-def filter_trains(filters: dict):
-    res = trains
-    f_from = filters.get("from")
-    f_to = filters.get("to")
-    seat_class = filters.get("seat_class")
-    max_price = filters.get("max_price")
-    if f_from:
-        res = [t for t in res if t["from"].lower() == f_from.lower()]
-    if f_to:
-        res = [t for t in res if t["to"].lower() == f_to.lower()]
-    if seat_class:
-        res = [t for t in res if t.get("class") == seat_class]
-    if max_price:
-        res = [t for t in res if t["price"] <= max_price]
-    res = sorted(res, key=lambda x: (x["price"], x["duration_mins"]))
-    return res
-
-
-def build_explore_view(dest_id, user_profile, parsed_signals, active_user_id):
-    dest = dest_map.get(dest_id)
-    if not dest:
-        return None
+# --------------------------- Helper functions ---------------------------
 
-    hotels_in_dest = [h for h in hotels if h["destination_id"] == dest_id]
-    candidate_short = []
-    for c in hotels_in_dest:
-        candidate_short.append({
-            "id": c.get("id"),
-            "name": c.get("name"),
-            "price": c.get("price"),
-            "rating": c.get("rating"),
-            "tags": c.get("tags", [])[:5]
-        })
-    choice = choose_hotel_with_gemini(candidate_short, user_profile, user_past_trips=user_map.get(active_user_id, {}).get("past_trips", []))
-    chosen_hotel = None
-    reason_text = ""
-    if choice and choice.get("hotel_id"):
-        hid = choice.get("hotel_id")
-        chosen_hotel = next((h for h in hotels_in_dest if h["id"] == hid), None)
-        reason_text = choice.get("reason", "")
-    if not chosen_hotel:
-        budget_max = parsed_signals.get("budget_max") if parsed_signals else None
-        if budget_max:
-            under = [h for h in hotels_in_dest if h["price"] <= budget_max]
-            if under:
-                chosen_hotel = sorted(under, key=lambda x: abs(x["price"] - budget_max))[0]
-            else:
-                chosen_hotel = sorted(hotels_in_dest, key=lambda x: x["price"])[0] if hotels_in_dest else None
-        else:
-            chosen_hotel = sorted(hotels_in_dest, key=lambda x: x.get("price", 999999))[0] if hotels_in_dest else None
-        if chosen_hotel:
-            reason_text = f"Auto-picked: {chosen_hotel.get('rating','?')}★ • {format_rupee(chosen_hotel.get('price',0))}"
-
-    pois = pois_map.get(dest_id, [])[:30]
-    interests = parsed_signals.get("tags", []) if parsed_signals else []
-    interests = interests or user_profile.get("interests", [])
-    def poi_rank(p):
-        r = 0
-        if interests:
-            for t in interests:
-                if t in p.get("category","") or t in p.get("name","").lower():
-                    r += 2
-        r -= p.get("approx_travel_mins_from_hotel", 999)/100.0
-        return r
-    pois_sorted = sorted(pois, key=poi_rank, reverse=True)[:10]
-
-    nights = parsed_signals.get("nights") if parsed_signals and parsed_signals.get("nights") else 2
-    it = generate_itinerary(dest_id, start_date_str=None, nights=nights, interests=interests, pace="normal", pois_map=pois_map)
-
-    return {
-        "destination": dest,
-        "recommended_hotel": chosen_hotel,
-        "hotel_reason": reason_text,
-        "pois": pois_sorted,
-        "itinerary": it
-    }
-
-# -------- NEW: helpers for full itinerary bundle (normal / packed / relaxed) --------
-
-def _compute_poi_cost_for_itinerary(itinerary_dict):
-    total = 0
-    if not itinerary_dict:
-        return 0
-    for day in itinerary_dict.get("days", []):
-        for slot in ["morning", "afternoon", "evening"]:
-            for poi in day.get(slot, []):
-                total += poi.get("approx_cost_from_hotel", 0) or 0
-    return total
-
-
-def build_itinerary_bundle(user_profile, parsed_signals, active_user_id):
-    """
-    Build a complete trip bundle:
-    - Choose destination (from parsed or recommendations)
-    - Choose hotel (LLM/heuristic)
-    - Find flights & trains
-    - Build itineraries for paces: relaxed, normal, packed
-    - Compute approximate cost ranges
-    """
-    # destination
-    dest_id = parsed_signals.get("destination_id")
-    if not dest_id:
-        # fall back to top recommended destination
-        top_dest = destination_recommendations(user_profile, parsed_signals, limit=1)
-        if not top_dest:
-            return None
-        dest_id = top_dest[0]["id"]
-    dest = dest_map.get(dest_id)
-    if not dest:
-        return None
+def hotel_recommendations(user_profile, parsed_signals, limit=6):
+    return engine.hotel_recommendations(user_profile, parsed_signals, limit=limit,
+                                        user_id=st.session_state.get("active_user_id", users[0]["id"]))
 
-    nights = parsed_signals.get("nights") or 2
-    interests = parsed_signals.get("tags") or user_profile.get("interests", [])
-    budget_max = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max", None)
-    origin = parsed_signals.get("origin")
-
-    # hotel (reuse logic from build_explore_view)
-    hotels_in_dest = [h for h in hotels if h["destination_id"] == dest_id]
-    candidate_short = [{
-        "id": c.get("id"),
-        "name": c.get("name"),
-        "price": c.get("price"),
-        "rating": c.get("rating"),
-        "tags": c.get("tags", [])[:5]
-    } for c in hotels_in_dest]
-    choice = choose_hotel_with_gemini(candidate_short, user_profile, user_past_trips=user_map.get(active_user_id, {}).get("past_trips", []))
-    chosen_hotel = None
-    reason_text = ""
-    if choice and choice.get("hotel_id"):
-        hid = choice.get("hotel_id")
-        chosen_hotel = next((h for h in hotels_in_dest if h["id"] == hid), None)
-        reason_text = choice.get("reason", "")
-    if not chosen_hotel:
-        if budget_max:
-            under = [h for h in hotels_in_dest if h["price"] <= budget_max]
-            if under:
-                chosen_hotel = sorted(under, key=lambda x: abs(x["price"] - budget_max))[0]
-            else:
-                chosen_hotel = sorted(hotels_in_dest, key=lambda x: x["price"])[0] if hotels_in_dest else None
-        else:
-            chosen_hotel = sorted(hotels_in_dest, key=lambda x: x.get("price", 999999))[0] if hotels_in_dest else None
-        if chosen_hotel:
-            reason_text = f"Auto-picked: {chosen_hotel.get('rating','?')}★ • {format_rupee(chosen_hotel.get('price',0))}"
-
-    # travel options
-    to_city = dest["name"]
-    max_price = _normalize_max_price(budget_max) if budget_max else None
-
-    flight_filters = {
-        "from": origin,
-        "to": to_city,
-        "max_price": max_price or None,
-        "max_stops": 2
-    }
-    flight_options = filter_flights(flight_filters)[:3]
-
-    train_filters = {
-        "from": origin,
-        "to": to_city,
-        "seat_class": None,
-        "max_price": max_price or 3000
-    }
-    train_options = filter_trains(train_filters)[:3]
-
-    # itineraries for each pace
-    itineraries = {}
-    for pace in ["relaxed", "normal", "packed"]:
-        try:
-            it = generate_itinerary(dest_id, start_date_str=None, nights=nights, interests=interests, pace=pace, pois_map=pois_map)
-        except TypeError:
-            # in case generate_itinerary doesn't accept pace, fall back to default
-            it = generate_itinerary(dest_id, start_date_str=None, nights=nights, interests=interests, pois_map=pois_map)
-        itineraries[pace] = it
-
-    # cost computation
-    cost_summary = {}
-    base_travel_cost = None
-    if flight_options:
-        base_travel_cost = flight_options[0]["price"]
-    elif train_options:
-        base_travel_cost = train_options[0]["price"]
-    else:
-        base_travel_cost = 0
-
-    hotel_cost = (chosen_hotel["price"] * nights) if chosen_hotel else 0
-
-    for pace, it in itineraries.items():
-        poi_cost = _compute_poi_cost_for_itinerary(it)
-        base_total = base_travel_cost + hotel_cost + poi_cost
-        # show a range ±15% to account for food/misc.
-        min_cost = int(base_total * 0.85)
-        max_cost = int(base_total * 1.15)
-        cost_summary[pace] = {
-            "base_total": base_total,
-            "min": min_cost,
-            "max": max_cost,
-            "poi_cost": poi_cost,
-            "hotel_cost": hotel_cost,
-            "travel_cost": base_travel_cost
-        }
-
-    return {
-        "destination": dest,
-        "nights": nights,
-        "interests": interests,
-        "hotel": chosen_hotel,
-        "hotel_reason": reason_text,
-        "flights": flight_options,
-        "trains": train_options,
-        "itineraries": itineraries,
-        "cost_summary": cost_summary
-    }
 
 # --------------------------- UI Layout ---------------------------
 cols = st.columns([0.6,5,0.6])
@@ -815,6 +330,7 @@ with side_col:
     run_query = st.button("Ask", key="side_go")
     parsed_preview = st.empty()
     show_parser_debug = st.checkbox("Show parser debug", value=False, key="parser_debug")
+    trace_panel = st.empty()
     st.markdown("---")
     st.markdown("#### Quick actions")
     prompts = []
@@ -833,6 +349,7 @@ with side_col:
                 parsed_p = {}
             st.session_state["last_query"] = p
             st.session_state["last_parsed"] = parsed_p
+            log_query(p, active_user_id, parsed_p.get("destination_id"))
             ql = p.lower()
             if any(w in ql for w in ["flight","flights","air","plane"]):
                 st.session_state["last_mode"] = "flights"
@@ -875,7 +392,7 @@ with side_col:
         st.markdown("_No quick explores yet — click 'Explore <City>' cards in Recommendations to generate one._")
 
     if run_query and query:
-        # --- PARSING: for itinerary queries we build an augmented prompt including user profile so the LLM
+        # --- PARSING: for itinerary queries the remote parser also gets the (compacted) user profile so it
         # can better distinguish origin/destination and detect pace (relaxed/normal/packed).
         parsed = {}
         ql = query.lower()
@@ -893,26 +410,18 @@ with side_col:
         st.session_state["last_mode"] = mode
 
         if mode == "itinerary" and USE_GEMINI:
-            # Build a richer parsing prompt that includes the active profile and asks for pace
-            user_profile_text = json.dumps(active_profile, ensure_ascii=False)
-            parse_prompt = (
-                f"You are a travel parser. For a user with profile {user_profile_text}, "
-                f"interpret this query and extract: destination (city), origin (city, if present), "
-                f"nights (number of nights), budget_max (if present), trip_type, tags/interests, "
-                f"and the user's implied itinerary pace as one of ['relaxed','normal','packed'].\n\n"
-                f"User query: \"{query}\"\n\n"
-                f"Return a JSON object with keys: destination, destination_id (if resolvable), origin, nights, "
-                f"budget_max, trip_type, tags (array). Use plain values, don't include extra text."
-            )
+            # itinerary searches also ask the remote parser for the implied pace (relaxed/normal/packed);
+            # the profile goes in compacted (interests, budget, trip type)
             try:
-                parsed = parse_search_with_gemini(parse_prompt) or {}
+                parsed = parse_search_with_gemini(query, user_profile=active_profile, fields=ITINERARY_FIELDS) or {}
             except Exception:
                 parsed = {}
-            # mark sources that we used gemini for
+            # mark which parser produced the fields (the remote one may have fallen back to local)
+            source = parsed.pop("_source", "gemini")
             if parsed:
                 parsed.setdefault("_field_sources", {})
                 for k in parsed.keys():
-                    parsed["_field_sources"].setdefault(k, "gemini")
+                    parsed["_field_sources"].setdefault(k, source)
         else:
             # fallback/general parse using existing parse_search
             try:
@@ -947,8 +456,11 @@ with side_col:
         except Exception:
             pass
 
+        # free text for semantic matching (the itinerary prompt above is not the user's words)
+        parsed["query_text"] = query
         st.session_state["last_query"] = query
         st.session_state["last_parsed"] = parsed
+        log_query(query, active_user_id, parsed.get("destination_id"))
 
         if mode in ("flights", "trains", "hotels", "itinerary"):
             st.session_state["only_show_mode"] = mode
@@ -1023,6 +535,10 @@ with main_col:
                 dest = bundle["destination"]
                 nights = bundle["nights"]
                 st.markdown(f"## Trip to {dest['name']} · {nights} nights")
+                if bundle.get("timed_out"):
+                    st.caption("Still loading (skipped for now): " + ", ".join(bundle["timed_out"]))
+                if bundle.get("failed"):
+                    st.caption("Couldn't build (skipped): " + ", ".join(bundle["failed"]))
 
                 # Travel section: Flights & Trains
                 st.markdown("### Travel options")
@@ -1073,10 +589,11 @@ with main_col:
 
                 # Daily plan section with pace toggle
                 st.markdown("### Daily plan")
+                pace_options = ["Relaxed", "Normal", "Packed"]
                 pace_label = st.radio(
                     "Choose itinerary pace",
-                    ["Relaxed", "Normal", "Packed"],
-                    index=1,
+                    pace_options,
+                    index=pace_options.index((st.session_state["last_parsed"].get("pace") or bundle["recommended_pace"]).title()),
                     key="itinerary_pace_choice"
                 )
                 pace_key = pace_label.lower()
@@ -1096,7 +613,7 @@ with main_col:
                             st.markdown(f"**{slot.title()}**")
                             for poi in items:
                                 cost = poi.get("approx_cost_from_hotel", 0) or 0
-                                mins = poi.get("approx_travel_mins_from_hotel", "?")
+                                mins = bundle.get("hotel_poi_travel", {}).get(poi["id"], {}).get("mins", poi.get("approx_travel_mins_from_hotel", "?"))
                                 total_poi_cost += cost
                                 st.markdown(
                                     f"- {poi['name']} · {mins} mins from hotel · {format_rupee(cost)}"
@@ -1112,9 +629,49 @@ with main_col:
                             f"for {nights} nights**"
                         )
                         with st.expander("Cost breakdown (approximate)"):
-                            st.write(f"Travel (cheapest option): {format_rupee(cs['travel_cost'])}")
+                            st.write(f"Travel (selected option): {format_rupee(cs['travel_cost'])}")
                             st.write(f"Hotel ({nights} nights): {format_rupee(cs['hotel_cost'])}")
                             st.write(f"Activities / POIs: {format_rupee(cs['poi_cost'])}")
+                if not bundle["within_budget"]:
+                    st.warning("No hotel / travel / pace combination fits the budget — showing the closest match.")
+                elif len(bundle["pareto_bundles"]) > 1:
+                    with st.expander("Other options within budget (cost vs. match)"):
+                        for alt in bundle["pareto_bundles"]:
+                            tr = alt["transport"]
+                            tr_text = f"{tr.get('airline', 'Train')} {tr['from']} → {tr['to']}" if tr else "no transport"
+                            h_text = alt["hotel"]["name"] if alt["hotel"] else "no hotel"
+                            st.write(f"{format_rupee(alt['cost'])} · {h_text} · {tr_text} · {alt['pace']} pace (score {alt['score']})")
+
+                # Multi-city variant of the trip, starting and ending at the parsed origin
+                if parsed.get("origin"):
+                    with st.expander(f"Multi-city trip from {parsed['origin']}"):
+                        mc1, mc2 = st.columns(2)
+                        with mc1:
+                            mc_cities = st.slider("Cities", 2, 5, 3, key="multicity_cities")
+                        with mc2:
+                            mc_nights = st.number_input("Total nights", min_value=mc_cities, max_value=21,
+                                                        value=max(mc_cities, parsed.get("nights") or 6), key="multicity_nights")
+                        plan = engine.plan_multi_city(active_profile, parsed, parsed["origin"], int(mc_nights),
+                                                      max_cities=mc_cities, user_id=active_user_id)
+                        if not plan:
+                            st.write("_No connected destinations found for this origin in mock data_")
+                        else:
+                            route = " → ".join([plan["origin"]] + [f"{s['destination']['name']} ({s['nights']}n)" for s in plan["stops"]]
+                                               + ([plan["origin"]] if plan["return_leg"] else []))
+                            st.markdown(f"**{route}**")
+                            for s in plan["stops"]:
+                                legs = " + ".join(f"{seg['kind']} {seg['from']} → {seg['to']} ({format_rupee(seg['price'])})" for seg in s["leg"])
+                                h_text = f"{s['hotel']['name']} · {format_rupee(s['hotel']['price'])}/night" if s["hotel"] else "no hotel in mock data"
+                                st.write(f"{s['arrive']} · {s['destination']['name']}, {s['nights']} nights · {h_text}")
+                                if legs:
+                                    st.caption(legs)
+                            pc = plan["cost"]
+                            st.markdown(
+                                f"Travel {format_rupee(pc['travel'])} ({plan['travel_hours']} h) · Hotels {format_rupee(pc['hotel'])} · "
+                                f"Activities {format_rupee(pc['poi'])} · **Total {format_rupee(pc['total'])}**"
+                            )
+                            if not plan["within_budget"]:
+                                st.caption("Over your budget — try fewer cities or nights.")
                 st.markdown("---")
         else:
             # ------------------- Original recommendations landing -------------------
@@ -1135,6 +692,7 @@ with main_col:
                     if st.button(f"Explore {d['name']}", key=f"explore_dest_{d['id']}"):
                         st.session_state["explore_dest"] = d["id"]
                         st.session_state["last_parsed"] = {**parsed, "destination_id": d["id"]}
+                        log_query(st.session_state.get("last_query") or None, active_user_id, d["id"])
                         ev = build_explore_view(d["id"], active_profile, st.session_state.get("last_parsed", {}), active_user_id)
                         if ev:
                             key = f"quick_explore::{active_user_id}::{d['id']}"
@@ -1165,17 +723,43 @@ with main_col:
                                 st.session_state["chosen_hotel"] = rec_h["id"]
                                 st.success("Hotel selected for itinerary and distance calculations.")
 
+                    # distances follow the hotel the user selected in this city, else the recommended one
+                    sel_h = catalog.get("hotel", st.session_state.get("chosen_hotel") or "")
+                    sel_travel = None
+                    if sel_h and sel_h["destination_id"] == ed and (not rec_h or sel_h["id"] != rec_h["id"]):
+                        sel_travel = engine.poi_index.travel_map(ed, sel_h["id"], [p["id"] for p in view.get("pois", [])])
+                    hotel_travel = view.get("hotel_poi_travel", {})
+                    if sel_travel is not None:
+                        it_ids = [p["id"] for day in view.get("itinerary", {}).get("days", []) for slot in ["morning","afternoon","evening"] for p in day.get(slot, [])]
+                        hotel_travel = engine.poi_index.travel_map(ed, sel_h["id"], it_ids)
+
                     st.markdown("### Attractions & POIs")
-                    poi_htmls = []
-                    for p in view.get("pois", []):
-                        pid = p["id"]
-                        photo = make_poi_photo(pid, w=640, h=360)
-                        minutes = p.get("approx_travel_mins_from_hotel")
-                        cost = p.get("approx_cost_from_hotel")
-                        poi_htmls.append(poi_card_html(photo, p, minutes_from_hotel=minutes, cost_from_hotel=cost))
-                    if poi_htmls:
-                        row_html = "<div style='display:flex;flex-wrap:wrap;gap:12px;'>" + "".join(poi_htmls) + "</div>"
-                        components.html(row_html, height=760, scrolling=True)
+                    if view.get("nearby_pois") and sel_travel is None:
+                        st.caption(f"Within {NEARBY_MINUTES} mins of the hotel: " + ", ".join(f"{n['name']} ({n['minutes_from_hotel']}m)" for n in view["nearby_pois"][:8]))
+                    with span("render.poi_cards"):
+                        poi_htmls = []
+                        for p in view.get("pois", []):
+                            pid = p["id"]
+                            photo = make_poi_photo(pid, w=640, h=360)
+                            t = (sel_travel or {}).get(pid) or {"mins": p.get("minutes_from_hotel"), "cost": p.get("cost_from_hotel")}
+                            minutes = t["mins"]
+                            cost = t["cost"]
+                            poi_htmls.append(poi_card_html(photo, p, minutes_from_hotel=minutes, cost_from_hotel=cost))
+                        if poi_htmls:
+                            row_html = "<div style='display:flex;flex-wrap:wrap;gap:12px;'>" + "".join(poi_htmls) + "</div>"
+                            components.html(row_html, height=760, scrolling=True)
+
+                    ps1, ps2 = st.columns([3, 1])
+                    with ps1:
+                        poi_q = st.text_input("Search places (e.g. fort, beach, museum)", key="poi_search_query")
+                    with ps2:
+                        poi_all = st.checkbox("All cities", key="poi_search_all")
+                    if poi_q:
+                        hits = engine.search_pois(poi_q, dest_id=None if poi_all else ed, limit=8)
+                        if not hits:
+                            st.caption("No matching places")
+                        for h in hits:
+                            st.write(f"{h['name']} · {h.get('category', '')} · {dest_map[h['destination_id']]['name']}")
 
                     st.markdown("### Suggested itinerary (mock deterministic)")
                     it = view.get("itinerary", {})
@@ -1188,7 +772,7 @@ with main_col:
                                 for idx, poi in enumerate(items):
                                     with cols_d[idx]:
                                         ph = make_poi_photo(poi["id"], w=320, h=180)
-                                        st.image(ph, use_column_width=True, caption=f"{poi['name']} ({poi.get('approx_travel_mins_from_hotel')} mins from hotel)")
+                                        st.image(ph, use_column_width=True, caption=f"{poi['name']} ({hotel_travel.get(poi['id'], {}).get('mins', poi.get('approx_travel_mins_from_hotel'))} mins from hotel)")
                                         st.markdown(f"**{slot.title()}** — {poi['name']}")
                             else:
                                 st.markdown(f"*{slot.title()}: No recommendation*")
@@ -1206,19 +790,18 @@ with main_col:
                 if not recs:
                     st.info("No hotels found for that query")
                 else:
-                    card_htmls = []
-                    for i, hotel in enumerate(recs):
-                        photo = make_stock_photo(hotel["id"])
-                        base_card = hotel_card_html(photo, hotel)
-                        key = f"{active_user_id}_{hotel['id']}"
-                        if key not in st.session_state["explain_cache"]:
-                            st.session_state["explain_cache"][key] = explain_with_gemini(hotel, active_profile, st.session_state.get("last_parsed", {}))
-                        expl_html = f"<div class='hotel-explain'>{st.session_state['explain_cache'][key]}</div>"
-                        card_with_expl = base_card.replace("<!--EXPLAIN-->", expl_html)
-                        card_htmls.append(card_with_expl)
-                    if card_htmls:
-                        full_html = "<div class='card-row'>" + "".join(card_htmls) + "</div>"
-                        components.html(full_html, height=380, scrolling=True)
+                    with span("render.hotel_cards"):
+                        card_htmls = []
+                        for i, hotel in enumerate(recs):
+                            photo = make_stock_photo(hotel["id"])
+                            base_card = hotel_card_html(photo, hotel)
+                            explanation = cached_explanation(hotel, active_user_id, active_profile, st.session_state.get("last_parsed", {}))
+                            expl_html = f"<div class='hotel-explain'>{explanation}</div>"
+                            card_with_expl = base_card.replace("<!--EXPLAIN-->", expl_html)
+                            card_htmls.append(card_with_expl)
+                        if card_htmls:
+                            full_html = "<div class='card-row'>" + "".join(card_htmls) + "</div>"
+                            components.html(full_html, height=380, scrolling=True)
 
     # ---------------- Flights tab ----------------
     with tab1:
@@ -1283,6 +866,18 @@ with main_col:
                             log_event("book_flight", active_user_id, flight["id"])
                             st.success("Flight booked (mock)")
 
+                # connecting options (flight + flight, flight + train, ...) for a concrete city pair
+                j_from = (from_val if apply_f else origin_val)
+                if j_from and to_val:
+                    journeys = engine.search_journeys({"from": j_from, "to": to_val, "max_price": max_price, "limit": 6})
+                    if journeys:
+                        with st.expander(f"Connecting journeys {j_from} → {to_val} (flights + trains)"):
+                            for j in journeys:
+                                legs = " · ".join(f"{leg['kind']} {leg['from']} → {leg['to']} {leg['departure']}–{leg['arrival']}" for leg in j["legs"])
+                                stops_txt = "direct" if j["transfers"] == 0 else f"{j['transfers']} change{'s' if j['transfers'] > 1 else ''}"
+                                st.write(f"{format_rupee(j['price'])} · {j['duration_mins'] // 60}h {j['duration_mins'] % 60:02d}m · {stops_txt}")
+                                st.caption(legs)
+
     # ---------------- Trains tab ----------------
     with tab2:
         only_mode = st.session_state.get("only_show_mode")
@@ -1384,23 +979,23 @@ with main_col:
                         res = [h for h in res if dest_map[h["destination_id"]]["name"]==dflt_dest]
                     if budget:
                         res = [h for h in res if h["price"] <= budget]
-                    res = sorted(res, key=lambda x: score_item(x, active_profile, user_past_trips=user_map[active_user_id].get("past_trips", [])), reverse=True)
+                    live_pop = engine.popularity.live("hotel")
+                    res = sorted(res, key=lambda x: score_item(x, active_profile, user_past_trips=user_map[active_user_id].get("past_trips", []), popularity=live_pop), reverse=True)
 
                 if not res:
                     st.info("No hotels found")
                 else:
-                    card_htmls = []
-                    for i, hotel in enumerate(res[:results_limit]):
-                        photo = make_stock_photo(hotel["id"])
-                        base_card = hotel_card_html(photo, hotel)
-                        key = f"{active_user_id}_{hotel['id']}"
-                        if key not in st.session_state["explain_cache"]:
-                            st.session_state["explain_cache"][key] = explain_with_gemini(hotel, active_profile, st.session_state.get("last_parsed", {}))
-                        expl_html = f"<div class='hotel-explain'>{st.session_state['explain_cache'][key]}</div>"
-                        card_htmls.append(base_card.replace("<!--EXPLAIN-->", expl_html))
-                    if card_htmls:
-                        full_html = "<div class='card-row'>" + "".join(card_htmls) + "</div>"
-                        components.html(full_html, height=380, scrolling=True)
+                    with span("render.hotel_cards"):
+                        card_htmls = []
+                        for i, hotel in enumerate(res[:results_limit]):
+                            photo = make_stock_photo(hotel["id"])
+                            base_card = hotel_card_html(photo, hotel)
+                            explanation = cached_explanation(hotel, active_user_id, active_profile, st.session_state.get("last_parsed", {}))
+                            expl_html = f"<div class='hotel-explain'>{explanation}</div>"
+                            card_htmls.append(base_card.replace("<!--EXPLAIN-->", expl_html))
+                        if card_htmls:
+                            full_html = "<div class='card-row'>" + "".join(card_htmls) + "</div>"
+                            components.html(full_html, height=380, scrolling=True)
 
                     for hotel in res[:results_limit]:
                         if st.button(f"Book (mock) - {hotel['name']}", key=f"book_h_{hotel['id']}"):
@@ -1410,4 +1005,10 @@ with main_col:
 st.markdown("---")
 st.markdown("**Notes**: this prototype uses generated mock data.")
 
+trace_summary = finish_run(run_trace)
+if trace_summary and show_parser_debug:
+    with trace_panel.container():
+        st.markdown(f"**Stage timings (this rerun, {trace_summary['total_ms']:.1f} ms)**")
+        st.json(trace_summary["stages"])
+
 
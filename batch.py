@@ -0,0 +1,326 @@
+# batch.py
+"""
+Nightly batch recommendations ("trips for you" emails, home-screen cards).
+
+Reads a JSONL stream of users and writes one JSONL result per user, in input order:
+
+    in : {"user_id": "...", "profile": {"interests": [...], "budget": {...}}, "past_trips": [...]}
+         (engine-style {"id", "profile", "past_trips"} records work too)
+    out: {"user_id", "destinations": [...], "hotels": [...], "bundle": {...}}
+
+    python batch.py users.jsonl -o recs.jsonl --processes 8
+
+Users are scored a chunk at a time with numpy (users x items matrices that
+reproduce scorer.score_item / DestinationScoreTable without parsed signals),
+and chunks are spread over worker processes attached to one shared catalog
+snapshot. The default bundle is the top destination with its best-scoring
+hotel that fits the budget, the cheapest flight/train there and a normal-pace
+itinerary for the default number of nights.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from engine import _compute_poi_cost_for_itinerary
+from itinerary import generate_itinerary
+from memo import LRUMemo
+from poi_search import POISearchIndex
+from scorer import W_BUDGET, W_PAST, W_POP, W_TAG
+from shared_catalog import attach_snapshot, publish_snapshot
+
+DEFAULT_TOP_K = 6
+DEFAULT_CHUNK_SIZE = 2048
+DEFAULT_NIGHTS = 2
+
+
+class BatchScorer:
+    def __init__(self, catalog, top_k: int = DEFAULT_TOP_K, nights: int = DEFAULT_NIGHTS):
+        self.catalog = catalog
+        self.top_k = top_k
+        self.nights = nights
+        self.destinations = list(catalog.destinations)
+        self.hotels = list(catalog.hotels)
+
+        vocab = {}
+        for item in self.destinations + self.hotels:
+            for t in item.get("tags", []):
+                vocab.setdefault(t, len(vocab))
+        self.vocab = vocab
+        V = len(vocab)
+
+        # destinations: tag membership, seasonality, avg price
+        self.dest_tags = np.zeros((len(self.destinations), V), dtype=np.float64)
+        for i, d in enumerate(self.destinations):
+            for t in set(d.get("tags", [])):
+                self.dest_tags[i, vocab[t]] = 1.0
+        self.dest_season = np.array([float(d.get("seasonality", 0.6)) for d in self.destinations])
+        self.dest_price = np.array([d.get("avg_price", 0) for d in self.destinations], dtype=np.float64)
+        dest_pos = {d["id"]: i for i, d in enumerate(self.destinations)}
+
+        # hotels: tag counts (duplicates count, as in tag_match_score), price, popularity
+        self.hotel_tags = np.zeros((len(self.hotels), V), dtype=np.float64)
+        for i, h in enumerate(self.hotels):
+            for t in h.get("tags", []):
+                self.hotel_tags[i, vocab[t]] += 1.0
+        self.hotel_price = np.array([h.get("price", 0) for h in self.hotels], dtype=np.float64)
+        self.hotel_pop = np.array([h.get("popularity", 0.5) for h in self.hotels], dtype=np.float64)
+        hotel_dest = np.array([dest_pos.get(h.get("destination_id"), -1) for h in self.hotels])
+        self.hotels_in_dest = [np.flatnonzero(hotel_dest == i) for i in range(len(self.destinations))]
+
+        # cheapest way to reach each destination (origin isn't part of the batch profile)
+        self.cheapest_transport = []
+        for d in self.destinations:
+            name = d["name"].lower()
+            opts = [(f["price"], "flight", f) for f in catalog.flights_by_to.get(name, [])]
+            opts += [(t["price"], "train", t) for t in catalog.trains_by_to.get(name, [])]
+            best = min(opts, key=lambda x: x[0]) if opts else None
+            self.cheapest_transport.append({"kind": best[1], "id": best[2]["id"], "price": best[0]} if best else None)
+
+        # itinerary POI cost only depends on (destination, interests)
+        self._poi_cost = LRUMemo(maxsize=4096)
+        self.poi_search = POISearchIndex(catalog.pois_map)
+
+    # ---------------- user features ----------------
+    def _features(self, users: List[Dict[str, Any]]):
+        U, V = len(users), len(self.vocab)
+        interest_counts = np.zeros((U, V))
+        interest_member = np.zeros((U, V))
+        n_interests = np.zeros(U)
+        past_member = np.zeros((U, V))
+        n_past = np.zeros(U)
+        has_budget = np.zeros(U, dtype=bool)
+        has_max = np.zeros(U, dtype=bool)
+        b_min = np.zeros(U)
+        b_max = np.zeros(U)
+        for u, user in enumerate(users):
+            profile = user["profile"]
+            interests = profile.get("interests") or []
+            n_interests[u] = len(interests)
+            for t in interests:
+                j = self.vocab.get(t)
+                if j is not None:
+                    interest_counts[u, j] += 1.0
+                    interest_member[u, j] = 1.0
+            past_tags = set()
+            for trip in user["past_trips"]:
+                past_tags.update(trip.get("tags", []))
+            n_past[u] = len(past_tags)
+            for t in past_tags:
+                j = self.vocab.get(t)
+                if j is not None:
+                    past_member[u, j] = 1.0
+            budget = profile.get("budget") or {}
+            has_budget[u] = bool(budget)
+            has_max[u] = "max" in budget
+            b_min[u] = budget.get("min", 0) or 0
+            b_max[u] = budget.get("max", 0) or 0
+        return interest_counts, interest_member, n_interests, past_member, n_past, has_budget, has_max, b_min, b_max
+
+    # ---------------- scoring ----------------
+    def destination_scores(self, interest_counts, b_max):
+        base = 2.0 * interest_counts @ self.dest_tags.T + self.dest_season
+        budget = b_max[:, None]
+        prox = np.maximum(0.0, 1.0 - np.abs(self.dest_price - budget) / (budget + 1)) * 0.5
+        return base + np.where(budget > 0, prox, 0.0)
+
+    def hotel_scores(self, interest_member, n_interests, past_member, n_past, has_budget, has_max, b_min, b_max):
+        tag = (interest_member @ self.hotel_tags.T) / np.maximum(1.0, n_interests)[:, None]
+        past = np.where(n_past[:, None] > 0, (past_member @ self.hotel_tags.T) / np.maximum(1.0, n_past)[:, None], 0.0)
+
+        price = self.hotel_price
+        price_or_one = np.where(price != 0, price, 1.0)
+        mn = b_min[:, None]
+        mx = np.where(has_max[:, None], b_max[:, None], price_or_one)
+        in_range = (mn <= price) & (price <= mx)
+        diff = np.minimum(np.abs(price - mx), np.abs(price - mn))
+        denom = np.where(mx != 0, mx, price_or_one)
+        budget = np.where(in_range, 1.0, np.maximum(0.0, 1.0 - diff / denom))
+        budget = np.where(has_budget[:, None], budget, 0.5)
+
+        return W_TAG * tag + W_BUDGET * budget + W_POP * self.hotel_pop + W_PAST * past
+
+    def _itinerary_cost(self, dest_id, interests):
+        def compute():
+            it = generate_itinerary(dest_id, start_date_str=None, nights=self.nights, interests=list(interests),
+                                    pace="normal", pois_map=self.catalog.pois_map, search_index=self.poi_search)
+            return _compute_poi_cost_for_itinerary(it)
+        return self._poi_cost.get_or_compute((dest_id, interests), compute)
+
+    def recommend(self, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """users: [{"user_id", "profile", "past_trips"}] -> one result dict per user."""
+        if not users:
+            return []
+        (interest_counts, interest_member, n_interests, past_member, n_past,
+         has_budget, has_max, b_min, b_max) = self._features(users)
+        k = self.top_k
+
+        d_scores = self.destination_scores(interest_counts, b_max)
+        # stable sort keeps catalog order on ties, like heapq.nlargest / sorted(reverse=True)
+        d_top = np.argsort(-d_scores, axis=1, kind="stable")[:, :k]
+
+        h_scores = self.hotel_scores(interest_member, n_interests, past_member, n_past, has_budget, has_max, b_min, b_max)
+        # hotel_recommendations' budget window: under budget or within 50% of it
+        budget = b_max[:, None]
+        eligible = (budget <= 0) | (self.hotel_price <= budget) | (np.abs(self.hotel_price - budget) < budget * 0.5)
+        h_order = np.argsort(np.where(eligible, -h_scores, np.inf), axis=1, kind="stable")[:, :k]
+
+        out = []
+        for u, user in enumerate(users):
+            dests = [{"id": self.destinations[i]["id"], "name": self.destinations[i]["name"],
+                      "score": round(float(d_scores[u, i]), 4)} for i in d_top[u]]
+            hotels = [{"id": self.hotels[i]["id"], "name": self.hotels[i]["name"], "price": self.hotels[i]["price"],
+                       "score": round(float(h_scores[u, i]), 4)} for i in h_order[u] if eligible[u, i]]
+            out.append({"user_id": user["user_id"], "destinations": dests, "hotels": hotels,
+                        "bundle": self._default_bundle(user, int(d_top[u, 0]) if len(d_top[u]) else None,
+                                                       h_scores[u], float(b_max[u]))})
+        return out
+
+    def _default_bundle(self, user, dest_i, h_scores, budget_max):
+        if dest_i is None:
+            return None
+        dest = self.destinations[dest_i]
+        in_dest = self.hotels_in_dest[dest_i]
+        hotel = None
+        if len(in_dest):
+            ranked = in_dest[np.argsort(-h_scores[in_dest], kind="stable")]
+            fitting = [i for i in ranked if not budget_max or self.hotel_price[i] * self.nights <= budget_max]
+            hotel = self.hotels[int((fitting or ranked)[0])]
+        transport = self.cheapest_transport[dest_i]
+        # itinerary POI scoring ignores interest order
+        interests = tuple(sorted(user["profile"].get("interests") or []))
+        poi_cost = self._itinerary_cost(dest["id"], interests)
+        hotel_cost = hotel["price"] * self.nights if hotel else 0
+        total = hotel_cost + (transport["price"] if transport else 0) + poi_cost
+        return {
+            "destination_id": dest["id"],
+            "hotel_id": hotel["id"] if hotel else None,
+            "transport": transport,
+            "pace": "normal",
+            "nights": self.nights,
+            "estimated_cost": {"min": int(total * 0.85), "max": int(total * 1.15)},
+            "within_budget": not budget_max or total <= budget_max
+        }
+
+
+def _normalize_user(rec: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_id": rec.get("user_id") or rec.get("id"),
+        "profile": rec.get("profile") or {},
+        "past_trips": rec.get("past_trips") or [],
+    }
+
+
+def _recommend_lines(scorer: BatchScorer, lines: List[str]) -> str:
+    users, errors = [], []
+    for line in lines:
+        try:
+            users.append(_normalize_user(json.loads(line)))
+        except (ValueError, AttributeError) as e:
+            errors.append(json.dumps({"error": f"bad input line: {e}", "line": line[:200]}))
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in scorer.recommend(users)) + "".join(e + "\n" for e in errors)
+
+
+# ---------------- worker processes ----------------
+_worker_scorer: Optional[BatchScorer] = None
+
+
+def _init_worker(snapshot, top_k, nights):
+    global _worker_scorer
+    catalog, _ = attach_snapshot(snapshot)
+    _worker_scorer = BatchScorer(catalog, top_k=top_k, nights=nights)
+
+
+def _worker_chunk(lines):
+    return _recommend_lines(_worker_scorer, lines)
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for line in lines:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(catalog, in_stream: Iterable[str], out_stream, processes: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              top_k: int = DEFAULT_TOP_K, nights: int = DEFAULT_NIGHTS, progress=None) -> int:
+    """
+    Score every user in in_stream (JSONL lines) and write results to out_stream as
+    chunks finish (in input order). Returns the number of lines processed.
+    progress: optional fn(users_done, elapsed_s) called after each chunk.
+    """
+    t0 = time.perf_counter()
+    done = 0
+    chunks = _chunks(in_stream, chunk_size)
+    if processes <= 1:
+        scorer = BatchScorer(catalog, top_k=top_k, nights=nights)
+        results = ((len(c), _recommend_lines(scorer, c)) for c in chunks)
+        for n, text in results:
+            out_stream.write(text)
+            done += n
+            if progress:
+                progress(done, time.perf_counter() - t0)
+        return done
+
+    snap = publish_snapshot(catalog, [])
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(processes, initializer=_init_worker, initargs=(snap.name, top_k, nights)) as pool:
+            sizes = []
+            def sized(it):
+                for c in it:
+                    sizes.append(len(c))
+                    yield c
+            for i, text in enumerate(pool.imap(_worker_chunk, sized(chunks))):
+                out_stream.write(text)
+                done += sizes[i]
+                if progress:
+                    progress(done, time.perf_counter() - t0)
+    finally:
+        snap.close()
+        snap.unlink()
+    return done
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch destination/hotel/bundle recommendations (JSONL in, JSONL out)")
+    ap.add_argument("input", help="users JSONL file, or - for stdin")
+    ap.add_argument("-o", "--output", default="-", help="output JSONL file (default stdout)")
+    ap.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    ap.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    ap.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    ap.add_argument("--nights", type=int, default=DEFAULT_NIGHTS)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    from engine import RecommendationEngine
+    catalog = RecommendationEngine.from_mock_data(args.seed).catalog
+
+    def progress(n, elapsed):
+        print(f"\r{n} users, {n / max(elapsed, 1e-9):,.0f}/s", end="", file=sys.stderr, flush=True)
+
+    fin = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        run_batch(catalog, fin, fout, processes=args.processes, chunk_size=args.chunk_size,
+                  top_k=args.top_k, nights=args.nights, progress=progress)
+    finally:
+        print(file=sys.stderr)
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bundle_optimizer.py
+"""
+Budget-feasible trip bundle search (hotel x transport x itinerary pace).
+
+Each level is a list of options {"cost", "score", "item"}. A bundle picks one
+option per level; its cost / score are the sums over levels. The search is a
+depth-first branch-and-bound:
+  - options in a level are visited cheapest first, so once partial cost plus the
+    cheapest possible remainder exceeds the budget the rest of the level is skipped
+  - a branch is dropped when its optimistic (lowest cost, highest score) completion
+    is already dominated by the Pareto front AND cannot enter the top-n by score.
+Returns the top-n bundles by score plus the Pareto front of cost vs. score.
+"""
+
+import bisect
+import heapq
+import itertools
+from typing import Any, Dict, List, Optional
+
+
+def option(cost, score, item=None, kind=None):
+    return {"cost": cost, "score": score, "item": item, "kind": kind}
+
+
+def _dominated(front_costs, front_scores, cost, score):
+    # front is sorted by cost asc and (being a Pareto front) by score asc, so the
+    # last point with cost <= `cost` has the best score among those points.
+    i = bisect.bisect_right(front_costs, cost) - 1
+    return i >= 0 and front_scores[i] >= score
+
+
+def _add_to_front(front, front_costs, front_scores, cost, score, bundle):
+    if _dominated(front_costs, front_scores, cost, score):
+        return
+    i = bisect.bisect_left(front_costs, cost)
+    # drop points the new one dominates (cost >= new cost, score <= new score)
+    j = i
+    while j < len(front) and front_scores[j] <= score:
+        j += 1
+    front[i:j] = [bundle]
+    front_costs[i:j] = [cost]
+    front_scores[i:j] = [score]
+
+
+def optimize_bundles(levels: List[List[Dict[str, Any]]], budget_max: Optional[float] = None, top_n: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    levels: list of option lists (see option()); an empty level makes every bundle infeasible.
+    budget_max: inclusive total-cost cap (None = unbounded).
+    returns {"best": [...top_n by score...], "pareto": [...cheapest to best...], "explored": n}
+    each bundle: {"cost", "score", "picks": [option per level]}
+    """
+    if not levels or any(not lvl for lvl in levels):
+        return {"best": [], "pareto": [], "explored": 0}
+    levels = [sorted(lvl, key=lambda o: o["cost"]) for lvl in levels]
+    n = len(levels)
+    # suffix bounds: cheapest / best-scoring completion from level i onwards
+    min_cost_rest = [0.0] * (n + 1)
+    max_score_rest = [0.0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        min_cost_rest[i] = min_cost_rest[i + 1] + levels[i][0]["cost"]
+        max_score_rest[i] = max_score_rest[i + 1] + max(o["score"] for o in levels[i])
+    limit = float("inf") if budget_max is None else budget_max
+
+    best_heap = []  # (score, tiebreak, bundle) min-heap of size top_n
+    counter = itertools.count()
+    front, front_costs, front_scores = [], [], []
+    picks = [None] * n
+    explored = 0
+
+    def prunable(cost_lb, score_ub):
+        if len(best_heap) < top_n or score_ub > best_heap[0][0]:
+            return False
+        return _dominated(front_costs, front_scores, cost_lb, score_ub)
+
+    def dfs(i, cost, score):
+        nonlocal explored
+        if i == n:
+            explored += 1
+            bundle = {"cost": cost, "score": score, "picks": list(picks)}
+            entry = (score, -next(counter), bundle)
+            if len(best_heap) < top_n:
+                heapq.heappush(best_heap, entry)
+            elif score > best_heap[0][0]:
+                heapq.heapreplace(best_heap, entry)
+            _add_to_front(front, front_costs, front_scores, cost, score, bundle)
+            return
+        for o in levels[i]:
+            c = cost + o["cost"]
+            if c + min_cost_rest[i + 1] > limit:
+                break  # options are cost-sorted, nothing further in this level fits
+            s = score + o["score"]
+            if prunable(c + min_cost_rest[i + 1], s + max_score_rest[i + 1]):
+                continue
+            picks[i] = o
+            dfs(i + 1, c, s)
+        picks[i] = None
+
+    dfs(0, 0, 0.0)
+    best = [b for _, _, b in sorted(best_heap, key=lambda e: (e[0], e[1]), reverse=True)]
+    return {"best": best, "pareto": list(front), "explored": explored}
@@ -0,0 +1,122 @@
+# cascade.py
+"""
+Hotel pick as a three-stage cascade, so the expensive last step (the LLM /
+remote re-ranker behind choose_hotel_with_gemini) only ever sees a handful of
+hotels however large the destination's inventory is:
+
+1. retrieve  hotels of the destination inside the budget band, cut from a
+             price-sorted per-destination list with bisect (no scan)
+2. score     scorer.score_items over what's left, keep the best
+3. rerank    the top RERANK_TOP_K go to the re-ranker; its decision is cached
+             on (destination version, shortlisted ids, user signature)
+
+    cascade = HotelCascade(catalog, rerank=choose_hotel_with_gemini)
+    short = cascade.shortlist(dest_id, user_profile, past_trips, budget_max)
+    pick = cascade.decide(dest_id, short, user_profile, past_trips)   # {"hotel", "reason", "cached"}
+
+Stage timings are recorded as tracing spans ("hotel_cascade.<stage>"), in the
+CASCADE_STAGE_SECONDS histogram and in the returned "timings_ms".
+"""
+
+import bisect
+import time
+from typing import Any, Callable, Dict
+
+from memo import LRUMemo
+from metrics import CASCADE_STAGE_SECONDS
+from scorer import score_items
+from tracing import span
+
+RERANK_TOP_K = 5
+SHORTLIST_SIZE = 20
+# same band as hotel_recommendations: anything under 1.5x the budget stays in
+BUDGET_BAND = 1.5
+
+
+def candidate_short(hotels):
+    """The fields the re-ranker sees (keeps the prompt small)."""
+    return [{
+        "id": c.get("id"),
+        "name": c.get("name"),
+        "price": c.get("price"),
+        "rating": c.get("rating"),
+        "tags": c.get("tags", [])[:5]
+    } for c in hotels]
+
+
+def _user_key(user_profile, past_trips):
+    budget = (user_profile or {}).get("budget") or {}
+    past = sorted({t for trip in (past_trips or []) for t in trip.get("tags", [])})
+    return (tuple((user_profile or {}).get("interests") or []), tuple(sorted(budget.items())), tuple(past))
+
+
+class HotelCascade:
+    def __init__(self, catalog, rerank: Callable, rerank_k: int = RERANK_TOP_K,
+                 shortlist_size: int = SHORTLIST_SIZE, cache_size: int = 1024):
+        self.catalog = catalog
+        self.rerank = rerank
+        self.rerank_k = rerank_k
+        self.shortlist_size = shortlist_size
+        self._by_price = LRUMemo(maxsize=256)
+        self.decisions = LRUMemo(maxsize=cache_size)
+
+    def _stage(self, stage, timings, t0):
+        secs = time.perf_counter() - t0
+        CASCADE_STAGE_SECONDS.observe(secs, stage=stage)
+        timings[stage] = round(secs * 1000.0, 3)
+
+    def _price_sorted(self, dest_id):
+        def build():
+            hotels = sorted(self.catalog.hotels_by_dest.get(dest_id, []), key=lambda h: h.get("price", 0))
+            return hotels, [h.get("price", 0) for h in hotels]
+        return self._by_price.get_or_compute((dest_id, self.catalog.dest_version(dest_id)), build)
+
+    def warm(self, dest_id):
+        """Build the destination's price-sorted list ahead of the first shortlist()."""
+        self._price_sorted(dest_id)
+
+    def shortlist(self, dest_id, user_profile, past_trips=None, budget_max=None, signals=None,
+                  popularity=None) -> Dict[str, Any]:
+        """Stages 1-2: {"ranked": [(score, hotel)] best first, "retrieved": n, "timings_ms": {...}}."""
+        timings = {}
+        t0 = time.perf_counter()
+        with span("hotel_cascade.retrieve"):
+            hotels, prices = self._price_sorted(dest_id)
+            cand = hotels
+            if budget_max:
+                cand = hotels[:bisect.bisect_left(prices, budget_max * BUDGET_BAND)]
+                # nothing near the budget: fall back to the whole destination
+                cand = cand or hotels
+        self._stage("retrieve", timings, t0)
+
+        t0 = time.perf_counter()
+        with span("hotel_cascade.score"):
+            scores = score_items(cand, user_profile or {}, signals=signals, user_past_trips=past_trips, popularity=popularity)
+            # stable on price order for equal scores
+            order = sorted(range(len(cand)), key=lambda i: -scores[i])[:self.shortlist_size]
+            ranked = [(scores[i], cand[i]) for i in order]
+        self._stage("score", timings, t0)
+        return {"ranked": ranked, "retrieved": len(cand), "timings_ms": timings}
+
+    def decide(self, dest_id, short: Dict[str, Any], user_profile, past_trips=None) -> Dict[str, Any]:
+        """Stage 3: re-rank the top rerank_k of a shortlist. {"hotel", "reason", "cached"}."""
+        top = [h for _, h in short["ranked"][:self.rerank_k]]
+        if not top:
+            return {"hotel": None, "reason": "", "cached": False}
+        key = (dest_id, self.catalog.dest_version(dest_id), tuple(h["id"] for h in top), _user_key(user_profile, past_trips))
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return self.rerank(candidate_short(top), user_profile, user_past_trips=past_trips)
+
+        t0 = time.perf_counter()
+        with span("hotel_cascade.rerank"):
+            choice = self.decisions.get_or_compute(key, compute)
+        self._stage("rerank", short["timings_ms"], t0)
+        if not choice:
+            # failed / empty decisions (e.g. a remote timeout) are retried next time
+            self.decisions.pop(key)
+            return {"hotel": None, "reason": "", "cached": False}
+        hotel = next((h for h in top if h["id"] == choice.get("hotel_id")), None)
+        return {"hotel": hotel, "reason": choice.get("reason", "") if hotel else "", "cached": not calls}
@@ -0,0 +1,280 @@
+# catalog.py
+"""
+In-memory travel catalog (destinations, hotels, flights, trains, POIs) with
+per-destination index partitions and incremental delta updates.
+
+Deltas are plain dicts:
+    {"op": "add" | "update" | "delete", "kind": "hotel" | "flight" | "train" | "poi", "record": {...}}
+
+`record` must carry an "id". New records also need their partition key
+("destination_id" for hotels / POIs, "to" for flights / trains). Updates merge
+the given fields into the existing record. Applying a batch only touches the
+partitions / travel_to rows of the records in the batch, bumps the catalog
+version and remembers which destinations changed so that caches can drop just
+the entries that depend on them.
+
+A batch is checked as a whole before any of it is applied, so a bad delta
+raises ValueError with the catalog untouched. If applying still fails partway,
+whatever was changed is versioned and announced before the error propagates.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from geo import city_profile
+from pois_real import DENSE_TRAVEL_MAX_POIS, fill_travel_to, make_poi, poi_rng_base, travel_rows
+
+KINDS = ("hotel", "flight", "train", "poi")
+OPS = ("add", "update", "delete")
+# field a new record of each kind is partitioned by
+_PARTITION_KEY = {"hotel": "destination_id", "flight": "to", "train": "to", "poi": "destination_id"}
+
+# how many version bumps we remember for changed_since()
+_CHANGELOG_SIZE = 256
+
+log = logging.getLogger(__name__)
+
+
+class Catalog:
+    def __init__(self, destinations: List[Dict[str, Any]], hotels: List[Dict[str, Any]],
+                 flights: List[Dict[str, Any]], trains: List[Dict[str, Any]],
+                 pois_map: Dict[str, List[Dict[str, Any]]], seed: int = 42):
+        self.destinations = destinations
+        self.hotels = hotels
+        self.flights = flights
+        self.trains = trains
+        self.pois_map = pois_map
+        self.seed = seed
+
+        self.version = 0
+        self._dest_versions: Dict[str, int] = {}
+        self._changelog = deque(maxlen=_CHANGELOG_SIZE)  # (version, frozenset(dest_ids))
+        self._listeners: List[Callable[[int, Set[str]], None]] = []
+        self._lock = threading.RLock()
+        self._build_indexes()
+
+    # ---------------- indexes ----------------
+    def _build_indexes(self):
+        self.dest_map = {d["id"]: d for d in self.destinations}
+        self.dest_id_by_name = {d["name"].lower(): d["id"] for d in self.destinations}
+        self._dest_index = {d["id"]: i for i, d in enumerate(self.destinations)}
+
+        # flat list positions make deletes O(1) (swap with last, pop)
+        self._positions = {
+            "hotel": {h["id"]: i for i, h in enumerate(self.hotels)},
+            "flight": {f["id"]: i for i, f in enumerate(self.flights)},
+            "train": {t["id"]: i for i, t in enumerate(self.trains)},
+        }
+        self.hotels_by_dest: Dict[str, List[Dict[str, Any]]] = {}
+        for h in self.hotels:
+            self.hotels_by_dest.setdefault(h["destination_id"], []).append(h)
+        self.flights_by_to: Dict[str, List[Dict[str, Any]]] = {}
+        for f in self.flights:
+            self.flights_by_to.setdefault(f["to"].lower(), []).append(f)
+        self.trains_by_to: Dict[str, List[Dict[str, Any]]] = {}
+        for t in self.trains:
+            self.trains_by_to.setdefault(t["to"].lower(), []).append(t)
+        self.poi_by_id: Dict[str, Dict[str, Any]] = {}
+        self._poi_dest: Dict[str, str] = {}
+        for did, plist in self.pois_map.items():
+            for p in plist:
+                self.poi_by_id[p["id"]] = p
+                self._poi_dest[p["id"]] = did
+
+    def _flat(self, kind):
+        return {"hotel": self.hotels, "flight": self.flights, "train": self.trains}[kind]
+
+    def _partition(self, kind, rec):
+        if kind == "hotel":
+            return self.hotels_by_dest.setdefault(rec["destination_id"], [])
+        if kind == "flight":
+            return self.flights_by_to.setdefault(rec["to"].lower(), [])
+        return self.trains_by_to.setdefault(rec["to"].lower(), [])
+
+    def _dest_of(self, kind, rec) -> Optional[str]:
+        if kind in ("hotel", "poi"):
+            return rec.get("destination_id")
+        return self.dest_id_by_name.get((rec.get("to") or "").lower())
+
+    # ---------------- lookups ----------------
+    def get(self, kind: str, item_id: str) -> Optional[Dict[str, Any]]:
+        if kind == "poi":
+            return self.poi_by_id.get(item_id)
+        pos = self._positions[kind].get(item_id)
+        return None if pos is None else self._flat(kind)[pos]
+
+    def dest_version(self, dest_id: str) -> int:
+        """Version of the last update that touched dest_id (0 if never touched)."""
+        return self._dest_versions.get(dest_id, 0)
+
+    def changed_since(self, version: int) -> Optional[Set[str]]:
+        """
+        Destination ids changed after `version`. Returns None when the changelog no
+        longer reaches back that far (callers should then drop everything).
+        """
+        if version >= self.version:
+            return set()
+        changed: Set[str] = set()
+        oldest = None
+        for v, dests in self._changelog:
+            if oldest is None:
+                oldest = v
+            if v > version:
+                changed |= dests
+        if oldest is None or oldest > version + 1:
+            return None
+        return changed
+
+    def subscribe(self, fn: Callable[[int, Set[str]], None]):
+        """Register fn(version, changed_dest_ids), called after every applied batch."""
+        self._listeners.append(fn)
+
+    # ---------------- updates ----------------
+    def apply_deltas(self, deltas: Iterable[Dict[str, Any]]) -> Set[str]:
+        """Apply a batch of add/update/delete deltas. Returns the changed destination ids."""
+        deltas = list(deltas)
+        changed: Set[str] = set()
+        version = None
+        try:
+            with self._lock:
+                self._check(deltas)
+                try:
+                    for delta in deltas:
+                        kind, op, rec = delta["kind"], delta["op"], delta["record"]
+                        if kind == "poi":
+                            touched = self._apply_poi(op, rec)
+                        else:
+                            touched = self._apply_flat(kind, op, rec)
+                        changed.update(d for d in touched if d)
+                finally:
+                    # also on a failure partway: what was applied must not look unchanged to caches
+                    if changed:
+                        self.version += 1
+                        for d in changed:
+                            self._dest_versions[d] = self.version
+                        self._changelog.append((self.version, frozenset(changed)))
+                        version = self.version
+        finally:
+            if version is not None:
+                for fn in list(self._listeners):
+                    try:
+                        fn(version, changed)
+                    except Exception:
+                        # one broken listener mustn't keep the others' caches stale
+                        log.exception("catalog listener %r failed for version %d", fn, version)
+        return changed
+
+    def _check(self, deltas):
+        """Raise ValueError for the first malformed delta of a batch, before any of it is applied."""
+        exists = {}   # (kind, id) -> present after the deltas checked so far
+        for i, delta in enumerate(deltas):
+            kind = delta.get("kind")
+            op = delta.get("op")
+            rec = delta.get("record")
+            if kind not in KINDS:
+                raise ValueError(f"delta {i}: unknown delta kind: {kind!r}")
+            if op not in OPS:
+                raise ValueError(f"delta {i}: unknown delta op: {op!r}")
+            if not isinstance(rec, dict) or not rec.get("id"):
+                raise ValueError(f"delta {i}: delta record needs an 'id'")
+            key = (kind, rec["id"])
+            present = exists.get(key, self.get(kind, rec["id"]) is not None)
+            if op == "delete":
+                exists[key] = False
+                continue
+            if not present:
+                field = _PARTITION_KEY[kind]
+                if not rec.get(field):
+                    raise ValueError(f"delta {i}: new {kind} {rec['id']!r} needs {field!r}")
+                if kind == "poi" and rec[field] not in self.dest_map:
+                    raise ValueError(f"delta {i}: poi delta for unknown destination: {rec[field]!r}")
+            exists[key] = True
+
+    def _apply_flat(self, kind, op, rec):
+        if op not in OPS:
+            raise ValueError(f"unknown delta op: {op!r}")
+        flat = self._flat(kind)
+        positions = self._positions[kind]
+        existing = self.get(kind, rec["id"])
+        if op == "add" or (op == "update" and existing is None):
+            if existing is not None:
+                return self._apply_flat(kind, "update", rec)
+            new = dict(rec)
+            positions[new["id"]] = len(flat)
+            flat.append(new)
+            self._partition(kind, new).append(new)
+            return {self._dest_of(kind, new)}
+        if existing is None:
+            return set()
+        if op == "update":
+            before = self._dest_of(kind, existing)
+            old_part = self._partition(kind, existing)
+            existing.update(rec)
+            new_part = self._partition(kind, existing)
+            if new_part is not old_part:
+                old_part.remove(existing)
+                new_part.append(existing)
+            return {before, self._dest_of(kind, existing)}
+        if op == "delete":
+            pos = positions.pop(rec["id"])
+            last = flat.pop()
+            if last is not existing:
+                flat[pos] = last
+                positions[last["id"]] = pos
+            self._partition(kind, existing).remove(existing)
+            return {self._dest_of(kind, existing)}
+
+    def _apply_poi(self, op, rec):
+        if op not in OPS:
+            raise ValueError(f"unknown delta op: {op!r}")
+        existing = self.poi_by_id.get(rec["id"])
+        if op == "add" or (op == "update" and existing is None):
+            if existing is not None:
+                return self._apply_poi("update", rec)
+            dest_id = rec.get("destination_id")
+            if dest_id not in self.dest_map:
+                raise ValueError(f"poi delta for unknown destination: {dest_id!r}")
+            plist = self.pois_map.setdefault(dest_id, [])
+            rng_base = poi_rng_base(self.seed, self._dest_index[dest_id])
+            i = len(plist)
+            new = make_poi(dest_id, i, rec.get("name", rec["id"]), rng_base, self.dest_map[dest_id])
+            new.update({k: v for k, v in rec.items() if k not in ("destination_id", "travel_to")})
+            plist.append(new)
+            self._patch_travel(dest_id, plist, new)
+            new["travel_to"].update(rec.get("travel_to") or {})
+            self.poi_by_id[new["id"]] = new
+            self._poi_dest[new["id"]] = dest_id
+            return {dest_id}
+        if existing is None:
+            return set()
+        dest_id = self._poi_dest[rec["id"]]
+        if op == "update":
+            moved = any(k in rec and rec[k] != existing.get(k) for k in ("lat", "lon"))
+            existing.update({k: v for k, v in rec.items() if k not in ("destination_id", "travel_to")})
+            if moved:
+                self._patch_travel(dest_id, self.pois_map.get(dest_id, []), existing)
+            existing.setdefault("travel_to", {}).update(rec.get("travel_to") or {})
+            return {dest_id}
+        if op == "delete":
+            plist = self.pois_map.get(dest_id, [])
+            plist.remove(existing)
+            for q in plist:
+                (q.get("travel_to") or {}).pop(existing["id"], None)
+            del self.poi_by_id[existing["id"]]
+            del self._poi_dest[existing["id"]]
+            return {dest_id}
+
+    def _patch_travel(self, dest_id, plist, poi):
+        """Keep a small city's dense travel_to table current for one added / moved POI (its row and column)."""
+        profile = city_profile(self.dest_map[dest_id].get("name"))
+        if len(plist) > DENSE_TRAVEL_MAX_POIS:
+            # the city outgrew the dense table: travel is computed on demand from coordinates
+            if any(q.get("travel_to") for q in plist):
+                fill_travel_to(plist, profile)
+            poi.setdefault("travel_to", {})
+            return
+        poi["travel_to"] = travel_rows([poi], plist, profile)[0]
+        for q, back in zip(plist, travel_rows(plist, [poi], profile)):
+            q.setdefault("travel_to", {})[poi["id"]] = back[poi["id"]]
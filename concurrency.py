@@ -0,0 +1,72 @@
+# concurrency.py
+"""
+Shared worker pool and a small helper to run independent stages concurrently
+under a single deadline. Stages that miss the deadline or raise are reported
+(separately) instead of failing the whole call, so callers can return partial
+results.
+
+Note: a stage must not itself block on run_stages() with the shared pool, or a
+saturated pool can stall until the deadline.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+POOL_WORKERS = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool() -> ThreadPoolExecutor:
+    """Process-wide thread pool (created lazily, survives Streamlit reruns)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="travel-reco")
+    return _pool
+
+
+def run_stages(stages: Dict[str, Callable[[], Any]], deadline_s: Optional[float] = None,
+               parallel: bool = True) -> Tuple[Dict[str, Any], List[str], Dict[str, BaseException]]:
+    """
+    stages: {name: zero-arg callable}
+    Returns (results, timed_out, errors): results holds the stages that finished
+    in time, timed_out names the stages that did not, and errors maps the stages
+    that raised to their exception.
+    With parallel=False the stages run inline, in order, and stages that have
+    not started by the deadline count as timed out.
+    """
+    results: Dict[str, Any] = {}
+    timed_out: List[str] = []
+    errors: Dict[str, BaseException] = {}
+    if not parallel:
+        start = time.monotonic()
+        for name, fn in stages.items():
+            if deadline_s is not None and time.monotonic() - start > deadline_s:
+                timed_out.append(name)
+                continue
+            try:
+                results[name] = fn()
+            except Exception as e:
+                errors[name] = e
+        return results, timed_out, errors
+
+    pool = shared_pool()
+    # each stage runs in a copy of the caller's context (keeps the active trace)
+    futures = {pool.submit(contextvars.copy_context().run, fn): name for name, fn in stages.items()}
+    done, pending = wait(futures, timeout=deadline_s)
+    for f in done:
+        name = futures[f]
+        try:
+            results[name] = f.result()
+        except Exception as e:
+            errors[name] = e
+    for f in pending:
+        # running stages keep going in the background; their result is dropped
+        f.cancel()
+        timed_out.append(futures[f])
+    return results, timed_out, errors
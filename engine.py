@@ -0,0 +1,936 @@
+# engine.py
+"""
+Headless recommendation engine: search parsing, destination / hotel ranking,
+flight & train filters, explore views and itinerary bundles on top of a Catalog.
+
+No Streamlit dependency; app.py and api_server.py are thin clients of
+RecommendationEngine. Per-user state is passed in explicitly (user id, profile,
+optional past trips); caches shared between callers live on the engine and are
+thread-safe.
+"""
+
+import copy
+import datetime
+import functools
+import hashlib
+import heapq
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, List
+
+from scorer import score_item, score_items, DestinationScoreTable
+from cascade import HotelCascade, RERANK_TOP_K
+from gemini_wrapper import parse_search_with_gemini, choose_hotel_with_gemini
+from itinerary import generate_itinerary
+from pois_real import get_pois_map, POIS_BY_CITY
+from catalog import Catalog
+from bundle_optimizer import optimize_bundles, option
+from concurrency import run_stages
+from memo import LRUMemo
+from poi_index import HotelPOIIndex, NEARBY_MINUTES
+from poi_search import POISearchIndex
+from multicity import TransportGraph, plan_trip
+from journeys import JourneyPlanner
+from fuzzy import PlaceIndex, origin_span
+from semantic import SemanticIndex
+from popularity import PopularityTracker
+from mock_data import generate_mock_data
+from tracing import traced
+import metrics
+from metrics import CACHE_REQUESTS, PARSE_SECONDS, FILTER_RESULTS, BUNDLE_BUILD_SECONDS
+
+log = logging.getLogger(__name__)
+
+EXTRA_CITY_NAMES = ["mumbai","delhi","bengaluru","chennai","kolkata","hyderabad","pune","goa","jaipur","udaipur","agra","varanasi","amritsar","lucknow","shimla","manali","srinagar","leh","munnar","kochi"]
+
+# how many hotels / transport options per mode the bundle optimizer considers
+BUNDLE_TOP_K = 8
+BUNDLE_PACES = ["relaxed", "normal", "packed"]
+# run bundle stages on the shared pool; stages slower than the deadline are dropped
+BUNDLE_CONCURRENT = True
+BUNDLE_DEADLINE_S = 8.0
+# multi-city planner defaults
+MULTICITY_MAX_CITIES = 3
+MULTICITY_DEFAULT_NIGHTS = 6
+# free-text semantic matching: index neighbours pulled in as extra candidates, and the
+# similarity's weight in the final score (about one matching tag at full similarity)
+SEMANTIC_CANDIDATES = 24
+SEMANTIC_MIN_SIM = 0.1
+SEMANTIC_DEST_WEIGHT = 2.0
+SEMANTIC_HOTEL_WEIGHT = 1.3
+# without a destination, hotel catalogs larger than this are ranked from semantic candidates only
+SEMANTIC_FULL_SCAN_MAX = 20000
+# live popularity: weight of each logged event, and of a destination's live popularity in its score
+EVENT_WEIGHTS = {"book_hotel": 1.0, "book_flight": 1.0, "book_train": 1.0}
+DEFAULT_EVENT_WEIGHT = 0.3
+DEST_POPULARITY_WEIGHT = 1.0
+# stored events older than this many half-lives are too decayed to be worth replaying
+POPULARITY_REPLAY_HALF_LIVES = 8
+
+
+def format_rupee(amt):
+    try:
+        return f"₹{int(amt):,}"
+    except Exception:
+        try:
+            return f"₹{float(amt):,}"
+        except Exception:
+            return f"₹{amt}"
+
+
+# budget parsing helpers
+def _parse_budget_string(s):
+    if s is None: return None
+    s = str(s).lower().strip()
+    s = s.replace("₹", "").replace("rs.", "").replace("rs", "").replace("inr", "").replace("$", "").replace("usd", "").strip()
+    m = re.search(r"([0-9]+(?:[.,][0-9]+)?)\s*([km]?)", s)
+    if m:
+        num = m.group(1).replace(",", "")
+        suf = m.group(2)
+        try:
+            val = float(num)
+            if suf == "k":
+                val = val * 1000.0
+            elif suf == "m":
+                val = val * 1000000.0
+            return int(val)
+        except:
+            return None
+    m2 = re.search(r"([0-9][0-9,\.]+)", s)
+    if m2:
+        try:
+            return int(float(m2.group(1).replace(",", "")))
+        except:
+            return None
+    return None
+
+
+def _normalize_max_price(p):
+    if p is None: return None
+    if isinstance(p, (int, float)):
+        try:
+            return int(p)
+        except:
+            return None
+    try:
+        return _parse_budget_string(p)
+    except:
+        return None
+
+
+def _explore_signals_key(parsed_signals):
+    # only the parsed fields build_explore_view actually reads
+    p = parsed_signals or {}
+    return (p.get("budget_max"), tuple(p.get("tags") or []), p.get("nights"))
+
+
+def _profile_key(user_profile, past_trips):
+    # a request may override a known user's stored profile / trips, so they are part of the key
+    blob = json.dumps([user_profile or {}, past_trips or []], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+# -------- helpers for full itinerary bundle (normal / packed / relaxed) --------
+
+def _compute_poi_cost_for_itinerary(itinerary_dict):
+    total = 0
+    if not itinerary_dict:
+        return 0
+    for day in itinerary_dict.get("days", []):
+        for slot in ["morning", "afternoon", "evening"]:
+            for poi in day.get(slot, []):
+                total += poi.get("approx_cost_from_hotel", 0) or 0
+    return total
+
+
+def _itinerary_score(itinerary_dict, interests):
+    # more planned stops is better; stops matching the user's interests count extra
+    score = 0.0
+    for day in (itinerary_dict or {}).get("days", []):
+        for slot in ["morning", "afternoon", "evening"]:
+            for poi in day.get(slot, []):
+                score += 0.05
+                if any(t in (poi.get("category", "") or "") or t in poi.get("name", "").lower() for t in interests or []):
+                    score += 0.3
+    return score
+
+
+def _bundle_levels(ranked_hotels, chosen_hotel, flight_cands, train_cands, itineraries, user_profile, parsed_signals, past_trips, nights, interests,
+                   popularity=None):
+    # ranked_hotels: the hotel cascade's shortlist, [(score, hotel)] best first
+    signals = {"search_budget_max": parsed_signals.get("budget_max")}
+    scored = list(ranked_hotels[:BUNDLE_TOP_K])
+    if chosen_hotel and all(h is not chosen_hotel for _, h in scored):
+        scored.append((score_item(chosen_hotel, user_profile, signals=signals, user_past_trips=past_trips, popularity=popularity), chosen_hotel))
+    # small preference for the LLM/heuristic pick when it fits
+    hotel_level = [option(h["price"] * nights, sc + (0.25 if h is chosen_hotel else 0.0), h, "hotel") for sc, h in scored]
+    if not hotel_level:
+        hotel_level = [option(0, 0.0, None, "hotel")]
+
+    transport = [(f, "flight") for f in flight_cands] + [(t, "train") for t in train_cands]
+    if transport:
+        longest = max(x["duration_mins"] for x, _ in transport) or 1
+        transport_level = [option(x["price"], 0.5 * (1 - x["duration_mins"] / longest), x, kind) for x, kind in transport]
+    else:
+        transport_level = [option(0, 0.0, None, None)]
+
+    pace_level = [option(_compute_poi_cost_for_itinerary(it), _itinerary_score(it, interests), pace, "pace") for pace, it in itineraries.items()]
+    return [hotel_level, transport_level, pace_level]
+
+
+def _bundle_summary(b):
+    hotel_o, transport_o, pace_o = b["picks"]
+    return {
+        "cost": int(b["cost"]),
+        "score": round(b["score"], 3),
+        "hotel": hotel_o["item"],
+        "transport": transport_o["item"],
+        "transport_kind": transport_o["kind"],
+        "pace": pace_o["item"]
+    }
+
+
+def _cascade_info(short, pick):
+    return {"retrieved": short["retrieved"], "shortlisted": len(short["ranked"]),
+            "cached": bool(pick and pick.get("cached")), "timings_ms": dict(short["timings_ms"])}
+
+
+def _fallback_hotel(hotels_in_dest, budget_max):
+    if budget_max:
+        under = [h for h in hotels_in_dest if h["price"] <= budget_max]
+        if under:
+            return sorted(under, key=lambda x: abs(x["price"] - budget_max))[0]
+        return sorted(hotels_in_dest, key=lambda x: x["price"])[0] if hotels_in_dest else None
+    return sorted(hotels_in_dest, key=lambda x: x.get("price", 999999))[0] if hotels_in_dest else None
+
+
+class RecommendationEngine:
+    def __init__(self, catalog: Catalog, users: List[Dict[str, Any]], explore_memo_size: int = 256,
+                 parse_memo_size: int = 4096, hotel_rerank_k: int = RERANK_TOP_K, itinerary_memo_size: int = 512):
+        self.catalog = catalog
+        self.users = users
+        self.user_map = {u["id"]: u for u in users}
+        self.known_city_names = set([d["name"].lower() for d in catalog.destinations] + EXTRA_CITY_NAMES)
+        # typo-tolerant names: cities, aliases ("bangalore") and curated POIs ("taj mahal" -> Agra)
+        self.place_index = PlaceIndex.for_cities([d["name"] for d in catalog.destinations] + EXTRA_CITY_NAMES,
+                                                 pois_by_city=POIS_BY_CITY)
+        self._dest_id_by_name = {d["name"].lower(): d["id"] for d in catalog.destinations}
+
+        # shared caches (thread-safe); explore entries for updated destinations are dropped eagerly
+        self.parse_memo = LRUMemo(maxsize=parse_memo_size)
+        self.score_tables = LRUMemo(maxsize=1024)
+        self.explore_memo = LRUMemo(maxsize=explore_memo_size)
+        self.itinerary_memo = LRUMemo(maxsize=itinerary_memo_size)
+        self.poi_index = HotelPOIIndex(catalog)
+        self.poi_search = POISearchIndex(catalog.pois_map)
+        catalog.subscribe(lambda version, changed: [self.poi_search.set_city(d, catalog.pois_map.get(d, [])) for d in changed])
+        self._graphs = LRUMemo(maxsize=2)
+        self._journey_planners = LRUMemo(maxsize=2)
+        self._semantic = LRUMemo(maxsize=2)
+        self._semantic_latest = None
+        # hotel pick: budget band -> score_items -> LLM/heuristic re-rank of the top hotel_rerank_k
+        self.hotel_cascade = HotelCascade(catalog, rerank=choose_hotel_with_gemini, rerank_k=hotel_rerank_k)
+        catalog.subscribe(lambda version, changed: self.explore_memo.invalidate(lambda k: k[1] in changed))
+        catalog.subscribe(lambda version, changed: self.itinerary_memo.invalidate(lambda k: k[0] in changed))
+        metrics.watch_memo("parse", self.parse_memo)
+        metrics.watch_memo("dest_score_tables", self.score_tables)
+        metrics.watch_memo("explore", self.explore_memo)
+        metrics.watch_memo("itinerary", self.itinerary_memo)
+        metrics.watch_memo("hotel_decisions", self.hotel_cascade.decisions)
+        # event-decayed popularity per hotel / destination / poi, fed by attach_event_sink()
+        self.popularity = PopularityTracker()
+
+    @classmethod
+    def from_mock_data(cls, seed=42, **kwargs):
+        d = generate_mock_data(seed)
+        catalog = Catalog(d["destinations"], d["hotels"], d["flights"], d["trains"], get_pois_map(d["destinations"], seed=seed), seed=seed)
+        return cls(catalog, d["users"], **kwargs)
+
+    def past_trips(self, user_id, past_trips=None):
+        if past_trips is not None:
+            return past_trips
+        return self.user_map.get(user_id, {}).get("past_trips", [])
+
+    # --------------------------- Live popularity ---------------------------
+    def _event_items(self, item_id):
+        """[(kind, id)] an event about item_id counts towards: the item and its destination."""
+        c = self.catalog
+        if item_id in c.dest_map:
+            return [("destination", item_id)]
+        hotel = c.get("hotel", item_id)
+        if hotel:
+            return [("hotel", item_id), ("destination", hotel["destination_id"])]
+        if item_id in c.poi_by_id:
+            return [("poi", item_id), ("destination", c._poi_dest[item_id])]
+        for kind in ("flight", "train"):
+            rec = c.get(kind, item_id)
+            if rec:
+                dest_id = c.dest_id_by_name.get(rec["to"].lower())
+                return [("destination", dest_id)] if dest_id else []
+        return []
+
+    def record_events(self, batch):
+        """Count (ts, event, user, item, extra) rows, as written by events.EventSink, into live popularity."""
+        updates = []
+        for ts, event, _user, item_id, _extra in batch:
+            if not item_id:
+                continue
+            w = EVENT_WEIGHTS.get(event, DEFAULT_EVENT_WEIGHT)
+            updates.extend((kind, key, w, ts) for kind, key in self._event_items(item_id))
+        if updates:
+            self.popularity.add_many(updates)
+            self.popularity.maybe_publish()
+
+    def attach_event_sink(self, sink):
+        """Replay the sink's recent history into live popularity, then follow what's stored (by any process)."""
+        since = time.time() - POPULARITY_REPLAY_HALF_LIVES * self.popularity.half_life_s
+        # replay and follow-up come from the stored table, so other processes' events count too
+        sink.subscribe(self.record_events, replay_since=since)
+        self.popularity.publish()
+        # events that land between two publishes go out on the next idle flush
+        sink.on_tick(self.popularity.maybe_publish)
+        return sink
+
+    # --------------------------- City resolution ---------------------------
+    def resolve_city_name(self, name):
+        if not name: return None
+        s = str(name).strip().lower()
+        destinations = self.catalog.destinations
+        if s in self.known_city_names:
+            for d in destinations:
+                if d["name"].lower() == s:
+                    return d["name"]
+            return s.title()
+        for d in destinations:
+            dn = d["name"].lower()
+            if dn.startswith(s) or s.startswith(dn) or s in dn or dn in s:
+                return d["name"]
+        s2 = re.sub(r'\b(to|from)\b', '', s).strip()
+        for d in destinations:
+            dn = d["name"].lower()
+            if s2 and (s2 == dn or s2 in dn or dn in s2):
+                return d["name"]
+        # misspellings, aliases and POI names
+        hits = self.place_index.search(s2 or s, limit=1)
+        return hits[0].value if hits else None
+
+    def _fuzzy_city_mentions(self, text, destinations_only=False):
+        """[(city name, start, end)] for misspelled / alias / POI mentions in text."""
+        out = []
+        for m in self.place_index.find_in_text(text):
+            if destinations_only and m.value.lower() not in self._dest_id_by_name:
+                continue
+            out.append((m.value.lower(), m.start, m.end))
+        return out
+
+    def detect_destination_in_text(self, text):
+        if not text: return None
+        t_lower = text.lower()
+        matches = []
+        for d in self.catalog.destinations:
+            name_lower = d["name"].lower()
+            for m in re.finditer(r'\b' + re.escape(name_lower) + r'\b', t_lower):
+                matches.append((d["id"], name_lower, m.start(), m.end()))
+        # misspelled / alias mentions count too ("trip to varansi from delhi"); anything inside
+        # "from ..." is the origin, and only an exact name there is used when nothing else matched
+        span = origin_span(t_lower)
+        in_origin = lambda m: span is not None and span[0] <= m[2] < span[1]
+        fuzzy = [(self._dest_id_by_name[c], c, s, en) for c, s, en in self._fuzzy_city_mentions(text, destinations_only=True)
+                 if all(en <= m[2] or s >= m[3] for m in matches)]
+        matches = [m for m in matches + fuzzy if not in_origin(m)] or matches
+        if not matches: return None
+        to_match = re.search(r'\bto\b', t_lower)
+        if to_match:
+            to_pos = to_match.end()
+            after_to = [m for m in matches if m[2] >= to_pos]
+            if after_to:
+                chosen = sorted(after_to, key=lambda x: x[2])[0]
+                return chosen[0]
+        chosen = sorted(matches, key=lambda x: x[2])[-1]
+        return chosen[0]
+
+    def detect_origin_in_text(self, text):
+        if not text: return None
+        t_lower = text.lower()
+        matches = []
+        for cname in self.known_city_names:
+            for m in re.finditer(r'\b' + re.escape(cname) + r'\b', t_lower):
+                matches.append((cname, m.start(), m.end()))
+        if not matches:
+            # fuzzy mentions only count as an origin when they follow "from"
+            from_match = re.search(r'\bfrom\b', t_lower)
+            fuzzy = self._fuzzy_city_mentions(text) if from_match else []
+            matches = [m for m in fuzzy if m[1] >= from_match.end()]
+        if not matches: return None
+        from_match = re.search(r'\bfrom\b', t_lower)
+        if from_match:
+            from_pos = from_match.end()
+            after_from = [m for m in matches if m[1] >= from_pos]
+            if after_from:
+                chosen = sorted(after_from, key=lambda x: x[1])[0]
+                return self.resolve_city_name(chosen[0])
+        to_match = re.search(r'\bto\b', t_lower)
+        if to_match:
+            to_pos = to_match.start()
+            before_to = [m for m in matches if m[2] <= to_pos]
+            if before_to:
+                chosen = sorted(before_to, key=lambda x: x[1])[-1]
+                return self.resolve_city_name(chosen[0])
+        chosen = sorted(matches, key=lambda x: x[1])[0]
+        return self.resolve_city_name(chosen[0])
+
+    # --------------------------- Search parsing ---------------------------
+    @traced("parse_search")
+    def parse_search(self, text, cache=None, lane="parse"):
+        """
+        Parse free text into search signals (uses gemini_wrapper.parse_search_with_gemini but falls back).
+        cache: optional dict (e.g. a Streamlit session cache) in front of the engine's shared LRU.
+        Callers always get their own copy (the session cache keeps one per session), so they may
+        edit what they got back.
+        lane: remote LLM quota lane ("background" for warm-up / prefetch).
+        """
+        if not text or text.strip() == "": return {}
+        if cache is None:
+            # the memoized dict is shared by every caller; hand out a copy
+            return copy.deepcopy(self.parse_memo.get_or_compute(text, lambda: self._parse_search_uncached(text, lane)))
+        if text in cache:
+            CACHE_REQUESTS.inc(cache="search", result="hit")
+            return cache[text]
+        CACHE_REQUESTS.inc(cache="search", result="miss")
+        parsed = copy.deepcopy(self.parse_memo.get_or_compute(text, lambda: self._parse_search_uncached(text, lane)))
+        cache[text] = parsed
+        return parsed
+
+    def _early_field(self, early, key, value):
+        """
+        Streamed parse callback: resolve destination / origin (and warm that destination's
+        hotel and travel indexes) while the model is still writing the remaining fields.
+        """
+        if key not in ("destination", "origin", "from") or not isinstance(value, str) or not value.strip():
+            return
+        resolved = self.resolve_city_name(value)
+        early[value] = resolved
+        dest_id = self._dest_id_by_name.get((resolved or "").lower())
+        if key == "destination" and dest_id:
+            self.hotel_cascade.warm(dest_id)
+            self.poi_index.for_destination(dest_id)
+
+    def _parse_search_uncached(self, text, lane="parse"):
+        dest_map = self.catalog.dest_map
+        field_sources = {}
+        parsed = {}
+        early = {}       # raw city text -> resolve_city_name() result, filled while a remote parse streams
+        resolve = lambda v: early[v] if isinstance(v, str) and v in early else self.resolve_city_name(v)
+        source = "failed"
+        t0 = time.perf_counter()
+        try:
+            parsed = parse_search_with_gemini(text, lane=lane, on_field=functools.partial(self._early_field, early)) or {}
+            # labelled by the parser that produced the result: a failed remote parse falls back to the local one
+            source = parsed.pop("_source", "heuristic")
+            for k in parsed.keys():
+                field_sources[k] = source
+        except Exception:
+            parsed = {}
+        finally:
+            PARSE_SECONDS.observe(time.perf_counter() - t0, source=source)
+        parsed.setdefault("tags", [])
+
+        if parsed.get("from") and not parsed.get("origin"):
+            parsed["origin"] = parsed.get("from"); field_sources.setdefault("origin", "gemini")
+
+        if parsed.get("destination_id"):
+            if parsed.get("destination_id") not in dest_map:
+                parsed.pop("destination_id", None)
+                field_sources.pop("destination_id", None)
+        if not parsed.get("destination_id"):
+            if parsed.get("destination") and isinstance(parsed.get("destination"), str):
+                resolved = resolve(parsed.get("destination"))
+                if resolved:
+                    for did, d in dest_map.items():
+                        if d["name"].lower() == resolved.lower():
+                            parsed["destination_id"] = did
+                            field_sources["destination_id"] = field_sources.get("destination", "heuristic")
+                            break
+            if not parsed.get("destination_id"):
+                dest_id_local = self.detect_destination_in_text(text)
+                if dest_id_local:
+                    parsed["destination_id"] = dest_id_local
+                    field_sources["destination_id"] = "heuristic"
+
+        origin_val = parsed.get("origin") or parsed.get("from") or parsed.get("source") or None
+        if origin_val:
+            resolved_origin = resolve(origin_val)
+            if resolved_origin:
+                parsed["origin"] = resolved_origin
+                field_sources["origin"] = field_sources.get("origin", "gemini" if parsed.get("from") or parsed.get("origin") else "heuristic")
+            else:
+                parsed["origin"] = origin_val
+                field_sources["origin"] = field_sources.get("origin","gemini")
+        else:
+            detected_origin = self.detect_origin_in_text(text)
+            if detected_origin:
+                parsed["origin"] = detected_origin
+                field_sources["origin"] = "heuristic"
+
+        budget_val = None
+        if isinstance(parsed.get("budget_max"), (int, float)):
+            budget_val = int(parsed.get("budget_max")); field_sources.setdefault("budget_max", "gemini")
+        elif parsed.get("max_price") and isinstance(parsed.get("max_price"), (int, float)):
+            budget_val = int(parsed.get("max_price")); field_sources.setdefault("max_stops", "gemini")
+        elif parsed.get("budget_max"):
+            budget_val = _parse_budget_string(parsed.get("budget_max")); field_sources.setdefault("budget_max", "gemini")
+        elif parsed.get("max_price"):
+            budget_val = _parse_budget_string(parsed.get("max_price")); field_sources.setdefault("max_price", "gemini")
+        elif parsed.get("budget"):
+            budget_val = _parse_budget_string(parsed.get("budget")); field_sources.setdefault("budget", "gemini")
+        if budget_val is None:
+            m = re.search(r"(?:under|below|less than|up to|upto)\s*([0-9\.,kKmM₹$usd ]+)", text, flags=re.IGNORECASE)
+            if m:
+                budget_val = _parse_budget_string(m.group(1))
+                field_sources["budget_max"] = "heuristic"
+        if budget_val is not None:
+            parsed["budget_max"] = int(budget_val)
+
+        if parsed.get("nights") is None:
+            m = re.search(r'(\d+)\s*(?:nights|night)', text, flags=re.IGNORECASE)
+            if m:
+                try:
+                    parsed["nights"] = int(m.group(1)); field_sources["nights"] = "heuristic"
+                except:
+                    pass
+
+        parsed["query_text"] = text
+        parsed["_field_sources"] = field_sources
+        return parsed
+
+    # --------------------------- Recommendations ---------------------------
+    def destination_score_table(self, interests):
+        # keyed on the interest signature (profile interests + parsed tags)
+        return self.score_tables.get_or_compute(tuple(interests), lambda: DestinationScoreTable(self.catalog.destinations, interests))
+
+    def semantic_index(self):
+        """Embeddings of destinations, hotels and POIs for the current catalog version."""
+        return self._semantic.get_or_compute(self.catalog.version, self._build_semantic_index)
+
+    def _build_semantic_index(self):
+        # after a delta only the changed destinations are re-embedded (SemanticIndex.updated)
+        prev = self._semantic_latest
+        changed = self.catalog.changed_since(prev.version) if prev is not None else None
+        index = SemanticIndex(self.catalog) if changed is None else prev.updated(self.catalog, changed)
+        self._semantic_latest = index
+        return index
+
+    def semantic_matches(self, text, kind, k=SEMANTIC_CANDIDATES):
+        """{item id: similarity} of the k items of kind closest in meaning to text."""
+        if not text or not str(text).strip():
+            return {}
+        return {item["id"]: s for item, s in self.semantic_index().search(text, kind, k, min_sim=SEMANTIC_MIN_SIM)}
+
+    @traced("destination_recommendations")
+    def destination_recommendations(self, user_profile, parsed_signals, limit=6):
+        interests = (user_profile.get("interests") or []) + (parsed_signals.get("tags") or [])
+        budget_max = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max")
+        table = self.destination_score_table(interests)
+        sims = self.semantic_matches(parsed_signals.get("query_text"), "destination")
+        live = self.popularity.live("destination")
+        if not sims and live is None:
+            return table.rank(budget_max, limit)
+        # candidates: best by the rule-based score plus the query's semantic neighbours ("hill station" -> Shimla)
+        scores = table.scores(budget_max)
+        dests = table.destinations
+        if live is not None:
+            # trending destinations (recent bookings) move up
+            scores = [sc + DEST_POPULARITY_WEIGHT * live.get(d["id"], 0.0) for sc, d in zip(scores, dests)]
+        cand = set(heapq.nlargest(limit * 2, range(len(scores)), key=scores.__getitem__))
+        cand.update(i for i, d in enumerate(dests) if d["id"] in sims)
+        ranked = sorted(cand, key=lambda i: (-(scores[i] + SEMANTIC_DEST_WEIGHT * sims.get(dests[i]["id"], 0.0)), i))
+        return [dests[i] for i in ranked[:limit]]
+
+    @traced("hotel_recommendations")
+    def hotel_recommendations(self, user_profile, parsed_signals, limit=6, user_id=None, past_trips=None):
+        dest_id = parsed_signals.get("destination_id")
+        query = parsed_signals.get("query_text")
+        cand = self.catalog.hotels
+        sims = {}
+        if dest_id:
+            cand = self.catalog.hotels_by_dest.get(dest_id, [])
+            if query:
+                sims = {i: s for i, s in self.semantic_index().score(query, "hotel", [h["id"] for h in cand]).items()
+                        if s >= SEMANTIC_MIN_SIM}
+        elif query:
+            top = self.semantic_index().search(query, "hotel", SEMANTIC_CANDIDATES, min_sim=SEMANTIC_MIN_SIM)
+            sims = {h["id"]: s for h, s in top}
+            if len(cand) > SEMANTIC_FULL_SCAN_MAX and top:
+                cand = [h for h, _ in top]
+        budget = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max")
+        if budget:
+            cand = [h for h in cand if h.get("price", 999999) <= budget or abs(h.get("price",0)-budget) < budget*0.5]
+        trips = self.past_trips(user_id, past_trips)
+        base = score_items(cand, user_profile, user_past_trips=trips, popularity=self.popularity.live("hotel"))
+        order = sorted(range(len(cand)), key=lambda i: base[i] + SEMANTIC_HOTEL_WEIGHT * sims.get(cand[i]["id"], 0.0), reverse=True)
+        scored = [cand[i] for i in order]
+        FILTER_RESULTS.observe(len(cand), kind="hotels")
+        return scored[:limit]
+
+    @traced("filter_flights")
+    def filter_flights(self, filters: dict):
+        res = self.catalog.flights
+        f_from = filters.get("from")
+        f_to = filters.get("to")
+        max_price = filters.get("max_price")
+        max_stops = filters.get("max_stops")
+        if f_to:
+            res = self.catalog.flights_by_to.get(f_to.lower(), [])
+        if f_from:
+            res = [f for f in res if f["from"].lower() == f_from.lower()]
+        if max_price:
+            res = [f for f in res if f["price"] <= max_price]
+        if max_stops is not None:
+            res = [f for f in res if f["stops"] <= max_stops]
+        res = sorted(res, key=lambda x: (x["price"], x["duration_mins"]))
+        FILTER_RESULTS.observe(len(res), kind="flights")
+        return res
+
+    @traced("filter_trains")
+    def filter_trains(self, filters: dict):
+        res = self.catalog.trains
+        f_from = filters.get("from")
+        f_to = filters.get("to")
+        seat_class = filters.get("seat_class")
+        max_price = filters.get("max_price")
+        if f_to:
+            res = self.catalog.trains_by_to.get(f_to.lower(), [])
+        if f_from:
+            res = [t for t in res if t["from"].lower() == f_from.lower()]
+        if seat_class:
+            res = [t for t in res if t.get("class") == seat_class]
+        if max_price:
+            res = [t for t in res if t["price"] <= max_price]
+        res = sorted(res, key=lambda x: (x["price"], x["duration_mins"]))
+        FILTER_RESULTS.observe(len(res), kind="trains")
+        return res
+
+    @traced("search_pois")
+    def search_pois(self, query, dest_id=None, limit=10):
+        """Full-text POI search (names and categories), in one destination or across all of them."""
+        res = [dict({k: v for k, v in p.items() if k != "travel_to"}, destination_id=d, score=s)
+               for d, p, s in self.poi_search.search(query or "", dest_id=dest_id, limit=limit)]
+        FILTER_RESULTS.observe(len(res), kind="pois")
+        return res
+
+    def journey_planner(self):
+        """Connection table for the current catalog version (built once per version)."""
+        return self._journey_planners.get_or_compute(self.catalog.version, lambda: JourneyPlanner(self.catalog.flights, self.catalog.trains))
+
+    @traced("search_journeys")
+    def search_journeys(self, filters: dict):
+        """
+        Direct and connecting flight / train journeys, Pareto-optimal by price,
+        duration and transfers. filters: from, to (required), depart_after ("HH:MM"),
+        max_price, max_transfers, modes (["flight", "train"]), limit.
+        """
+        f_from, f_to = filters.get("from"), filters.get("to")
+        if not f_from or not f_to:
+            return []
+        kwargs = {k: filters[k] for k in ("max_transfers", "modes", "limit") if filters.get(k) is not None}
+        res = self.journey_planner().search(f_from, f_to, depart_after=filters.get("depart_after") or "00:00",
+                                            max_price=_normalize_max_price(filters.get("max_price")), **kwargs)
+        FILTER_RESULTS.observe(len(res), kind="journeys")
+        return res
+
+    # --------------------------- Explore view ---------------------------
+    @traced("build_explore_view")
+    def build_explore_view(self, dest_id, user_profile, parsed_signals, active_user_id, past_trips=None):
+        """Memoized on (user, destination, parsed signals, destination catalog version, profile / trips)."""
+        key = (active_user_id, dest_id, _explore_signals_key(parsed_signals), self.catalog.dest_version(dest_id),
+               _profile_key(user_profile, self.past_trips(active_user_id, past_trips)))
+        return self.explore_memo.get_or_compute(key, lambda: self._compute_explore_view(dest_id, user_profile, parsed_signals, active_user_id, past_trips))
+
+    @traced("build_explore_view.compute")
+    def _compute_explore_view(self, dest_id, user_profile, parsed_signals, active_user_id, past_trips=None):
+        dest = self.catalog.dest_map.get(dest_id)
+        if not dest:
+            return None
+
+        hotels_in_dest = self.catalog.hotels_by_dest.get(dest_id, [])
+        trips = self.past_trips(active_user_id, past_trips)
+        budget_max = (parsed_signals or {}).get("budget_max") or user_profile.get("budget", {}).get("max")
+        short = self.hotel_cascade.shortlist(dest_id, user_profile, trips, budget_max,
+                                             popularity=self.popularity.live("hotel"))
+        pick = self.hotel_cascade.decide(dest_id, short, user_profile, trips)
+        chosen_hotel = pick["hotel"]
+        reason_text = pick["reason"]
+        if not chosen_hotel:
+            chosen_hotel = _fallback_hotel(hotels_in_dest, parsed_signals.get("budget_max") if parsed_signals else None)
+            if chosen_hotel:
+                reason_text = f"Auto-picked: {chosen_hotel.get('rating','?')}★ • {format_rupee(chosen_hotel.get('price',0))}"
+
+        interests = parsed_signals.get("tags", []) if parsed_signals else []
+        interests = interests or user_profile.get("interests", [])
+        # rank the chosen hotel's nearest POIs (travel from that hotel, not the per-POI average)
+        nearby = []
+        if chosen_hotel:
+            block = self.poi_index.for_destination(dest_id)
+            candidates = block.nearest_pois(chosen_hotel["id"])
+            nearby = [{"id": p["id"], "name": p["name"], "minutes_from_hotel": m} for p, m, _ in block.within(chosen_hotel["id"], NEARBY_MINUTES)]
+        else:
+            candidates = [(p, p.get("approx_travel_mins_from_hotel", 999), p.get("approx_cost_from_hotel"))
+                          for p in self.catalog.pois_map.get(dest_id, [])[:30]]
+        matched = self.poi_search.interest_scores(dest_id, interests)
+        def poi_rank(c):
+            p, mins, _ = c
+            return matched.get(p["id"], 0.0) - mins/100.0
+        pois_sorted = [dict(p, minutes_from_hotel=m, cost_from_hotel=c)
+                       for p, m, c in sorted(candidates, key=poi_rank, reverse=True)[:10]]
+
+        nights = parsed_signals.get("nights") if parsed_signals and parsed_signals.get("nights") else 2
+        it = self._pace_itinerary(dest_id, nights, interests, "normal")
+
+        return {
+            "destination": dest,
+            "recommended_hotel": chosen_hotel,
+            "hotel_reason": reason_text,
+            "pois": pois_sorted,
+            "nearby_pois": nearby,
+            "itinerary": it,
+            "hotel_poi_travel": self._itinerary_travel(dest_id, chosen_hotel, [it]),
+            "hotel_cascade": _cascade_info(short, pick)
+        }
+
+    def _itinerary_travel(self, dest_id, hotel, itineraries):
+        """{poi_id: {"mins", "cost"}} from hotel for every POI in the given itineraries."""
+        if not hotel:
+            return {}
+        poi_ids = {p["id"] for it in itineraries if it for day in it.get("days", [])
+                   for slot in ["morning", "afternoon", "evening"] for p in day.get(slot, [])}
+        return self.poi_index.travel_map(dest_id, hotel["id"], poi_ids)
+
+    # --------------------------- Itinerary bundle ---------------------------
+    def _pace_itinerary(self, dest_id, nights, interests, pace):
+        """Memoized per destination version; itineraries start today, so the date is part of the key."""
+        key = (dest_id, self.catalog.dest_version(dest_id), nights, tuple(interests or []), pace,
+               datetime.date.today().isoformat())
+        return self.itinerary_memo.get_or_compute(key, lambda: self._generate_itinerary(dest_id, nights, interests, pace))
+
+    @traced("generate_itinerary")
+    def _generate_itinerary(self, dest_id, nights, interests, pace):
+        pois_map = self.catalog.pois_map
+        try:
+            return generate_itinerary(dest_id, start_date_str=None, nights=nights, interests=interests, pace=pace,
+                                      pois_map=pois_map, search_index=self.poi_search)
+        except TypeError:
+            # in case generate_itinerary doesn't accept pace, fall back to default
+            return generate_itinerary(dest_id, start_date_str=None, nights=nights, interests=interests, pois_map=pois_map)
+
+    @traced("build_itinerary_bundle")
+    @BUNDLE_BUILD_SECONDS.time()
+    def build_itinerary_bundle(self, user_profile, parsed_signals, active_user_id, concurrent=None,
+                               deadline_s=BUNDLE_DEADLINE_S, past_trips=None):
+        """
+        Build a complete trip bundle:
+        - Choose destination (from parsed or recommendations)
+        - Choose hotel (LLM/heuristic)
+        - Find flights & trains
+        - Build itineraries for paces: relaxed, normal, packed
+        - Search hotel x transport x pace for the best bundles within budget
+        - Compute approximate cost ranges
+        Stages that miss the deadline are listed in "timed_out", stages that raise in
+        "failed" ({stage: error}, also logged); both are left out of the result.
+        """
+        # destination
+        dest_id = parsed_signals.get("destination_id")
+        if not dest_id:
+            # fall back to top recommended destination
+            top_dest = self.destination_recommendations(user_profile, parsed_signals, limit=1)
+            if not top_dest:
+                return None
+            dest_id = top_dest[0]["id"]
+        dest = self.catalog.dest_map.get(dest_id)
+        if not dest:
+            return None
+
+        nights = parsed_signals.get("nights") or 2
+        interests = parsed_signals.get("tags") or user_profile.get("interests", [])
+        budget_max = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max", None)
+        origin = parsed_signals.get("origin")
+
+        hotels_in_dest = self.catalog.hotels_by_dest.get(dest_id, [])
+        trips = self.past_trips(active_user_id, past_trips)
+        # retrieval + scoring take milliseconds; only the re-rank runs as a (deadline-bound) stage
+        live = self.popularity.live("hotel")
+        short = self.hotel_cascade.shortlist(dest_id, user_profile, trips, budget_max,
+                                             signals={"search_budget_max": parsed_signals.get("budget_max")},
+                                             popularity=live)
+
+        to_city = dest["name"]
+        max_price = _normalize_max_price(budget_max) if budget_max else None
+        flight_filters = {
+            "from": origin,
+            "to": to_city,
+            "max_price": max_price or None,
+            "max_stops": 2
+        }
+        train_filters = {
+            "from": origin,
+            "to": to_city,
+            "seat_class": None,
+            "max_price": max_price or 3000
+        }
+
+        # hotel choice, travel options and per-pace itineraries are independent once the
+        # destination is known; run them as stages (concurrently unless disabled)
+        stages = {
+            "hotel": lambda: self.hotel_cascade.decide(dest_id, short, user_profile, trips),
+            "flights": lambda: self.filter_flights(flight_filters)[:BUNDLE_TOP_K],
+            "trains": lambda: self.filter_trains(train_filters)[:BUNDLE_TOP_K],
+        }
+        for pace in BUNDLE_PACES:
+            stages[f"itinerary_{pace}"] = functools.partial(self._pace_itinerary, dest_id, nights, interests, pace)
+        stages = {k: traced(f"bundle.{k}")(fn) for k, fn in stages.items()}
+        if concurrent is None:
+            concurrent = BUNDLE_CONCURRENT
+        results, timed_out, errors = run_stages(stages, deadline_s=deadline_s, parallel=concurrent)
+        for name, e in errors.items():
+            log.error("bundle stage %s failed for %s", name, dest_id, exc_info=e)
+
+        # hotel (LLM/heuristic pick; heuristic fallback if the stage timed out or failed)
+        pick = results.get("hotel") or {}
+        chosen_hotel = pick.get("hotel")
+        reason_text = pick.get("reason", "")
+        if not chosen_hotel:
+            chosen_hotel = _fallback_hotel(hotels_in_dest, budget_max)
+            if chosen_hotel:
+                reason_text = f"Auto-picked: {chosen_hotel.get('rating','?')}★ • {format_rupee(chosen_hotel.get('price',0))}"
+
+        # travel options
+        flight_cands = results.get("flights") or []
+        flight_options = flight_cands[:3]
+        train_cands = results.get("trains") or []
+        train_options = train_cands[:3]
+
+        # itineraries for each pace (missing if the stage timed out or failed)
+        itineraries = {}
+        for pace in BUNDLE_PACES:
+            if f"itinerary_{pace}" in results:
+                itineraries[pace] = results[f"itinerary_{pace}"]
+
+        # combinational search over hotel x transport x pace within budget
+        levels = _bundle_levels(short["ranked"], chosen_hotel, flight_cands, train_cands, itineraries,
+                                user_profile, parsed_signals, trips, nights, interests, popularity=live)
+        found = optimize_bundles(levels, budget_max=max_price, top_n=5)
+        best = found["best"][0] if found["best"] else None
+
+        # cost computation
+        cost_summary = {}
+        base_travel_cost = None
+        recommended_pace = "normal"
+        if best:
+            hotel_o, transport_o, pace_o = best["picks"]
+            if hotel_o["item"] is not chosen_hotel:
+                chosen_hotel = hotel_o["item"]
+                reason_text = f"Best fit within budget: {chosen_hotel.get('rating','?')}★ • {format_rupee(chosen_hotel.get('price',0))}"
+            base_travel_cost = transport_o["cost"]
+            recommended_pace = pace_o["item"]
+        elif flight_options:
+            base_travel_cost = flight_options[0]["price"]
+        elif train_options:
+            base_travel_cost = train_options[0]["price"]
+        else:
+            base_travel_cost = 0
+
+        hotel_cost = (chosen_hotel["price"] * nights) if chosen_hotel else 0
+
+        for pace, it in itineraries.items():
+            poi_cost = _compute_poi_cost_for_itinerary(it)
+            base_total = base_travel_cost + hotel_cost + poi_cost
+            # show a range ±15% to account for food/misc.
+            min_cost = int(base_total * 0.85)
+            max_cost = int(base_total * 1.15)
+            cost_summary[pace] = {
+                "base_total": base_total,
+                "min": min_cost,
+                "max": max_cost,
+                "poi_cost": poi_cost,
+                "hotel_cost": hotel_cost,
+                "travel_cost": base_travel_cost
+            }
+
+        return {
+            "destination": dest,
+            "nights": nights,
+            "interests": interests,
+            "hotel": chosen_hotel,
+            "hotel_reason": reason_text,
+            "flights": flight_options,
+            "trains": train_options,
+            "itineraries": itineraries,
+            "hotel_poi_travel": self._itinerary_travel(dest_id, chosen_hotel, itineraries.values()),
+            "cost_summary": cost_summary,
+            "within_budget": best is not None,
+            "recommended_pace": recommended_pace,
+            "best_bundles": [_bundle_summary(b) for b in found["best"]],
+            "pareto_bundles": [_bundle_summary(b) for b in found["pareto"]],
+            "timed_out": sorted(timed_out),
+            "failed": {name: repr(e) for name, e in sorted(errors.items())},
+            "hotel_cascade": _cascade_info(short, pick)
+        }
+
+    # --------------------------- Multi-city ---------------------------
+    def transport_graph(self):
+        """Inter-city route table for the current catalog version."""
+        return self._graphs.get_or_compute(self.catalog.version, lambda: TransportGraph(self.catalog.flights, self.catalog.trains))
+
+    @traced("plan_multi_city")
+    def plan_multi_city(self, user_profile, parsed_signals, origin, total_nights=None, dest_ids=None,
+                        max_cities=MULTICITY_MAX_CITIES, user_id=None, past_trips=None, return_to_origin=True):
+        """
+        Order and split nights over several destinations starting (and by default ending) at origin.
+        dest_ids defaults to the top destination_recommendations (excluding the origin itself).
+        """
+        origin_name = self.resolve_city_name(origin) if origin else None
+        if not origin_name:
+            return None
+        total_nights = total_nights or parsed_signals.get("nights") or MULTICITY_DEFAULT_NIGHTS
+        interests = parsed_signals.get("tags") or user_profile.get("interests", [])
+        budget_max = parsed_signals.get("budget_max") or user_profile.get("budget", {}).get("max")
+        trips = self.past_trips(user_id, past_trips)
+
+        table = self.destination_score_table((user_profile.get("interests") or []) + (parsed_signals.get("tags") or []))
+        score_by_id = {d["id"]: s for d, s in zip(table.destinations, table.scores(budget_max))}
+        if dest_ids is None:
+            ranked = self.destination_recommendations(user_profile, parsed_signals, limit=max_cities + 1)
+            dests = [d for d in ranked if d["name"].lower() != origin_name.lower()][:max_cities]
+        else:
+            dests = [self.catalog.dest_map[d] for d in dest_ids if d in self.catalog.dest_map]
+
+        # about half of the budget per night goes to the hotel
+        nightly_cap = budget_max / total_nights * 0.5 if budget_max else None
+        stops = []
+        for d in dests:
+            hotels_in_dest = self.catalog.hotels_by_dest.get(d["id"], [])
+            fitting = [h for h in hotels_in_dest if not nightly_cap or h["price"] <= nightly_cap]
+            if fitting:
+                live = self.popularity.live("hotel")
+                hotel = max(fitting, key=lambda h: score_item(h, user_profile, user_past_trips=trips, popularity=live))
+            else:
+                hotel = min(hotels_in_dest, key=lambda h: h["price"]) if hotels_in_dest else None
+            pois = self.catalog.pois_map.get(d["id"], [])
+            per_poi = sum(p.get("approx_cost_from_hotel", 0) or 0 for p in pois) / len(pois) if pois else 0
+            stops.append({
+                "destination": d,
+                "score": score_by_id.get(d["id"], 0.0),
+                "hotel": hotel,
+                "night_cost": hotel["price"] if hotel else 0,
+                "poi_cost_per_night": per_poi * 3,
+            })
+
+        def leg_itinerary(dest_id, nights, start_date_str):
+            return generate_itinerary(dest_id, start_date_str=start_date_str, nights=nights, interests=interests,
+                                      pace="normal", pois_map=self.catalog.pois_map, search_index=self.poi_search)
+
+        plan = plan_trip(origin_name, stops, total_nights, self.transport_graph(), leg_itinerary, return_to_origin=return_to_origin)
+        if plan:
+            plan["within_budget"] = not budget_max or plan["cost"]["total"] <= budget_max
+        return plan
@@ -0,0 +1,266 @@
+# events.py
+"""
+Durable user events (bookings, clicks) for popularity / personalization.
+
+    sink = EventSink("events.db").start()
+    sink.emit("book_hotel", user_id, hotel_id)      # request path: one deque append
+    ...
+    sink.close()                                    # flush what's left (also registered atexit)
+
+emit() only appends to an in-memory ring (a deque: append / popleft are atomic
+under the GIL, so producers never take a lock). A background thread drains it
+in batches into an append-only SQLite table in WAL mode, one transaction per
+batch, every FLUSH_INTERVAL_S or as soon as BATCH_SIZE events are waiting.
+
+Backpressure is bounded: when the ring holds `capacity` events (the store is
+slow or broken), emit() drops the new event and returns False instead of
+blocking or growing. A batch that fails to write is kept and retried; the ring
+keeps absorbing (and, once full, dropping) meanwhile.
+
+Listeners added with subscribe(fn) get every batch, as a list of
+(ts, event, user, item, extra_json) rows, on the writer thread. Batches are
+read back from the table by row id after each flush pass, so when several
+processes write to one file (api_server --processes, one sink per worker;
+WAL lets them commit in turn, a blocked writer waits up to BUSY_TIMEOUT_S)
+every process's listeners see every process's events, not just their own.
+subscribe(fn, replay_since=ts) first hands fn the stored rows from ts on, with
+no gap or overlap with what follows; read_since(ts) returns them directly.
+on_tick(fn) calls fn() on the writer thread after every flush pass, at least
+every flush_interval_s, whether or not anything was written.
+
+    SELECT item, COUNT(*) FROM events WHERE event = 'book_hotel' GROUP BY item
+"""
+
+import atexit
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import EVENTS, EVENT_BUFFER_DEPTH, EVENT_FLUSH_SECONDS
+
+# set TRAVEL_RECO_EVENTS_DB= (empty) to turn event recording off
+EVENTS_DB_PATH = os.environ.get("TRAVEL_RECO_EVENTS_DB", "events.db")
+BUFFER_CAPACITY = 65536
+BATCH_SIZE = 512
+FLUSH_INTERVAL_S = 1.0
+BUSY_TIMEOUT_S = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts    REAL NOT NULL,
+    event TEXT NOT NULL,
+    user  TEXT,
+    item  TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS events_item ON events (event, item);
+CREATE INDEX IF NOT EXISTS events_user ON events (user, ts);
+"""
+
+
+class EventSink:
+    def __init__(self, path: Optional[str] = EVENTS_DB_PATH, capacity: int = BUFFER_CAPACITY,
+                 batch_size: int = BATCH_SIZE, flush_interval_s: float = FLUSH_INTERVAL_S):
+        self.path = path
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._ring = collections.deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()   # flusher thread vs. flush() / close()
+        self._pending: List[tuple] = []        # batch whose write failed, retried first
+        self._listeners: List[Callable[[List[tuple]], None]] = []
+        self._tickers: List[Callable[[], None]] = []
+        self._conn = None
+        self._seen_id: Optional[int] = None   # last row id handed to listeners
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self) -> "EventSink":
+        if self._thread is None and self.path:
+            self._thread = threading.Thread(target=self._run, name="travel-reco-events", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def emit(self, event: str, user_id: Optional[str] = None, item_id: Optional[str] = None,
+             ts: Optional[float] = None, **extra: Any) -> bool:
+        """Queue one event; False if the ring is full (the event is dropped) or the sink is off."""
+        if not self.path:
+            return False
+        if len(self._ring) >= self.capacity:
+            self.dropped += 1
+            EVENTS.inc(result="dropped")
+            return False
+        self._ring.append((time.time() if ts is None else ts, event, user_id, item_id,
+                           json.dumps(extra, ensure_ascii=False, default=str) if extra else None))
+        if len(self._ring) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def subscribe(self, fn: Callable[[List[tuple]], None], replay_since: Optional[float] = None):
+        """
+        Call fn(rows) with each batch stored from now on, by any process (keep it quick: it runs on
+        the writer thread). With replay_since, fn first gets the stored rows with ts >= replay_since.
+        """
+        if not self.path:
+            self._listeners.append(fn)
+            return
+        with self._flush_lock:
+            try:
+                conn = self._connect()
+                if self._seen_id is None:
+                    self._seen_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+                rows = [] if replay_since is None else conn.execute(
+                    "SELECT ts, event, user, item, extra FROM events WHERE ts >= ? AND id <= ? ORDER BY id",
+                    (replay_since, self._seen_id)).fetchall()
+            except sqlite3.Error:
+                rows = []
+            self._listeners.append(fn)
+        if rows:
+            fn([tuple(r) for r in rows])
+
+    def on_tick(self, fn: Callable[[], None]):
+        """Call fn() after every flush pass, idle ones included (writer thread; keep it quick)."""
+        self._tickers.append(fn)
+
+    def depth(self) -> int:
+        return len(self._ring) + len(self._pending)
+
+    def flush(self) -> int:
+        """Write everything queued so far (blocks); returns how many events were written."""
+        if not self.path:
+            return 0
+        n = 0
+        with self._flush_lock:
+            while True:
+                wrote = self._flush_batch()
+                n += wrote
+                if not wrote or not self._ring:
+                    self._deliver()
+                    return n
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+        if self.path:
+            self.flush()
+        with self._flush_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: durable across process crashes, at most the last batch lost on power loss
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _flush_batch(self) -> int:
+        """One transaction of up to batch_size events (the failed batch first). Caller holds _flush_lock."""
+        batch = self._pending
+        self._pending = []
+        while len(batch) < self.batch_size and self._ring:
+            batch.append(self._ring.popleft())
+        EVENT_BUFFER_DEPTH.set(len(self._ring))
+        if not batch:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT INTO events (ts, event, user, item, extra) VALUES (?, ?, ?, ?, ?)", batch)
+        except sqlite3.Error:
+            self._pending = batch
+            EVENTS.inc(len(batch), result="retry")
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            return 0
+        EVENT_FLUSH_SECONDS.observe(time.perf_counter() - t0)
+        self.written += len(batch)
+        EVENTS.inc(len(batch), result="written")
+        return len(batch)
+
+    def _deliver(self):
+        """Hand listeners the rows stored since the last call, whoever wrote them. Caller holds _flush_lock."""
+        if not self._listeners:
+            return
+        while True:
+            try:
+                conn = self._connect()
+                if self._seen_id is None:
+                    # the store was unreachable when listeners subscribed: follow from here on
+                    self._seen_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+                rows = conn.execute(
+                    "SELECT id, ts, event, user, item, extra FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                    (self._seen_id, self.batch_size)).fetchall()
+            except sqlite3.Error:
+                return
+            if not rows:
+                return
+            self._seen_id = rows[-1][0]
+            batch = [tuple(r[1:]) for r in rows]
+            for fn in self._listeners:
+                try:
+                    fn(batch)
+                except Exception:
+                    pass
+            if len(rows) < self.batch_size:
+                return
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            with self._flush_lock:
+                while self._flush_batch() == self.batch_size:
+                    pass
+                self._deliver()
+            for fn in self._tickers:
+                try:
+                    fn()
+                except Exception:
+                    pass
+
+    def recent(self, limit: int = 100, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent stored events, newest first (flushes the ring first)."""
+        if not self.path:
+            return []
+        self.flush()
+        with self._flush_lock:
+            conn = self._connect()
+            q = "SELECT ts, event, user, item, extra FROM events"
+            args: list = []
+            if user_id is not None:
+                q += " WHERE user = ?"
+                args.append(user_id)
+            rows = conn.execute(q + " ORDER BY id DESC LIMIT ?", args + [int(limit)]).fetchall()
+        return [dict({"ts": ts, "event": ev, "user": u, "item": it}, **(json.loads(x) if x else {}))
+                for ts, ev, u, it, x in rows]
+
+    def read_since(self, ts: float) -> List[tuple]:
+        """Stored (ts, event, user, item, extra_json) rows with ts >= ts, in write order."""
+        if not self.path:
+            return []
+        with self._flush_lock:
+            try:
+                rows = self._connect().execute(
+                    "SELECT ts, event, user, item, extra FROM events WHERE ts >= ? ORDER BY id", (ts,)).fetchall()
+            except sqlite3.Error:
+                return []
+        return [tuple(r) for r in rows]
@@ -0,0 +1,236 @@
+# fuzzy.py
+"""
+Typo-tolerant lookup of place names: cities, their common aliases and POIs.
+
+A character-trigram index proposes candidates (entries sharing the most
+trigrams with the query); the best few are re-scored by edit similarity,
+1 - (optimal string alignment distance / longer length). "kolkatta",
+"banglore" and "varansi" score ~0.88 against the real names while ordinary
+words stay under TEXT_MIN_SCORE.
+
+    idx = PlaceIndex.for_cities(["Mumbai", "Varanasi"], pois_by_city=POIS_BY_CITY)
+    idx.search("varansi")                  # [Match(value="Varanasi", score=0.875, ...)]
+    idx.find_in_text("3 nights in varansi")  # [Match(..., start=12, end=19)]
+
+Values: cities and aliases map to the canonical city name; POIs map to the
+city they are in (entry kind "poi").
+"""
+
+import heapq
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# common alternative / old names -> canonical city name
+CITY_ALIASES = {
+    "bangalore": "Bengaluru",
+    "bombay": "Mumbai",
+    "calcutta": "Kolkata",
+    "madras": "Chennai",
+    "banaras": "Varanasi",
+    "benares": "Varanasi",
+    "kashi": "Varanasi",
+    "cochin": "Kochi",
+    "poona": "Pune",
+    "simla": "Shimla",
+    "new delhi": "Delhi",
+    "ladakh": "Leh",
+}
+
+# how many trigram candidates get the (slower) edit-distance re-score, and the
+# trigram overlap a candidate needs at all (a transposition like "dehli" still shares ~0.2)
+CANDIDATES = 8
+MIN_TRIGRAM_JACCARD = 0.15
+SEARCH_MIN_SCORE = 0.6
+# stricter bar when scanning free text, where most words aren't places
+TEXT_MIN_SCORE = 0.8
+# single words shorter than this must match exactly in free text ("goa", "leh", "pune")
+TEXT_MIN_FUZZY_LEN = 5
+TEXT_MAX_WORDS = 3
+
+# query words that are never places on their own (phrases containing them still are)
+STOPWORDS = {
+    "from", "to", "the", "and", "for", "with", "under", "below", "trip", "plan", "hotel", "hotels",
+    "flight", "flights", "train", "trains", "night", "nights", "days", "itinerary", "budget",
+    "weekend", "beach", "beaches", "family", "cheap", "best", "stay", "near", "visit", "places",
+}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+class Match(NamedTuple):
+    value: str
+    score: float
+    text: str               # the indexed name that matched
+    kind: str               # "city", "alias" or "poi"
+    start: Optional[int] = None   # span in the scanned text (find_in_text only)
+    end: Optional[int] = None
+
+
+def _norm(s: str) -> str:
+    return " ".join(_WORD.findall(str(s).lower().replace("'", "")))
+
+
+def _trigrams(s: str):
+    p = f"  {s} "
+    return {p[i:i + 3] for i in range(len(p) - 2)}
+
+
+def edit_similarity(a: str, b: str, min_score: float = 0.0) -> float:
+    """
+    1 - OSA distance (adjacent transpositions count once) / longer length.
+    Returns 0.0 early once the similarity is certain to fall below min_score.
+    """
+    if a == b:
+        return 1.0
+    la, lb = len(a), len(b)
+    if not la or not lb:
+        return 0.0
+    max_dist = int((1.0 - min_score) * max(la, lb))
+    if abs(la - lb) > max_dist:
+        return 0.0
+    prev2 = None
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        ca = a[i - 1]
+        for j in range(1, lb + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+        if min(cur) > max_dist:
+            return 0.0
+        prev2, prev = prev, cur
+    return 1.0 - prev[lb] / max(la, lb)
+
+
+_FROM = re.compile(r"\bfrom\b")
+_TO = re.compile(r"\bto\b")
+
+
+def origin_span(text: str) -> Optional[Tuple[int, int]]:
+    """(start, end) of the "from <place>" phrase in text (up to a later "to", else the end), or None."""
+    low = str(text).lower()
+    m = _FROM.search(low)
+    if not m:
+        return None
+    to = _TO.search(low, m.end())
+    return m.start(), to.start() if to else len(low)
+
+
+class PlaceIndex:
+    def __init__(self):
+        self._names: List[str] = []        # normalized indexed text per entry
+        self._values: List[str] = []
+        self._kinds: List[str] = []
+        self._grams: List[int] = []        # trigram count per entry
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, text: str, value: str, kind: str = "city"):
+        name = _norm(text)
+        if not name:
+            return
+        for e in self._exact.get(name, []):
+            if self._values[e] == value and self._kinds[e] == kind:
+                return
+        eid = len(self._names)
+        self._names.append(name)
+        self._values.append(value)
+        self._kinds.append(kind)
+        grams = _trigrams(name)
+        self._grams.append(len(grams))
+        for g in grams:
+            self._postings[g].append(eid)
+        self._exact[name].append(eid)
+
+    @classmethod
+    def for_cities(cls, city_names: Iterable[str], aliases: Optional[Dict[str, str]] = None,
+                   pois_by_city: Optional[Dict[str, Sequence]] = None) -> "PlaceIndex":
+        """Cities (canonical names), aliases of those cities and their POI names."""
+        idx = cls()
+        canonical = {}
+        for c in city_names:
+            canonical.setdefault(c.lower(), c if c[:1].isupper() else c.title())
+        for key, name in canonical.items():
+            idx.add(name, name, "city")
+        for alias, city in (CITY_ALIASES if aliases is None else aliases).items():
+            if city.lower() in canonical:
+                idx.add(alias, canonical[city.lower()], "alias")
+        for city, pois in (pois_by_city or {}).items():
+            if city.lower() not in canonical:
+                continue
+            for p in pois:
+                idx.add(p if isinstance(p, str) else p.get("name", ""), canonical[city.lower()], "poi")
+        return idx
+
+    def search(self, query: str, kinds: Optional[Sequence[str]] = None, limit: int = 5,
+               min_score: float = SEARCH_MIN_SCORE) -> List[Match]:
+        """Best matches for query, highest score first (one per value/kind)."""
+        q = _norm(query)
+        if not q:
+            return []
+        exact = [e for e in self._exact.get(q, []) if kinds is None or self._kinds[e] in kinds]
+        if exact:
+            return [Match(self._values[e], 1.0, self._names[e], self._kinds[e]) for e in exact[:limit]]
+        grams = _trigrams(q)
+        shared: Dict[int, int] = defaultdict(int)
+        for g in grams:
+            for e in self._postings.get(g, ()):
+                shared[e] += 1
+        if not shared:
+            return []
+        nq, lq = len(grams), len(q)
+        # entries whose length alone rules out min_score can't be candidates
+        slack = 1.0 - min_score
+        jacc = {}
+        for e, n in shared.items():
+            j = n / (nq + self._grams[e] - n)
+            if j < MIN_TRIGRAM_JACCARD or (kinds is not None and self._kinds[e] not in kinds):
+                continue
+            ln = len(self._names[e])
+            if abs(ln - lq) > slack * max(ln, lq):
+                continue
+            jacc[e] = j
+        # trigram Jaccard picks the candidates worth an edit-distance pass
+        best: Dict[tuple, Match] = {}
+        for e in heapq.nlargest(CANDIDATES, jacc, key=jacc.get):
+            score = edit_similarity(q, self._names[e], min_score)
+            if score < min_score:
+                continue
+            key = (self._values[e], self._kinds[e])
+            if key not in best or score > best[key].score:
+                best[key] = Match(self._values[e], round(score, 3), self._names[e], self._kinds[e])
+        return sorted(best.values(), key=lambda m: -m.score)[:limit]
+
+    def find_in_text(self, text: str, kinds: Optional[Sequence[str]] = None,
+                     min_score: float = TEXT_MIN_SCORE, max_words: int = TEXT_MAX_WORDS) -> List[Match]:
+        """Non-overlapping place mentions in free text (1..max_words word phrases), in text order."""
+        low = str(text).lower()
+        words = [(m.group(0).replace("'", ""), m.start(), m.end()) for m in _WORD.finditer(low)]
+        found = []
+        for i in range(len(words)):
+            for n in range(1, max_words + 1):
+                if i + n > len(words):
+                    break
+                span = words[i:i + n]
+                phrase = " ".join(w for w, _, _ in span)
+                first, last = span[0][0], span[-1][0]
+                if first in STOPWORDS or last in STOPWORDS or first.isdigit() or last.isdigit():
+                    continue
+                fuzzy_ok = len(phrase) >= TEXT_MIN_FUZZY_LEN
+                hits = self.search(phrase, kinds=kinds, limit=1, min_score=min_score if fuzzy_ok else 1.0)
+                if hits:
+                    found.append(hits[0]._replace(start=span[0][1], end=span[-1][2]))
+        # keep the best-scoring (then longest) mentions that don't overlap
+        found.sort(key=lambda m: (-m.score, -(m.end - m.start), m.start))
+        chosen: List[Match] = []
+        for m in found:
+            if all(m.end <= c.start or m.start >= c.end for c in chosen):
+                chosen.append(m)
+        return sorted(chosen, key=lambda m: m.start)
@@ -8,7 +8,14 @@ import random
 import re
 import time
 import traceback
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List
+
+from fuzzy import PlaceIndex, TEXT_MIN_SCORE, edit_similarity, origin_span
+from singleflight import SingleFlight
+from ratelimit import PriorityLimiter, TokenBucket
+from streaming import IncrementalJSONParser, sse_text_chunks
+from metrics import LLM_STREAM_SECONDS
+from prompts import PARSE_FIELDS, PACES, build_parse_messages, compact_profile
 
 # try to import requests for optional remote calls; not required for local fallback
 try:
@@ -26,11 +33,39 @@ GROQ_API_KEY = "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"  # set
 GROQ_MODEL = "llama-3.1-8b-instant"
 GENERATE_URL = "https://api.groq.com/openai/v1/chat/completions"
 DEFAULT_TIMEOUT = 12
+# stream remote parses (SSE) when the caller wants fields as they complete (on_field)
+STREAM_REMOTE_PARSE = True
 
 # small retry/backoff config (used only if USE_GEMINI True)
 _MAX_RETRIES = 2
 _RETRY_BACKOFF = 1.25
 
+# provider quota (set to your plan's limits) and how long each lane may wait for it before
+# the caller falls back to the local path. Lanes in priority order: interactive parse,
+# interactive explain, background batch / prefetch (which also leaves 30% of the quota alone)
+REMOTE_REQUESTS_PER_MIN = 30
+REMOTE_TOKENS_PER_MIN = 6000
+LANE_TIMEOUTS = {"parse": 3.0, "explain": 2.0, "background": 60.0}
+REMOTE_LIMITER = PriorityLimiter(
+    {"requests": TokenBucket.per_minute(REMOTE_REQUESTS_PER_MIN), "tokens": TokenBucket.per_minute(REMOTE_TOKENS_PER_MIN)},
+    lanes=("parse", "explain", "background"),
+    max_queue={"parse": 64, "explain": 64, "background": 256},
+    reserve={"background": 0.3},
+)
+
+# identical concurrent parse / explain calls (e.g. the same quick-prompt button pressed in
+# many sessions at once) share one in-flight call; module-level so all session threads share it
+_PARSE_FLIGHTS = SingleFlight("parse")
+_EXPLAIN_FLIGHTS = SingleFlight("explain")
+
+
+def _flight_key(*parts) -> str:
+    return json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _normalize_query(q: Optional[str]) -> str:
+    return " ".join(str(q or "").lower().split())
+
 # ----------------------------------------
 
 def _fmt_price_local(x):
@@ -90,6 +125,28 @@ def _parse_budget_string_local(s: str) -> Optional[int]:
             return None
     return None
 
+_LOCAL_CITY_MAP = {
+    "goa":"dest_5","mumbai":"dest_0","kolkata":"dest_4","leh":"dest_15","shimla":"dest_12",
+    "delhi":"dest_1","bangalore":"dest_2","bengaluru":"dest_2","chennai":"dest_3","jaipur":"dest_6",
+    "manali":"dest_13","agra":"dest_8","varanasi":"dest_9","hyderabad":"dest_19","pune":"dest_18"
+}
+# typo-tolerant lookup over the same cities (plus aliases like "calcutta")
+_LOCAL_CITY_INDEX = PlaceIndex.for_cities([k.title() for k in _LOCAL_CITY_MAP])
+# "itinerary" and its usual misspellings; looser matching also takes "literary", "itinerant"
+_ITINERARY_WORDS = {"itinerary", "itineraries", "itenary", "itinery", "itinary", "iternary"}
+ITINERARY_MIN_SCORE = 0.85   # one edit in "itinerary"
+
+def _correct_city_local(word: str) -> str:
+    """Known city key for a possibly misspelled word; the word itself when nothing is close."""
+    if word in _LOCAL_CITY_MAP:
+        return word
+    hits = _LOCAL_CITY_INDEX.search(word, limit=1, min_score=TEXT_MIN_SCORE) if len(word) >= 4 else []
+    return hits[0].value.lower() if hits else word
+
+def _mentions_itinerary(q: str) -> bool:
+    return any(w in _ITINERARY_WORDS or edit_similarity(w, "itinerary", ITINERARY_MIN_SCORE) >= ITINERARY_MIN_SCORE
+               for w in re.findall(r"[a-z]{6,}", q))
+
 def _parse_search_local(query: str) -> Dict[str, Any]:
     """Simple local parser to extract destination-like tokens, tags and budget."""
     q = (query or "").lower()
@@ -128,21 +185,25 @@ def _parse_search_local(query: str) -> Dict[str, Any]:
         except:
             out["max_stops"] = None
     # simple city mapping (lowercase tokens)
-    city_map = {
-        "goa":"dest_5","mumbai":"dest_0","kolkata":"dest_4","leh":"dest_15","shimla":"dest_12",
-        "delhi":"dest_1","bangalore":"dest_2","bengaluru":"dest_2","chennai":"dest_3","jaipur":"dest_6",
-        "manali":"dest_13","agra":"dest_8","varanasi":"dest_9","hyderabad":"dest_19","pune":"dest_18"
-    }
-    for k,v in city_map.items():
-        if re.search(r'\b' + re.escape(k) + r'\b', q):
-            out["destination_id"] = v
-            out["destination"] = k.title()
-            break
+    city_map = _LOCAL_CITY_MAP
+    # (start, end, city key) of exact names, then misspelled / alias ones ("varansi", "calcutta") that
+    # don't overlap them; the "from ..." phrase is the origin, never the destination
+    mentions = [(m.start(), m.end(), k) for k in city_map for m in re.finditer(r'\b' + re.escape(k) + r'\b', q)]
+    mentions += [(m.start, m.end, m.value.lower()) for m in _LOCAL_CITY_INDEX.find_in_text(q)
+                 if all(m.end <= s or m.start >= e for s, e, _ in mentions)]
+    span = origin_span(q)
+    mentions = sorted(m for m in mentions if m[2] in city_map and (not span or not span[0] <= m[0] < span[1]))
+    if mentions:
+        to_pos = q.find(" to ")
+        after_to = [m for m in mentions if to_pos != -1 and m[0] > to_pos]
+        chosen = after_to[0] if after_to else mentions[-1]
+        out["destination_id"] = city_map[chosen[2]]
+        out["destination"] = chosen[2].title()
     # detect origin using "from"
     mfrom = re.search(r'\bfrom\s+([a-zA-Z ]+)', q)
     if mfrom:
         candidate = mfrom.group(1).strip().split()[0]
-        candidate = candidate.lower()
+        candidate = _correct_city_local(candidate.lower())
         # try map
         if candidate in city_map:
             out["origin"] = candidate.title()
@@ -152,7 +213,7 @@ def _parse_search_local(query: str) -> Dict[str, Any]:
     mto = re.search(r'\bto\s+([a-zA-Z ]+)', q)
     if mto:
         candidate = mto.group(1).strip().split()[0]
-        candidate = candidate.lower()
+        candidate = _correct_city_local(candidate.lower())
         if candidate in city_map:
             out["destination_id"] = city_map[candidate]
             out["destination"] = candidate.title()
@@ -161,7 +222,7 @@ def _parse_search_local(query: str) -> Dict[str, Any]:
                 out["destination"] = candidate.title()
     if "train" in q: out["trip_type"] = "trains"
     if "flight" in q or "air" in q: out["trip_type"] = "flights"
-    if "itiner" in q or "plan" in q or "itinerary" in q: out["trip_type"] = out.get("trip_type") or "itinerary"
+    if "plan" in q or _mentions_itinerary(q): out["trip_type"] = out.get("trip_type") or "itinerary"
     return out
 
 # Public API functions (keeps same names used by app.py)
@@ -171,6 +232,10 @@ def explain_with_gemini(item: Dict[str, Any], user_profile: Optional[Dict[str,An
     Return a short explanation string for UI.
     By default this uses the local fallback to avoid remote quota issues.
     """
+    key = _flight_key(item, user_profile, parsed_search)
+    return _EXPLAIN_FLIGHTS.do(key, lambda: _explain(item, user_profile, parsed_search))
+
+def _explain(item: Dict[str, Any], user_profile: Optional[Dict[str,Any]] = None, parsed_search: Optional[Dict[str,Any]] = None) -> str:
     # If you want to use a remote provider, implement the remote call here conditioned on USE_GEMINI.
     # For now, we use local deterministic fallback.
     return _explain_fallback(item)
@@ -215,47 +280,78 @@ def _safe_extract_json(s: str) -> Optional[Dict[str,Any]]:
         except Exception:
             return None
 
-def _call_remote_parse(query: str, user_profile: Optional[Dict[str,Any]] = None) -> Optional[str]:
+def _retry_after(resp) -> float:
+    try:
+        return max(1.0, float(resp.headers.get("retry-after", 0)))
+    except (TypeError, ValueError, AttributeError):
+        return 2.0
+
+def _read_stream(resp, on_field: Callable[[str, Any], None]) -> str:
+    """Consume an SSE completion, calling on_field(key, value) as each top-level JSON field completes."""
+    t0 = time.perf_counter()
+    parser = IncrementalJSONParser()
+    parts = []
+    first = True
+    for chunk in sse_text_chunks(resp.iter_lines(decode_unicode=True)):
+        parts.append(chunk)
+        for key, value in parser.feed(chunk):
+            if first:
+                LLM_STREAM_SECONDS.observe(time.perf_counter() - t0, point="first_field")
+                first = False
+            try:
+                on_field(key, value)
+            except Exception:
+                traceback.print_exc()
+    LLM_STREAM_SECONDS.observe(time.perf_counter() - t0, point="complete")
+    return "".join(parts)
+
+def _call_remote_parse(query: str, user_profile: Optional[Dict[str,Any]] = None, lane: str = "parse",
+                       on_field: Optional[Callable[[str, Any], None]] = None, fields=PARSE_FIELDS) -> Optional[str]:
     """
     If requests is available and USE_GEMINI True, attempt a remote call. Returns raw text response or None.
     This is a minimal generic example for an OpenAI/Groq-compatible chat endpoint. Adapt to your provider.
+    Every attempt first waits for quota in REMOTE_LIMITER's `lane`; None once LANE_TIMEOUTS[lane] is used up.
+    With on_field (and STREAM_REMOTE_PARSE) the completion is streamed and on_field(key, value)
+    is called for each JSON field as soon as the model has finished writing it.
     """
     if not requests:
         return None
     if not USE_GEMINI:
         return None
-    # construct a prompt instructing strict JSON output
-    profile_json = json.dumps(user_profile or {}, ensure_ascii=False)
-    prompt = f"""
-You are a travel search parser. Given the query and the user's profile, return STRICT JSON with only the fields:
-destination, destination_id, origin, trip_type, nights, budget_max, tags, max_stops.
-
-user_profile: {profile_json}
-text: \"\"\"{query}\"\"\"
-
-Return ONLY valid JSON (no explanation). Use null for missing values.
-"""
+    # fixed system prefix + one short user message (compact profile, query), within the token budget
+    messages, input_tokens, max_tokens = build_parse_messages(query, user_profile, fields=fields)
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
     payload = {
         "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": "You are a JSON parser that must return only JSON."},
-            {"role": "user", "content": prompt}
-        ],
+        "messages": messages,
         "temperature": 0.0,
-        "max_tokens": 400
+        "max_tokens": max_tokens
     }
+    stream = bool(on_field) and STREAM_REMOTE_PARSE
+    if stream:
+        payload["stream"] = True
+    cost = {"requests": 1, "tokens": input_tokens + max_tokens}
+    deadline = time.monotonic() + LANE_TIMEOUTS.get(lane, DEFAULT_TIMEOUT)
     attempts = 0
     while attempts <= _MAX_RETRIES:
+        if not REMOTE_LIMITER.acquire(lane, cost, timeout=max(0.0, deadline - time.monotonic())):
+            return None
         try:
-            resp = requests.post(GENERATE_URL, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+            resp = requests.post(GENERATE_URL, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT, stream=stream)
+            if resp.status_code == 429:
+                # quota exceeded: hold everyone back; the next acquire() does the waiting (within the deadline)
+                REMOTE_LIMITER.backoff(_retry_after(resp))
+                attempts += 1
+                continue
             if resp.status_code != 200:
                 attempts += 1
-                time.sleep(_RETRY_BACKOFF * attempts)
+                time.sleep(min(_RETRY_BACKOFF * attempts, max(0.0, deadline - time.monotonic())))
                 continue
+            if stream:
+                return _read_stream(resp, on_field)
             j = resp.json()
             # try to extract text depending on response shape
             # common OpenAI-like shape: choices[0].message.content
@@ -278,25 +374,41 @@ Return ONLY valid JSON (no explanation). Use null for missing values.
             return text_out
         except Exception:
             attempts += 1
-            time.sleep(_RETRY_BACKOFF * attempts)
+            time.sleep(min(_RETRY_BACKOFF * attempts, max(0.0, deadline - time.monotonic())))
     return None
 
-def parse_search_with_gemini(query: str, user_profile: Optional[Dict[str,Any]] = None) -> Dict[str, Any]:
+def parse_search_with_gemini(query: str, user_profile: Optional[Dict[str,Any]] = None, lane: str = "parse",
+                             on_field: Optional[Callable[[str, Any], None]] = None, fields=PARSE_FIELDS) -> Dict[str, Any]:
     """
     Parse free-text query into JSON signals. If USE_GEMINI True and remote call succeeds,
     parse the returned JSON. Otherwise fall back to the local parser.
     Returns a dict with keys similar to the local parser.
+    Concurrent calls with the same normalized query and profile share one parse.
+    lane: REMOTE_LIMITER lane for the remote call ("background" for batch / prefetch work).
+    on_field(key, value): called with raw fields while a remote parse streams in (only for the
+    caller that actually makes the request; coalesced callers just get the final dict).
+    fields: keys to ask the remote parser for (prompts.ITINERARY_FIELDS adds "pace").
+    The result's "_source" is the parser that produced it: "gemini", or "heuristic" when the
+    local parser ran (remote off, or the remote call failed / returned nothing usable).
     """
+    # only the profile fields the prompt uses matter; lane is part of the key so an
+    # interactive caller never waits on a background parse
+    key = _flight_key(_normalize_query(query), compact_profile(user_profile), lane, list(fields))
+    return _PARSE_FLIGHTS.do(key, lambda: _parse_search(query, user_profile, lane, on_field, fields))
+
+def _parse_search(query: str, user_profile: Optional[Dict[str,Any]] = None, lane: str = "parse",
+                  on_field: Optional[Callable[[str, Any], None]] = None, fields=PARSE_FIELDS) -> Dict[str, Any]:
     try:
         # attempt remote parse if enabled
         if USE_GEMINI:
-            text_out = _call_remote_parse(query, user_profile=user_profile)
+            text_out = _call_remote_parse(query, user_profile=user_profile, lane=lane, on_field=on_field, fields=fields)
             if text_out:
                 parsed_json = _safe_extract_json(text_out)
                 if parsed_json:
                     # sanitize and normalize keys we expect
-                    allowed = {"destination","destination_id","origin","trip_type","nights","budget_max","tags","max_stops"}
-                    parsed = {k: parsed_json.get(k, None) for k in allowed}
+                    parsed = {k: parsed_json.get(k, None) for k in fields}
+                    if "pace" in parsed and parsed["pace"] not in PACES:
+                        parsed["pace"] = None
                     # normalize types
                     if isinstance(parsed.get("budget_max"), str):
                         parsed["budget_max"] = _parse_budget_string_local(parsed["budget_max"])
@@ -315,15 +427,18 @@ def parse_search_with_gemini(query: str, user_profile: Optional[Dict[str,Any]] =
                     elif isinstance(parsed.get("tags"), str):
                         parsed["tags"] = [t.strip() for t in parsed["tags"].split(",") if t.strip()]
                     # if destination present but no destination_id, leave as-is (app layer will try to resolve)
+                    parsed["_source"] = "gemini"
                     return parsed
         # fallback to local parser
-        return _parse_search_local(query or "")
+        parsed = _parse_search_local(query or "")
     except Exception:
         try:
             traceback.print_exc()
         except:
             pass
-        return _parse_search_local(query or "")
+        parsed = _parse_search_local(query or "")
+    parsed["_source"] = "heuristic"
+    return parsed
 
 def choose_hotel_with_gemini(candidates: List[Dict[str,Any]], user_profile: Dict[str,Any], user_past_trips: Optional[List[Dict[str,Any]]] = None, reason_max_tokens: int = 60) -> Optional[Dict[str,Any]]:
     """
@@ -0,0 +1,212 @@
+# geo.py
+"""
+Coordinates, distances and local travel estimates.
+
+Destinations, hotels and POIs carry "lat" / "lon". Travel between two places
+in a city is estimated from the great-circle distance (vectorized haversine)
+times ROAD_FACTOR and the city's speed profile: walk when that is quicker,
+otherwise an auto / cab with a fixed pickup time and a per-km fare.
+
+    km = haversine_km(lat1, lon1, lat_array, lon_array)
+    mins, cost = travel_estimate(km, city_profile("Shimla"))
+
+GeoGrid buckets one city's points into square cells so "within r km" and
+"k nearest" only look at the cells around the query point:
+
+    grid = GeoGrid(lats, lons)
+    idx, km = grid.nearest(lat, lon, k=10)
+    idx, km = grid.within(lat, lon, radius_km=2.0)
+
+Records without coordinates (older deltas, custom catalogs) get a stable
+point near their city centre from point_of(), derived from their id.
+"""
+
+import math
+import zlib
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# streets aren't straight lines
+ROAD_FACTOR = 1.35
+WALK_KMH = 4.5
+
+# fixed_mins: waiting / pickup; base_fare + per_km in INR
+SPEED_PROFILES = {
+    "metro": {"kmh": 16.0, "fixed_mins": 6, "base_fare": 40, "per_km": 16},
+    "town": {"kmh": 22.0, "fixed_mins": 4, "base_fare": 30, "per_km": 14},
+    "hill": {"kmh": 13.0, "fixed_mins": 5, "base_fare": 50, "per_km": 22},
+}
+# standard deviation (km) of how far sights / hotels lie from the centre
+CITY_SPREAD_KM = {"metro": 4.0, "town": 2.5, "hill": 2.0}
+
+CITY_COORDS = {
+    "Mumbai": (19.0760, 72.8777), "Delhi": (28.6139, 77.2090), "Bengaluru": (12.9716, 77.5946),
+    "Chennai": (13.0827, 80.2707), "Kolkata": (22.5726, 88.3639), "Goa": (15.4909, 73.8278),
+    "Jaipur": (26.9124, 75.7873), "Udaipur": (24.5854, 73.7125), "Agra": (27.1767, 78.0081),
+    "Varanasi": (25.3176, 82.9739), "Amritsar": (31.6340, 74.8723), "Lucknow": (26.8467, 80.9462),
+    "Shimla": (31.1048, 77.1734), "Manali": (32.2432, 77.1892), "Srinagar": (34.0837, 74.7973),
+    "Leh": (34.1526, 77.5771), "Munnar": (10.0889, 77.0595), "Kochi": (9.9312, 76.2673),
+    "Pune": (18.5204, 73.8567), "Hyderabad": (17.3850, 78.4867),
+}
+CITY_PROFILE = {
+    "Mumbai": "metro", "Delhi": "metro", "Bengaluru": "metro", "Chennai": "metro", "Kolkata": "metro",
+    "Hyderabad": "metro", "Pune": "metro",
+    "Shimla": "hill", "Manali": "hill", "Srinagar": "hill", "Leh": "hill", "Munnar": "hill",
+}
+
+
+def city_profile(name: Optional[str]) -> str:
+    return CITY_PROFILE.get(name or "", "town")
+
+
+def city_center(name: Optional[str]) -> Tuple[float, float]:
+    """Known city centre, or a stable made-up point inside India for unknown names."""
+    if name in CITY_COORDS:
+        return CITY_COORDS[name]
+    h = zlib.crc32((name or "").lower().encode("utf-8"))
+    return 10.0 + (h % 20000) / 1000.0, 72.0 + (h // 20000 % 16000) / 1000.0
+
+
+def dest_center(dest: Optional[Dict]) -> Tuple[float, float]:
+    dest = dest or {}
+    if dest.get("lat") is not None and dest.get("lon") is not None:
+        return float(dest["lat"]), float(dest["lon"])
+    return city_center(dest.get("name"))
+
+
+def offset_point(center: Tuple[float, float], dx_km: float, dy_km: float) -> Tuple[float, float]:
+    """center moved dx_km east and dy_km north (rounded to ~1 m)."""
+    lat, lon = center
+    return (round(lat + dy_km / 110.574, 5),
+            round(lon + dx_km / (111.320 * max(0.1, math.cos(math.radians(lat)))), 5))
+
+
+def scatter_point(center: Tuple[float, float], key: str, spread_km: float, seed: int = 42) -> Tuple[float, float]:
+    """Deterministic normally-distributed point around center, keyed by a record id."""
+    rng = np.random.default_rng([seed, zlib.crc32(key.encode("utf-8"))])
+    dx, dy = rng.normal(0.0, spread_km, 2)
+    return offset_point(center, float(dx), float(dy))
+
+
+def point_of(rec: Dict, dest: Optional[Dict] = None, seed: int = 42) -> Tuple[float, float]:
+    """(lat, lon) of a hotel / POI record, falling back to a stable point near its city."""
+    if rec.get("lat") is not None and rec.get("lon") is not None:
+        return float(rec["lat"]), float(rec["lon"])
+    name = (dest or {}).get("name")
+    return scatter_point(dest_center(dest), rec.get("id", ""), CITY_SPREAD_KM[city_profile(name)] / 2, seed)
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; arguments broadcast like numpy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def travel_estimate(km, profile: str = "town") -> Tuple[np.ndarray, np.ndarray]:
+    """(mins, cost) int arrays for straight-line distances km. Minutes never decrease with distance."""
+    p = SPEED_PROFILES[profile]
+    road = np.asarray(km, dtype=np.float64) * ROAD_FACTOR
+    walk = road / WALK_KMH * 60.0
+    ride = p["fixed_mins"] + road / p["kmh"] * 60.0
+    walking = walk <= ride
+    mins = np.ceil(np.where(walking, walk, ride)).astype(np.int32)
+    cost = np.where(walking, 0.0, p["base_fare"] + road * p["per_km"]).round().astype(np.int32)
+    return mins, cost
+
+
+def reach_km(max_mins: float, profile: str = "town") -> float:
+    """Largest straight-line distance travel_estimate() puts within max_mins."""
+    p = SPEED_PROFILES[profile]
+    road = max(max_mins * WALK_KMH / 60.0, (max_mins - p["fixed_mins"]) * p["kmh"] / 60.0)
+    return max(0.0, road / ROAD_FACTOR)
+
+
+class GeoGrid:
+    """Uniform grid over one city's points (local equirectangular projection, cell_km squares)."""
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], cell_km: float = 1.0):
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+        self.cell_km = float(cell_km)
+        lat0 = float(self.lat.mean()) if len(self.lat) else 0.0
+        self._kx = 111.320 * max(0.1, math.cos(math.radians(lat0)))
+        self._ky = 110.574
+        cx, cy = self._cells(self.lat, self.lon)
+        self._cells_of = {}
+        if len(cx):
+            order = np.lexsort((cy, cx))
+            keys = np.stack([cx[order], cy[order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            for s, e in zip(starts, np.r_[starts[1:], len(order)]):
+                self._cells_of[(int(keys[s, 0]), int(keys[s, 1]))] = order[s:e]
+            self._span = (int(cx.min()), int(cx.max()), int(cy.min()), int(cy.max()))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _cells(self, lat, lon):
+        return (np.floor(np.asarray(lon) * self._kx / self.cell_km).astype(np.int64),
+                np.floor(np.asarray(lat) * self._ky / self.cell_km).astype(np.int64))
+
+    def _ring(self, cx, cy, r):
+        """Point indices in the cells at Chebyshev distance exactly r from (cx, cy)."""
+        if r == 0:
+            cells = [(cx, cy)]
+        else:
+            cells = [(cx + dx, cy + dy) for dx in range(-r, r + 1) for dy in (-r, r)]
+            cells += [(cx + dx, cy + dy) for dx in (-r, r) for dy in range(-r + 1, r)]
+        hits = [self._cells_of[c] for c in cells if c in self._cells_of]
+        return np.concatenate(hits) if hits else np.zeros(0, dtype=np.int64)
+
+    def _max_ring(self, cx, cy):
+        x0, x1, y0, y1 = self._span
+        return max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+
+    def within(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, km) of the points within radius_km, nearest first."""
+        if not len(self.lat):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        cx, cy = (int(v) for v in self._cells(lat, lon))
+        # +1 ring covers the projection error at city scale
+        rings = min(int(math.ceil(radius_km / self.cell_km)) + 1, self._max_ring(cx, cy))
+        cand = np.concatenate([self._ring(cx, cy, r) for r in range(rings + 1)])
+        km = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+        keep = km <= radius_km
+        cand, km = cand[keep], km[keep]
+        order = np.argsort(km, kind="stable")
+        return cand[order], km[order]
+
+    def nearest(self, lat: float, lon: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, km) of the k nearest points, nearest first."""
+        k = min(k, len(self.lat))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        cx, cy = (int(v) for v in self._cells(lat, lon))
+        last = self._max_ring(cx, cy)
+        found = []
+        n = 0
+        # rings closer than the grid's bounding box are empty (queries from outside the city)
+        x0, x1, y0, y1 = self._span
+        r = max(0, x0 - cx, cx - x1, y0 - cy, cy - y1)
+        while True:
+            ring = self._ring(cx, cy, r)
+            if len(ring):
+                found.append(ring)
+                n += len(ring)
+            if n >= k:
+                cand = np.concatenate(found)
+                km = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+                part = np.argpartition(km, k - 1)[:k] if k < len(km) else np.arange(len(km))
+                # everything outside ring r is at least r cells away (less a little projection error)
+                if km[part].max() <= (r - 0.5) * self.cell_km or r >= last:
+                    order = part[np.argsort(km[part], kind="stable")]
+                    return cand[order], km[order]
+            elif r >= last:
+                cand = np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+                km = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+                order = np.argsort(km, kind="stable")
+                return cand[order], km[order]
+            r += 1
@@ -7,7 +7,10 @@ Returns days with lists of POI dicts (from pois_map) assigned to morning/afterno
 from datetime import datetime, timedelta
 import random
 
-def generate_itinerary(destination_id, start_date_str=None, nights=2, interests=None, pace="normal", pois_map=None):
+from poi_search import POISearchIndex
+
+def generate_itinerary(destination_id, start_date_str=None, nights=2, interests=None, pace="normal", pois_map=None, search_index=None):
+    """search_index: shared poi_search.POISearchIndex; without one a throwaway index over this city is built."""
     if not start_date_str:
         start_date = datetime.today().date()
     else:
@@ -18,15 +21,15 @@ def generate_itinerary(destination_id, start_date_str=None, nights=2, interests=
 
     num_days = max(1, nights + 1)
     pois = pois_map.get(destination_id, []) if pois_map else []
-    # assign score by interest overlap
+    # assign score by interest match (BM25 over POI names / categories)
+    matched = {}
+    if interests:
+        if search_index is None:
+            search_index = POISearchIndex({destination_id: pois})
+        matched = search_index.interest_scores(destination_id, interests)
     def poi_score(p):
-        score = 0
-        if interests:
-            for t in interests:
-                if t in (p.get("category","") or "") or t in (p.get("name","").lower() or ""):
-                    score += 1
-        score += random.Random(p.get("id", "")).random() * 0.1
-        return score
+        # the seeded random part only orders POIs with equal match scores
+        return (matched.get(p.get("id"), 0.0), random.Random(p.get("id", "")).random())
 
     sorted_pois = sorted(pois, key=poi_score, reverse=True)
     # decide slots per day
@@ -0,0 +1,302 @@
+# journeys.py
+"""
+Connecting journeys over flights and trains (multi-criteria Connection Scan).
+
+Every flight / train record is a daily service: departure_time (HH:MM) plus
+duration_mins. The planner expands the schedule over the search horizon into
+elementary connections sorted by departure, then scans them once. Each city
+keeps a Pareto bag of labels
+
+    (first departure, arrival, price, transfers)
+
+and a connection extends every label at its departure city that arrived at
+least the minimum connection time and at most MAX_LAYOVER_MINS earlier. A
+label survives only if no other label at the same city departs later, arrives
+earlier, is cheaper and has no more transfers. Because of the layover cap, an
+earlier arrival only counts as better at an intermediate city when no service
+leaves that city between the two labels' layover deadlines (otherwise the later
+label can make a connection the earlier one can't). Journeys returned are
+Pareto-optimal by price, duration and transfers.
+
+Like multicity.TransportGraph, services listed hub -> city are assumed to run
+back city -> hub at the same time of day, price and duration.
+
+    planner = JourneyPlanner(catalog.flights, catalog.trains)
+    planner.search("Goa", "Jaipur", depart_after="06:00")
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional, Sequence
+
+from memo import LRUMemo
+
+DAY_MINS = 1440
+# minimum time between arriving on one service and departing on the next
+MIN_CONNECTION_MINS = {
+    ("flight", "flight"): 60,
+    ("train", "train"): 30,
+    ("flight", "train"): 120,   # airport -> station
+    ("train", "flight"): 180,   # station -> airport, plus check-in
+}
+MAX_LAYOVER_MINS = 18 * 60
+MAX_TRANSFERS = 2
+# journeys must arrive within this long after the departure window closes
+MAX_JOURNEY_MINS = 36 * 60
+MAX_RESULTS = 10
+INF = float("inf")
+
+_KINDS = ("flight", "train")
+
+
+def _clock(s: Optional[str]) -> int:
+    """'HH:MM' -> minutes after midnight (0 for missing/bad values)."""
+    try:
+        h, m = str(s).split(":")[:2]
+        return (int(h) * 60 + int(m)) % DAY_MINS
+    except (ValueError, AttributeError):
+        return 0
+
+
+def _fmt(t: int) -> str:
+    day, mins = divmod(t, DAY_MINS)
+    out = f"{mins // 60:02d}:{mins % 60:02d}"
+    return out if day == 0 else f"{out} (+{day}d)"
+
+
+class JourneyPlanner:
+    """Connection table for one catalog version; search() is read-only and thread-safe."""
+
+    def __init__(self, flights: Sequence[Dict[str, Any]], trains: Sequence[Dict[str, Any]],
+                 min_connection: Optional[Dict] = None, reverse_services: bool = True):
+        self.min_connection = dict(MIN_CONNECTION_MINS, **(min_connection or {}))
+        self.names: Dict[str, str] = {}
+        self._city: Dict[str, int] = {}
+        # one row per daily service, sorted by time of day:
+        # (dep_clock, duration, from_idx, to_idx, price, kind_idx, record)
+        rows = []
+        for kind_idx, items in enumerate((flights, trains)):
+            for rec in items:
+                a, b = rec["from"], rec["to"]
+                if a.lower() == b.lower():
+                    continue
+                ia, ib = self._index(a), self._index(b)
+                dep = _clock(rec.get("departure_time"))
+                dur = int(rec["duration_mins"])
+                rows.append((dep, dur, ia, ib, rec["price"], kind_idx, rec))
+                if reverse_services:
+                    rows.append((dep, dur, ib, ia, rec["price"], kind_idx, rec))
+        rows.sort(key=lambda r: r[0])
+        self._rows = rows
+        self._deps = [r[0] for r in rows]
+        n = len(self.names)
+        # per city: sorted departure clocks of the services leaving it
+        self._city_deps: List[List[int]] = [[] for _ in range(n)]
+        for r in rows:
+            self._city_deps[r[2]].append(r[0])
+        # min connection time per (arriving kind, departing kind) as a 2x2 table
+        self._mct = [[self.min_connection[(k1, k2)] for k2 in _KINDS] for k1 in _KINDS]
+        self.n_cities = n
+        self._display = list(self.names.values())  # city index -> display name (insertion order)
+        # reverse static graph: _rev[v][u] = (cheapest price, shortest ride) over all u -> v services
+        self._rev: List[Dict[int, tuple]] = [{} for _ in range(n)]
+        for _, dur, u, v, price, _, _ in rows:
+            p0, d0 = self._rev[v].get(u, (INF, INF))
+            self._rev[v][u] = (min(p0, price), min(d0, dur))
+        self._bounds = LRUMemo(maxsize=256)
+
+    def _index(self, name: str) -> int:
+        key = name.lower()
+        if key not in self._city:
+            self._city[key] = len(self._city)
+            self.names[key] = name
+        return self._city[key]
+
+    def has(self, city: str) -> bool:
+        return city.lower() in self._city
+
+    def _departs_between(self, city: int, lo: int, hi: int) -> bool:
+        """True if some service leaves city at a time in (lo, hi] (minutes from day 0)."""
+        clocks = self._city_deps[city]
+        if hi <= lo or not clocks:
+            return False
+        if hi - lo >= DAY_MINS:
+            return True
+        a, b = lo % DAY_MINS, hi % DAY_MINS
+        if a < b:
+            return bisect.bisect_right(clocks, b) > bisect.bisect_right(clocks, a)
+        # the interval wraps past midnight
+        return bisect.bisect_right(clocks, a) < len(clocks) or bisect.bisect_right(clocks, b) > 0
+
+    def _covers(self, city: int, arr: int, other_arr: int) -> bool:
+        """Can a label arriving at arr make every connection one arriving at other_arr can?"""
+        return arr <= other_arr and (arr == other_arr or city is None or not self._departs_between(
+            city, arr + MAX_LAYOVER_MINS, other_arr + MAX_LAYOVER_MINS))
+
+    def _bounds_to(self, dst: int, legs: int):
+        """
+        Per city: fewest legs to dst, and lower bounds on price and ride time to
+        dst over at most `legs` legs (waits ignored). Used to prune the scan.
+        """
+        def build():
+            n = self.n_cities
+            hops, price, ride = [INF] * n, [INF] * n, [INF] * n
+            hops[dst], price[dst], ride[dst] = 0, 0, 0
+            frontier = [dst]
+            for h in range(1, legs + 1):
+                changed = set()
+                for v in frontier:
+                    pv, dv = price[v], ride[v]
+                    for u, (p, d) in self._rev[v].items():
+                        if hops[u] == INF:
+                            hops[u] = h
+                            changed.add(u)
+                        if pv + p < price[u]:
+                            price[u] = pv + p
+                            changed.add(u)
+                        if dv + d < ride[u]:
+                            ride[u] = dv + d
+                            changed.add(u)
+                frontier = changed
+            return hops, price, ride
+        return self._bounds.get_or_compute((dst, legs), build)
+
+    def _day_ranges(self, start: int, end: int):
+        """[(day offset, lo, hi)]: row ranges of the expanded connections departing in [start, end]."""
+        out = []
+        for day in range(start // DAY_MINS, end // DAY_MINS + 1):
+            base = day * DAY_MINS
+            lo = bisect.bisect_left(self._deps, start - base) if base <= start else 0
+            hi = bisect.bisect_right(self._deps, end - base)
+            if lo < hi:
+                out.append((base, lo, hi))
+        return out
+
+    def search(self, origin: str, destination: str, depart_after: str = "00:00", window_mins: int = DAY_MINS,
+               max_transfers: int = MAX_TRANSFERS, modes: Sequence[str] = _KINDS, max_price: Optional[float] = None,
+               limit: int = MAX_RESULTS) -> List[Dict[str, Any]]:
+        """
+        Pareto-optimal journeys origin -> destination whose first leg departs within
+        window_mins after depart_after (times in minutes from midnight of day 0).
+        """
+        src = self._city.get(origin.lower())
+        dst = self._city.get(destination.lower())
+        if src is None or dst is None or src == dst:
+            return []
+        allowed = [k in modes for k in _KINDS]
+        start = _clock(depart_after)
+        last_dep = start + window_mins
+        end = last_dep + MAX_JOURNEY_MINS
+        mct = self._mct
+        hops, price_lb, ride_lb = self._bounds_to(dst, max_transfers + 1)
+        if hops[src] == INF:
+            return []
+
+        # label: (dep, arr, price, transfers, kind_idx, row, parent)
+        bags: List[List[tuple]] = [[] for _ in range(self.n_cities)]
+        target = bags[dst]
+
+        covers = self._covers
+
+        def dominated(bag, dep, arr, price, transfers, kind=None, city=None):
+            # at intermediate cities (city given) only labels that arrived by the same mode
+            # compare (the next minimum connection time depends on it), and arriving earlier
+            # only helps as far as the layover cap allows
+            for l in bag:
+                if (l[0] >= dep and l[2] <= price and l[3] <= transfers and (kind is None or l[4] == kind)
+                        and covers(city, l[1], arr)):
+                    return True
+            return False
+
+        def insert(bag, label, city=None):
+            dep, arr, price, transfers, kind = label[:5]
+            bag[:] = [l for l in bag if not (dep >= l[0] and price <= l[2] and transfers <= l[3]
+                                             and (city is None or l[4] == kind) and covers(city, arr, l[1]))]
+            bag.append(label)
+
+        rows = self._rows
+        for base, lo, hi in self._day_ranges(start, end):
+            for r in rows[lo:hi]:
+                dur, u, v, price, kind = r[1], r[2], r[3], r[4], r[5]
+                # v must still reach dst with the transfers left (at best max_transfers)
+                hv = hops[v]
+                if hv > max_transfers or v == src or not allowed[kind]:
+                    continue
+                t = base + r[0]
+                arr = t + dur
+                if arr > end:
+                    continue
+                if u == src:
+                    if t > last_dep:
+                        continue
+                    candidates = [(t, arr, price, 0, kind, r, None)]
+                else:
+                    bag = bags[u]
+                    if not bag:
+                        continue
+                    # labels with more transfers than this can't get from v to dst in time
+                    tr_cap = max_transfers - hv - 1
+                    candidates = []
+                    for l in bag:
+                        if l[3] > tr_cap:
+                            continue
+                        wait = t - l[1]
+                        if wait < mct[l[4]][kind] or wait > MAX_LAYOVER_MINS:
+                            continue
+                        candidates.append((l[0], arr, l[2] + price, l[3] + 1, kind, r, l))
+                for lab in candidates:
+                    dep0, a, p, tr = lab[0], lab[1], lab[2], lab[3]
+                    if max_price is not None and p + price_lb[v] > max_price:
+                        continue
+                    if v == dst:
+                        if not dominated(target, dep0, a, p, tr):
+                            insert(target, lab)
+                    # target pruning: even at the lower bounds, this label can't beat what already reaches dst
+                    elif target and dominated(target, dep0, a + ride_lb[v], p + price_lb[v], tr + 1):
+                        continue
+                    elif not dominated(bags[v], dep0, a, p, tr, kind, v):
+                        insert(bags[v], lab, v)
+
+        journeys = [self._journey(l) for l in target]
+        # final front on the criteria callers care about: price, duration, transfers
+        front = []
+        for j in sorted(journeys, key=lambda j: (j["price"], j["duration_mins"], j["transfers"])):
+            if not any(o["price"] <= j["price"] and o["duration_mins"] <= j["duration_mins"]
+                       and o["transfers"] <= j["transfers"] for o in front):
+                front.append(j)
+        return front[:limit]
+
+    def _journey(self, label) -> Dict[str, Any]:
+        legs = []
+        l = label
+        while l is not None:
+            r = l[5]
+            dep = l[1] - r[1]
+            legs.append((dep, l[1], r))
+            l = l[6]
+        legs.reverse()
+        out_legs = []
+        prev_arr = None
+        for dep, arr, r in legs:
+            rec = r[6]
+            out_legs.append({
+                "kind": _KINDS[r[5]],
+                "id": rec["id"],
+                "from": self._display[r[2]],
+                "to": self._display[r[3]],
+                "departure": _fmt(dep),
+                "arrival": _fmt(arr),
+                "price": r[4],
+                "duration_mins": r[1],
+                "layover_mins": None if prev_arr is None else dep - prev_arr,
+                "reverse": rec["from"].lower() != self._display[r[2]].lower(),
+            })
+            prev_arr = arr
+        return {
+            "legs": out_legs,
+            "departure": out_legs[0]["departure"],
+            "arrival": out_legs[-1]["arrival"],
+            "price": label[2],
+            "duration_mins": label[1] - label[0],
+            "transfers": label[3],
+        }
+
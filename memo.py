@@ -0,0 +1,57 @@
+# memo.py
+"""
+Small thread-safe LRU memo used for expensive view builders.
+Keys should include every input the cached value depends on (including the
+catalog / destination version), so stale entries are never returned and simply
+age out; invalidate() drops matching entries eagerly.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUMemo:
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_compute(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        # compute outside the lock; a concurrent miss on the same key just computes twice
+        value = fn()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self, pred: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches pred. Returns how many were dropped."""
+        with self._lock:
+            stale = [k for k in self._data if pred(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,255 @@
+# metrics.py
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms) and a tiny HTTP
+endpoint serving them in the text exposition format (GET /metrics).
+
+Metrics are module-level singletons so Streamlit reruns don't re-register them:
+
+    CACHE_REQUESTS.inc(cache="search", result="hit")
+    with BUNDLE_BUILD_SECONDS.time(): ...
+
+Callback metrics (REGISTRY.callback) are evaluated at scrape time, e.g. for
+counters that already live on another object (LRUMemo.hits).
+"""
+
+import contextlib
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+METRICS_PORT = int(os.environ.get("TRAVEL_RECO_METRICS_PORT", "9108"))
+METRICS_ADDR = os.environ.get("TRAVEL_RECO_METRICS_ADDR", "127.0.0.1")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _pairs(self, key):
+        return list(zip(self.labelnames, key))
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self._pairs(k), v) for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    st["counts"][i] += 1
+                    break
+            st["sum"] += value
+            st["count"] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(k, list(v["counts"]), v["sum"], v["count"]) for k, v in self._values.items()]
+        for key, counts, total, count in items:
+            pairs = self._pairs(key)
+            cum = 0
+            for b, c in zip(self.buckets, counts):
+                cum += c
+                out.append((self.name + "_bucket", pairs + [("le", _fmt_value(b))], cum))
+            out.append((self.name + "_sum", pairs, total))
+            out.append((self.name + "_count", pairs, count))
+        return out
+
+
+class _Callback:
+    def __init__(self, name, help, kind, labelnames, fn):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            values = self.fn() or {}
+        except Exception:
+            return []
+        return [(self.name, list(zip(self.labelnames, key if isinstance(key, tuple) else (key,))), v)
+                for key, v in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, *args, **kwargs)
+            return m
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def callback(self, name, help, kind, labelnames, fn: Callable[[], Dict]):
+        """fn() -> {label_value_tuple: value}; replaces any callback registered under name."""
+        with self._lock:
+            self._metrics[name] = _Callback(name, help, kind, labelnames, fn)
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, pairs, value in m.samples():
+                lines.append(f"{name}{_fmt_labels(pairs)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------------- app metrics ----------------
+CACHE_REQUESTS = REGISTRY.counter("travel_reco_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ["cache", "result"])
+CACHE_EVICTIONS = REGISTRY.counter("travel_reco_cache_evictions_total", "Cache entries evicted or invalidated.", ["cache"])
+PARSE_SECONDS = REGISTRY.histogram("travel_reco_parse_seconds", "Search parse latency (cache misses) by source.", ["source"])
+FILTER_RESULTS = REGISTRY.histogram("travel_reco_filter_results", "Number of results returned by filter functions.", ["kind"],
+                                    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+BUNDLE_BUILD_SECONDS = REGISTRY.histogram("travel_reco_bundle_build_seconds", "build_itinerary_bundle wall time.")
+CASCADE_STAGE_SECONDS = REGISTRY.histogram("travel_reco_cascade_stage_seconds", "Hotel cascade latency by stage (retrieve/score/rerank).", ["stage"])
+SINGLEFLIGHT_CALLS = REGISTRY.counter("travel_reco_singleflight_calls_total", "Coalesced calls by group and role (leader ran it, shared waited for it).", ["name", "role"])
+LLM_QUEUE_DEPTH = REGISTRY.gauge("travel_reco_llm_queue_depth", "Callers waiting for remote LLM quota, by lane.", ["limiter", "lane"])
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram("travel_reco_llm_queue_wait_seconds", "Time spent waiting for remote LLM quota, by lane.", ["limiter", "lane"])
+LLM_QUEUE_DROPPED = REGISTRY.counter("travel_reco_llm_queue_dropped_total", "Remote LLM calls given up before sending (deadline / queue_full).", ["limiter", "lane", "reason"])
+LLM_STREAM_SECONDS = REGISTRY.histogram("travel_reco_llm_stream_seconds", "Streamed remote parse: time to the first complete JSON field and to the end.", ["point"])
+WARMUP_TASKS = REGISTRY.counter("travel_reco_warmup_tasks_total", "Start-up cache warming tasks by kind (parse/user_dest) and result (done/skipped/failed).", ["kind", "result"])
+EVENTS = REGISTRY.counter("travel_reco_events_total", "User events by outcome (written / retry = batch write failed / dropped = ring full).", ["result"])
+EVENT_BUFFER_DEPTH = REGISTRY.gauge("travel_reco_event_buffer_depth", "Events waiting in the in-memory ring for the writer thread.")
+EVENT_FLUSH_SECONDS = REGISTRY.histogram("travel_reco_event_flush_seconds", "Time to write one batch of events to the store.")
+
+_watched_memos = {}
+
+
+def watch_memo(cache: str, memo):
+    """Expose an LRUMemo's hit/miss/evict counters and size under the given cache label."""
+    _watched_memos[cache] = memo
+
+REGISTRY.callback("travel_reco_memo_events_total", "Shared memo hits/misses/evictions.", "counter", ["cache", "result"],
+                  lambda: {(name, result): getattr(m, attr) for name, m in list(_watched_memos.items())
+                           for result, attr in (("hit", "hits"), ("miss", "misses"), ("evict", "evictions"))})
+REGISTRY.callback("travel_reco_memo_entries", "Shared memo sizes.", "gauge", ["cache"],
+                  lambda: {(name,): len(m) for name, m in list(_watched_memos.items())})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int = METRICS_PORT, addr: str = METRICS_ADDR, registry: Optional[Registry] = None):
+    """Serve registry on http://addr:port/metrics from a daemon thread. Returns the server."""
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    t = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    t.start()
+    return server
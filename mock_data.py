@@ -0,0 +1,135 @@
+# mock_data.py
+"""
+Seeded mock catalog (destinations, hotels, flights, trains) and demo users.
+"""
+
+import random
+
+from geo import CITY_SPREAD_KM, city_center, city_profile, scatter_point
+
+
+def generate_mock_data(seed=42):
+    random.seed(seed)
+    city_list = [
+        "Mumbai","Delhi","Bengaluru","Chennai","Kolkata","Goa","Jaipur","Udaipur","Agra","Varanasi",
+        "Amritsar","Lucknow","Shimla","Manali","Srinagar","Leh","Munnar","Kochi","Pune","Hyderabad"
+    ]
+    destinations = []
+    for i, city in enumerate(city_list):
+        destinations.append({
+            "id": f"dest_{i}",
+            "name": city,
+            "avg_price": random.randint(4000,15000),
+            "tags": random.sample(["beach","culture","mountains","adventure","nature","relax","city","heritage","shopping","spiritual"], 2),
+            "seasonality": round(random.uniform(0.4,1.0),2)
+        })
+        destinations[-1]["lat"], destinations[-1]["lon"] = city_center(city)
+
+    hotels=[]
+    for i in range(30):
+        dest = random.choice(destinations)
+        price = random.randint(500,10000)
+        rating = round(random.uniform(2.0,4.9),1)
+        hotels.append({
+            "id": f"hotel_{i}",
+            "name": f"{dest['name']} Hotel {i}",
+            "destination_id": dest["id"],
+            "price": price,
+            "rating": rating,
+            "tags": random.sample(dest["tags"] + ["pool","spa","wifi","family","budget","luxury","boutique"], 3),
+            "popularity": round(random.random(),2)
+        })
+        # keyed on the hotel id, not the shared RNG, so flights / trains below don't change
+        hotels[-1]["lat"], hotels[-1]["lon"] = scatter_point((dest["lat"], dest["lon"]), f"hotel_{i}",
+                                                             CITY_SPREAD_KM[city_profile(dest["name"])] / 2, seed)
+
+    airlines = ["Air India","IndiGo","SpiceJet","Vistara","GoAir","AirAsia"]
+    flights=[]
+    total_targets = 400
+    per_dest_min = 10
+    for idx_dest, dest in enumerate(destinations):
+        nd = random.randint(per_dest_min, max(per_dest_min, 20))
+        for idx in range(nd):
+            dep = random.choice(["Mumbai","Delhi","Bengaluru","Chennai","Kolkata","Hyderabad","Pune"])
+            arr = dest["name"]
+            stops = random.choice([0,0,0,1])
+            duration = random.randint(60, 600) + stops*60
+            price = random.randint(1500, 15000)
+            flights.append({
+                "id": f"flight_{dest['id']}_{idx}",
+                "airline": random.choice(airlines),
+                "from": dep,
+                "to": arr,
+                "stops": stops,
+                "duration_mins": duration,
+                "price": price,
+                "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
+                "arrival_time": None,
+                "layovers": [] if stops==0 else [random.choice(["DXB","SIN","BKK","DEL","BLR"])]
+            })
+    while len(flights) < total_targets:
+        dest = random.choice(destinations)
+        idx = len(flights)
+        dep = random.choice(["Mumbai","Delhi","Bengaluru"])
+        arr = dest["name"]
+        stops = random.choice([0,1])
+        duration = random.randint(60, 600) + stops*60
+        price = random.randint(1500,15000)
+        flights.append({
+            "id": f"flight_extra_{idx}",
+            "airline": random.choice(airlines),
+            "from": dep,
+            "to": arr,
+            "stops": stops,
+            "duration_mins": duration,
+            "price": price,
+            "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
+            "arrival_time": None,
+            "layovers": [] if stops==0 else [random.choice(["SIN","DXB","KUL","DEL"])]
+        })
+
+    train_dest_candidates = random.sample(destinations, 15)
+    trains=[]
+    total_train_target = 300
+    for dest in train_dest_candidates:
+        for t in range(12 + random.randint(0,8)):
+            trains.append({
+                "id": f"train_{dest['id']}_{t}",
+                "from": random.choice(["Mumbai","Delhi","Chennai","Kolkata","Bengaluru","Hyderabad"]),
+                "to": dest["name"],
+                "duration_mins": random.randint(120, 1800),
+                "price": random.randint(300, 3000),
+                "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
+                "arrival_time": None,
+                "class": random.choice(["Sleeper","3A","2A","CC"])
+            })
+    while len(trains) < total_train_target:
+        dest = random.choice(train_dest_candidates)
+        idx = len(trains)
+        trains.append({
+            "id": f"train_extra_{idx}",
+            "from": random.choice(["Mumbai","Delhi","Chennai"]),
+            "to": dest["name"],
+            "duration_mins": random.randint(120, 1800),
+            "price": random.randint(300, 3000),
+            "departure_time": f"{random.randint(0,23):02d}:{random.choice([0,15,30,45]):02d}",
+            "arrival_time": None,
+            "class": random.choice(["Sleeper","3A","2A","CC"])
+        })
+
+    users = [
+        {"id":"user_anna","name":"Anna (Budget Beach Lover)","profile":{"trip_type":"solo","budget":{"min":5000,"max":12000},"interests":["beach","nightlife"]},
+         "past_trips":[{"destination_id":"dest_5","year":2023,"tags":["beach","nightlife"]},{"destination_id":"dest_3","year":2022,"tags":["relax","culture"]}]},
+        {"id":"user_raj","name":"Raj (Adventure Seeker)","profile":{"trip_type":"couple","budget":{"min":10000,"max":20000},"interests":["adventure","nature","photography"]},
+         "past_trips":[{"destination_id":"dest_2","year":2024,"tags":["adventure"]},{"destination_id":"dest_14","year":2021,"tags":["photography","nature"]}]},
+        {"id":"user_sara","name":"Sara (Family Relax)","profile":{"trip_type":"family","budget":{"min":8000,"max":15000},"interests":["family","relax","culture"]},
+         "past_trips":[{"destination_id":"dest_12","year":2022,"tags":["family","mountains"]},{"destination_id":"dest_8","year":2020,"tags":["heritage","culture"]}]}
+    ]
+
+    return {
+        "destinations": destinations,
+        "hotels": hotels,
+        "flights": flights,
+        "trains": trains,
+        "users": users
+    }
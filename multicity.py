@@ -0,0 +1,251 @@
+# multicity.py
+"""
+Multi-city trip planning: origin -> city -> city -> ... (-> origin).
+
+The inter-city graph comes from the flight and train inventories. They list
+hub -> city services, so each service is assumed to run in the reverse
+direction at the same price and duration. Cities without a direct service
+connect through a hub (shortest paths over the whole graph). Legs are weighted
+by price plus TIME_VALUE_PER_HOUR per hour of travel.
+
+Visit order: exact DP over subsets (Held-Karp) up to DP_MAX_CITIES, beam search
+above that, so the planner stays interactive. Nights: every city gets
+MIN_NIGHTS, and the remaining nights go one at a time to the city with the best
+marginal value (destination score, diminishing per extra night) minus that
+city's nightly cost.
+"""
+
+import heapq
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+TIME_VALUE_PER_HOUR = 250      # rupees a traveller would pay to save an hour in transit
+CONNECTION_MINS = 90           # buffer added when a leg changes service at a hub
+DP_MAX_CITIES = 9
+BEAM_WIDTH = 32
+MIN_NIGHTS = 1
+NIGHT_VALUE = 4000             # value of the first night in the best-scoring city; halves per extra night
+
+INF = float("inf")
+
+
+def _weight(price, mins):
+    return price + TIME_VALUE_PER_HOUR * mins / 60.0
+
+
+class TransportGraph:
+    """All-pairs cheapest (price + time value) routes between catalog cities."""
+
+    def __init__(self, flights: Sequence[Dict[str, Any]], trains: Sequence[Dict[str, Any]]):
+        direct: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        names: Dict[str, str] = {}
+
+        def consider(a, b, rec, kind):
+            key = (a.lower(), b.lower())
+            seg = {"kind": kind, "id": rec["id"], "from": a, "to": b, "price": rec["price"], "duration_mins": rec["duration_mins"]}
+            best = direct.get(key)
+            if best is None or _weight(seg["price"], seg["duration_mins"]) < _weight(best["price"], best["duration_mins"]):
+                direct[key] = seg
+
+        for kind, items in (("flight", flights), ("train", trains)):
+            for rec in items:
+                a, b = rec["from"], rec["to"]
+                if a.lower() == b.lower():
+                    continue
+                names.setdefault(a.lower(), a)
+                names.setdefault(b.lower(), b)
+                consider(a, b, rec, kind)
+                consider(b, a, rec, kind)
+
+        self.names = names
+        nodes = sorted(names)
+        self._idx = {c: i for i, c in enumerate(nodes)}
+        n = len(nodes)
+        dist = [[INF] * n for _ in range(n)]
+        nxt: List[List[Optional[int]]] = [[None] * n for _ in range(n)]
+        for i in range(n):
+            dist[i][i] = 0.0
+            nxt[i][i] = i
+        for (a, b), seg in direct.items():
+            i, j = self._idx[a], self._idx[b]
+            dist[i][j] = _weight(seg["price"], seg["duration_mins"])
+            nxt[i][j] = j
+        # Floyd-Warshall; a change of service costs CONNECTION_MINS of time value
+        penalty = _weight(0, CONNECTION_MINS)
+        for k in range(n):
+            dk = dist[k]
+            for i in range(n):
+                dik = dist[i][k]
+                if dik == INF:
+                    continue
+                di, ni = dist[i], nxt[i]
+                for j in range(n):
+                    alt = dik + dk[j] + penalty
+                    if alt < di[j]:
+                        di[j] = alt
+                        ni[j] = ni[k]
+        self._nodes = nodes
+        self._dist = dist
+        self._next = nxt
+        self._direct = direct
+
+    def has(self, city: str) -> bool:
+        return city.lower() in self._idx
+
+    def weight(self, a: str, b: str) -> float:
+        i, j = self._idx.get(a.lower()), self._idx.get(b.lower())
+        if i is None or j is None:
+            return INF
+        return self._dist[i][j]
+
+    def route(self, a: str, b: str) -> Optional[List[Dict[str, Any]]]:
+        """Segments of the best a -> b route ([] when a == b, None when unreachable)."""
+        i, j = self._idx.get(a.lower()), self._idx.get(b.lower())
+        if i is None or j is None or self._dist[i][j] == INF:
+            return None
+        segs = []
+        while i != j:
+            k = self._next[i][j]
+            segs.append(self._direct[(self._nodes[i], self._nodes[k])])
+            i = k
+        return segs
+
+
+def order_cities(origin: str, cities: List[str], weight: Callable[[str, str], float],
+                 return_to_origin: bool = True) -> Tuple[List[str], float, str, int]:
+    """Cheapest visiting order of all cities. Returns (order, total weight, method, states explored)."""
+    n = len(cities)
+    if n == 0:
+        return [], 0.0, "dp", 0
+    w0 = [weight(origin, c) for c in cities]
+    wr = [weight(c, origin) if return_to_origin else 0.0 for c in cities]
+    w = [[weight(a, b) for b in cities] for a in cities]
+
+    if n <= DP_MAX_CITIES:
+        # best[mask][last]: cheapest way to visit `mask` ending in `last`
+        full = (1 << n) - 1
+        best = [[INF] * n for _ in range(1 << n)]
+        parent = [[-1] * n for _ in range(1 << n)]
+        for i in range(n):
+            best[1 << i][i] = w0[i]
+        explored = 0
+        for mask in range(1, 1 << n):
+            row = best[mask]
+            for last in range(n):
+                cur = row[last]
+                if cur == INF:
+                    continue
+                explored += 1
+                wl = w[last]
+                for nxt in range(n):
+                    if mask & (1 << nxt):
+                        continue
+                    m2 = mask | (1 << nxt)
+                    c2 = cur + wl[nxt]
+                    if c2 < best[m2][nxt]:
+                        best[m2][nxt] = c2
+                        parent[m2][nxt] = last
+        end = min(range(n), key=lambda i: best[full][i] + wr[i])
+        total = best[full][end] + wr[end]
+        order, mask, cur = [], full, end
+        while cur != -1:
+            order.append(cur)
+            prev = parent[mask][cur]
+            mask ^= 1 << cur
+            cur = prev
+        return [cities[i] for i in reversed(order)], total, "dp", explored
+
+    # beam search: keep the BEAM_WIDTH cheapest partial orders at each depth
+    beam = [(w0[i], (i,)) for i in range(n)]
+    beam = heapq.nsmallest(BEAM_WIDTH, beam)
+    explored = len(beam)
+    for _ in range(n - 1):
+        expanded = []
+        for cost, seq in beam:
+            seen = set(seq)
+            wl = w[seq[-1]]
+            for nxt in range(n):
+                if nxt not in seen:
+                    expanded.append((cost + wl[nxt], seq + (nxt,)))
+        explored += len(expanded)
+        beam = heapq.nsmallest(BEAM_WIDTH, expanded)
+    total, seq = min(((cost + wr[seq[-1]], seq) for cost, seq in beam), key=lambda x: x[0])
+    return [cities[i] for i in seq], total, "beam", explored
+
+
+def allocate_nights(total_nights: int, night_cost: List[float], scores: List[float],
+                    min_nights: int = MIN_NIGHTS) -> List[int]:
+    """Split total_nights over the cities (each gets min_nights first)."""
+    n = len(night_cost)
+    nights = [min_nights] * n
+    top = max(scores) if scores and max(scores) > 0 else 1.0
+    heap = [(-(NIGHT_VALUE * scores[i] / top / 2 ** min_nights - night_cost[i]), i) for i in range(n)]
+    heapq.heapify(heap)
+    for _ in range(max(0, total_nights - min_nights * n)):
+        _, i = heapq.heappop(heap)
+        nights[i] += 1
+        heapq.heappush(heap, (-(NIGHT_VALUE * scores[i] / top / 2 ** nights[i] - night_cost[i]), i))
+    return nights
+
+
+def plan_trip(origin: str, stops: List[Dict[str, Any]], total_nights: int, graph: TransportGraph,
+              itinerary_fn: Callable[[str, int, str], Dict[str, Any]], return_to_origin: bool = True,
+              start: Optional[date] = None) -> Optional[Dict[str, Any]]:
+    """
+    stops: [{"destination", "score", "hotel", "night_cost", "poi_cost_per_night"}] candidate cities, best first
+    itinerary_fn(dest_id, nights, start_date_str) -> itinerary for one leg
+    Cities that can't be reached, or don't fit min nights into total_nights, are dropped (lowest score first).
+    """
+    stops = [s for s in stops if graph.has(s["destination"]["name"]) and graph.weight(origin, s["destination"]["name"]) < INF]
+    stops = stops[:max(0, total_nights // MIN_NIGHTS)]
+    if not stops:
+        return None
+    by_name = {s["destination"]["name"]: s for s in stops}
+    order, weight_total, method, explored = order_cities(origin, list(by_name), graph.weight, return_to_origin)
+
+    ordered = [by_name[c] for c in order]
+    nights = allocate_nights(total_nights, [s["night_cost"] + s["poi_cost_per_night"] for s in ordered],
+                             [s["score"] for s in ordered])
+
+    day = start or date.today()
+    out_stops = []
+    travel_cost = travel_mins = hotel_cost = poi_cost = 0
+    prev = origin
+    for s, n in zip(ordered, nights):
+        name = s["destination"]["name"]
+        leg = graph.route(prev, name) or []
+        it = itinerary_fn(s["destination"]["id"], n, day.isoformat())
+        leg_poi = sum(p.get("approx_cost_from_hotel", 0) or 0 for d in it.get("days", [])
+                      for slot in ["morning", "afternoon", "evening"] for p in d.get(slot, []))
+        out_stops.append({
+            "destination": s["destination"],
+            "arrive": day.isoformat(),
+            "nights": n,
+            "hotel": s["hotel"],
+            "leg": leg,
+            "itinerary": it,
+            "hotel_cost": (s["hotel"]["price"] * n) if s["hotel"] else 0,
+            "poi_cost": leg_poi,
+        })
+        travel_cost += sum(seg["price"] for seg in leg)
+        travel_mins += sum(seg["duration_mins"] for seg in leg)
+        hotel_cost += out_stops[-1]["hotel_cost"]
+        poi_cost += leg_poi
+        day += timedelta(days=n)
+        prev = name
+    return_leg = (graph.route(prev, origin) or []) if return_to_origin else []
+    travel_cost += sum(seg["price"] for seg in return_leg)
+    travel_mins += sum(seg["duration_mins"] for seg in return_leg)
+
+    return {
+        "origin": origin,
+        "total_nights": sum(nights),
+        "stops": out_stops,
+        "return_leg": return_leg,
+        "cost": {"travel": travel_cost, "hotel": hotel_cost, "poi": poi_cost,
+                 "total": travel_cost + hotel_cost + poi_cost},
+        "travel_hours": round(travel_mins / 60.0, 1),
+        "route_weight": round(weight_total, 1),
+        "method": method,
+        "explored": explored,
+    }
@@ -0,0 +1,134 @@
+# poi_index.py
+"""
+Hotel -> POI travel index, one block per destination:
+
+    grid                     geo.GeoGrid over the city's POI coordinates
+    nearest(hotel, k)        k nearest POIs by distance (grid ring search)
+    within(hotel, minutes)   POIs within a travel time (grid radius search)
+
+Travel minutes / cost come from geo.travel_estimate over the haversine
+distance between the hotel and the POI, with the city's speed profile, and are
+computed for the pairs asked for only; nothing is materialised per hotel x POI,
+so a block is cheap to build however large the city is. Since minutes grow
+with distance, "nearest" and "quickest to reach" are the same order. Blocks are
+built on first use, tagged with the destination's catalog version, and dropped
+when the catalog reports a change to their destination; a block built while a
+delta landed carries the old version and is rebuilt on the next lookup.
+
+Hotels / POIs without coordinates get a stable point near the city centre
+(geo.point_of), so every process building the index gets the same numbers.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geo import GeoGrid, city_profile, haversine_km, point_of, reach_km, travel_estimate
+
+NEAREST_K = 32
+# "nearby" radius used by the explore view
+NEARBY_MINUTES = 20
+
+
+class DestinationTravelIndex:
+    def __init__(self, hotels: List[Dict], pois: List[Dict], dest: Optional[Dict] = None, seed: int = 42,
+                 k: int = NEAREST_K):
+        self.profile = city_profile((dest or {}).get("name"))
+        self.hotel_pt = {h["id"]: point_of(h, dest, seed) for h in hotels}
+        self.pois = list(pois)
+        self.poi_pos = {p["id"]: j for j, p in enumerate(self.pois)}
+        pts = [point_of(p, dest, seed) for p in self.pois]
+        self.grid = GeoGrid([la for la, _ in pts], [lo for _, lo in pts])
+        self.k = k
+
+    def _estimate(self, pt, cols, km=None):
+        if km is None:
+            km = haversine_km(pt[0], pt[1], self.grid.lat[cols], self.grid.lon[cols])
+        return travel_estimate(km, self.profile)
+
+    def travel(self, hotel_id: str, poi_id: str) -> Optional[Dict[str, int]]:
+        pt = self.hotel_pt.get(hotel_id)
+        j = self.poi_pos.get(poi_id)
+        if pt is None or j is None:
+            return None
+        mins, cost = self._estimate(pt, np.array([j]))
+        return {"mins": int(mins[0]), "cost": int(cost[0])}
+
+    def travel_many(self, hotel_id: str, poi_ids) -> Dict[str, Dict[str, int]]:
+        """{poi_id: {"mins", "cost"}} for the known POIs among poi_ids (one vectorized call)."""
+        pt = self.hotel_pt.get(hotel_id)
+        ids = [pid for pid in poi_ids if pid in self.poi_pos]
+        if pt is None or not ids:
+            return {}
+        mins, cost = self._estimate(pt, np.array([self.poi_pos[pid] for pid in ids]))
+        return {pid: {"mins": m, "cost": c} for pid, m, c in zip(ids, mins.tolist(), cost.tolist())}
+
+    def poi_travel(self, poi_id: str, poi_ids) -> Dict[str, Dict[str, int]]:
+        """POI -> POI travel: the precomputed travel_to row of small cities, else estimated for these pairs."""
+        j = self.poi_pos.get(poi_id)
+        if j is None:
+            return {}
+        row = self.pois[j].get("travel_to") or {}
+        out = {pid: row[pid] for pid in poi_ids if pid in row}
+        rest = [pid for pid in poi_ids if pid not in out and pid in self.poi_pos]
+        if rest:
+            mins, cost = self._estimate((self.grid.lat[j], self.grid.lon[j]), np.array([self.poi_pos[pid] for pid in rest]))
+            out.update({pid: {"mins": m, "cost": c} for pid, m, c in zip(rest, mins.tolist(), cost.tolist())})
+        return out
+
+    def nearest_pois(self, hotel_id: str, k: Optional[int] = None) -> List[Tuple[Dict, int, int]]:
+        """[(poi, mins, cost)] for the k nearest POIs of the hotel, closest first."""
+        pt = self.hotel_pt.get(hotel_id)
+        if pt is None:
+            return []
+        cols, km = self.grid.nearest(pt[0], pt[1], self.k if k is None else k)
+        return self._rows(cols, *self._estimate(pt, cols, km))
+
+    def within(self, hotel_id: str, max_mins: int) -> List[Tuple[Dict, int, int]]:
+        """[(poi, mins, cost)] reachable from the hotel within max_mins, closest first."""
+        pt = self.hotel_pt.get(hotel_id)
+        if pt is None:
+            return []
+        cols, km = self.grid.within(pt[0], pt[1], reach_km(max_mins, self.profile) + 1e-6)
+        mins, cost = self._estimate(pt, cols, km)
+        keep = mins <= max_mins
+        return self._rows(cols[keep], mins[keep], cost[keep])
+
+    def _rows(self, cols, mins, cost):
+        return [(self.pois[j], m, c) for j, m, c in zip(cols.tolist(), mins.tolist(), cost.tolist())]
+
+
+class HotelPOIIndex:
+    def __init__(self, catalog, k: int = NEAREST_K):
+        self.catalog = catalog
+        self.k = k
+        self._blocks: Dict[str, Tuple[int, DestinationTravelIndex]] = {}   # dest_id -> (dest_version, block)
+        self._lock = threading.Lock()
+        catalog.subscribe(lambda version, changed: self.invalidate(changed))
+
+    def invalidate(self, dest_ids):
+        with self._lock:
+            for d in dest_ids:
+                self._blocks.pop(d, None)
+
+    def for_destination(self, dest_id: str) -> DestinationTravelIndex:
+        # read the version before the records: a delta applied meanwhile leaves this block marked stale
+        version = self.catalog.dest_version(dest_id)
+        with self._lock:
+            hit = self._blocks.get(dest_id)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+        block = DestinationTravelIndex(self.catalog.hotels_by_dest.get(dest_id, []),
+                                       self.catalog.pois_map.get(dest_id, []),
+                                       dest=self.catalog.dest_map.get(dest_id),
+                                       seed=self.catalog.seed, k=self.k)
+        with self._lock:
+            cur = self._blocks.get(dest_id)
+            if cur is None or cur[0] <= version:
+                self._blocks[dest_id] = (version, block)
+        return block
+
+    def travel_map(self, dest_id: str, hotel_id: str, poi_ids) -> Dict[str, Dict[str, int]]:
+        """{poi_id: {"mins", "cost"}} from hotel_id for the given POIs of dest_id."""
+        return self.for_destination(dest_id).travel_many(hotel_id, poi_ids)
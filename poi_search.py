@@ -0,0 +1,215 @@
+# poi_search.py
+"""
+Full-text POI search: an inverted index over tokenized POI names and
+categories, scored with BM25.
+
+    idx = POISearchIndex(catalog.pois_map)
+    idx.search("fort")                        # [(dest_id, poi, score)] across every city
+    idx.search("beach", dest_id="dest_5")     # one city
+    idx.interest_scores("dest_5", ["beach", "nightlife"])   # {poi_id: score}
+
+Postings are grouped by city (token -> {dest_id: [(position, weight)]}), so a
+per-city query only touches that city's postings and set_city() can replace
+one city's POIs after a catalog delta without rebuilding the rest. Corpus
+statistics (document count, document frequency, average length) are global,
+so scores are comparable across cities.
+
+Global queries read per-term numpy arrays flattened from those postings
+(built on first use, dropped when a city holding the term changes), so a
+query over 100k+ POIs is a few vector operations per term.
+
+Name tokens count NAME_WEIGHT times and category tokens once: "Museum" in a
+name is better evidence than a coarse category. Tokens are lowercased and
+lightly de-pluralised ("forts" -> "fort", "beaches" -> "beach").
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+NAME_WEIGHT = 2
+CATEGORY_WEIGHT = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _stem(tok: str) -> str:
+    if len(tok) <= 3:
+        return tok
+    if tok.endswith("ies"):
+        return tok[:-3] + "y"
+    if tok.endswith(("ches", "shes", "sses", "xes")):
+        return tok[:-2]
+    if tok.endswith("s") and not tok.endswith(("ss", "us")):
+        return tok[:-1]
+    return tok
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN.findall(str(text or "").lower())]
+
+
+def _doc_terms(poi: Dict[str, Any]) -> Counter:
+    terms = Counter()
+    for t in tokenize(poi.get("name", "")):
+        terms[t] += NAME_WEIGHT
+    for t in tokenize(poi.get("category", "")):
+        terms[t] += CATEGORY_WEIGHT
+    return terms
+
+
+class POISearchIndex:
+    def __init__(self, pois_map: Optional[Dict[str, List[Dict[str, Any]]]] = None, k1: float = K1, b: float = B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._pois: Dict[str, List[Dict[str, Any]]] = {}
+        self._terms: Dict[str, List[Counter]] = {}        # per city, per POI: term -> tf
+        self._lens: Dict[str, List[int]] = {}
+        self._post: Dict[str, Dict[str, List[Tuple[int, int]]]] = defaultdict(dict)
+        self._df: Counter = Counter()
+        self._n = 0
+        self._total_len = 0
+        # global query path: term -> (city codes, positions, tf, doc lengths) arrays
+        self._flat: Dict[str, Tuple[np.ndarray, ...]] = {}
+        self._codes: Dict[str, int] = {}
+        self._code_dest: List[str] = []
+        for dest_id, pois in (pois_map or {}).items():
+            self.set_city(dest_id, pois)
+
+    def __len__(self):
+        return self._n
+
+    # ---------------- building ----------------
+    def set_city(self, dest_id: str, pois: Iterable[Dict[str, Any]]):
+        """(Re)index one city's POIs."""
+        pois = list(pois)
+        terms = [_doc_terms(p) for p in pois]
+        with self._lock:
+            self._drop(dest_id)
+            self._pois[dest_id] = pois
+            self._terms[dest_id] = terms
+            self._lens[dest_id] = [sum(t.values()) for t in terms]
+            by_term: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+            for i, t in enumerate(terms):
+                for term, tf in t.items():
+                    by_term[term].append((i, tf))
+            for term, plist in by_term.items():
+                self._post[term][dest_id] = plist
+                self._df[term] += len(plist)
+                self._flat.pop(term, None)
+            if dest_id not in self._codes:
+                self._codes[dest_id] = len(self._code_dest)
+                self._code_dest.append(dest_id)
+            self._n += len(pois)
+            self._total_len += sum(self._lens[dest_id])
+
+    def remove_city(self, dest_id: str):
+        with self._lock:
+            self._drop(dest_id)
+
+    def _drop(self, dest_id):
+        if dest_id not in self._pois:
+            return
+        for t in self._terms[dest_id]:
+            for term in t:
+                self._flat.pop(term, None)
+                self._df[term] -= 1
+                self._post[term].pop(dest_id, None)
+                if not self._post[term]:
+                    del self._post[term]
+                    del self._df[term]
+        self._n -= len(self._pois[dest_id])
+        self._total_len -= sum(self._lens[dest_id])
+        for d in (self._pois, self._terms, self._lens):
+            del d[dest_id]
+
+    # ---------------- querying ----------------
+    def _flat_postings(self, term):
+        flat = self._flat.get(term)
+        if flat is None:
+            by_city = self._post[term]
+            codes, pos, tf, lens = [], [], [], []
+            for d, plist in by_city.items():
+                code, dl = self._codes[d], self._lens[d]
+                for i, f in plist:
+                    codes.append(code)
+                    pos.append(i)
+                    tf.append(f)
+                    lens.append(dl[i])
+            flat = (np.array(codes, dtype=np.int64), np.array(pos, dtype=np.int64),
+                    np.array(tf, dtype=np.float64), np.array(lens, dtype=np.float64))
+            self._flat[term] = flat
+        return flat
+
+    def _search_global(self, tokens: List[str], limit: int) -> List[Tuple[Tuple[str, int], float]]:
+        avgdl = self._total_len / self._n
+        k1, b = self.k1, self.b
+        keys, parts = [], []
+        for term, qtf in Counter(tokens).items():
+            if term not in self._post:
+                continue
+            codes, pos, tf, lens = self._flat_postings(term)
+            df = self._df[term]
+            idf = math.log(1.0 + (self._n - df + 0.5) / (df + 0.5))
+            keys.append(codes * (1 << 32) + pos)
+            parts.append(qtf * idf * tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * lens / avgdl)))
+        if not keys:
+            return []
+        uniq, inv = np.unique(np.concatenate(keys), return_inverse=True)
+        totals = np.bincount(inv, weights=np.concatenate(parts))
+        top = np.argsort(-totals, kind="stable")[:limit]
+        return [((self._code_dest[int(uniq[j] >> 32)], int(uniq[j] & 0xFFFFFFFF)), float(totals[j])) for j in top]
+
+    def _score(self, tokens: List[str], dest_id: str) -> Dict[Tuple[str, int], float]:
+        """BM25 of the query for every POI of one city that matches a token."""
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+        with self._lock:
+            if not self._n:
+                return scores
+            avgdl = self._total_len / self._n
+            k1, b = self.k1, self.b
+            for term, qtf in Counter(tokens).items():
+                by_city = self._post.get(term)
+                if not by_city:
+                    continue
+                df = self._df[term]
+                idf = math.log(1.0 + (self._n - df + 0.5) / (df + 0.5))
+                plist = by_city.get(dest_id)
+                if not plist:
+                    continue
+                lens = self._lens[dest_id]
+                for i, tf in plist:
+                    norm = k1 * (1.0 - b + b * lens[i] / avgdl)
+                    scores[(dest_id, i)] += qtf * idf * tf * (k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, dest_id: Optional[str] = None, limit: int = 10) -> List[Tuple[str, Dict[str, Any], float]]:
+        """[(dest_id, poi, score)] best first; dest_id restricts the search to one city."""
+        tokens = tokenize(query)
+        with self._lock:
+            if not self._n:
+                return []
+            if dest_id is None:
+                ranked = self._search_global(tokens, limit)
+            else:
+                scores = self._score(tokens, dest_id)
+                ranked = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+            return [(d, self._pois[d][i], round(s, 4)) for (d, i), s in ranked]
+
+    def interest_scores(self, dest_id: str, interests: Optional[Iterable[str]]) -> Dict[str, float]:
+        """{poi_id: BM25 score of the interests as one query} for POIs of dest_id that match any interest."""
+        tokens = [t for interest in (interests or []) for t in tokenize(interest)]
+        if not tokens:
+            return {}
+        with self._lock:
+            scores = self._score(tokens, dest_id)
+            pois = self._pois.get(dest_id, [])
+            return {pois[i]["id"]: s for (_, i), s in scores.items()}
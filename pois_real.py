@@ -1,13 +1,19 @@
 # pois_real.py
 # Curated POI lists for 20 Indian cities (30 places each).
-# Each POI includes: id, name, category, duration_mins,
-# approx_travel_mins_from_hotel, approx_cost_from_hotel, travel_to (pairwise travel/time cost).
+# Each POI includes: id, name, category, duration_mins, lat, lon,
+# approx_travel_mins_from_hotel, approx_cost_from_hotel (from the city centre, where hotels cluster)
+# and travel_to (pairwise travel/time cost; only precomputed for cities with few POIs).
 #
-# Deterministic travel times & costs are generated using seeded RNG so values are reproducible.
+# Coordinates are scattered around the real city centre with a seeded RNG so values are reproducible;
+# travel times & costs come from geo.travel_estimate over the haversine distance.
 # This file is mock/demo data (names are real/curated, travel times/costs are approximations).
 
 import random
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from geo import CITY_SPREAD_KM, city_profile, dest_center, haversine_km, offset_point, travel_estimate
 
 # curated 30 POIs per city (real or plausible place names)
 POIS_BY_CITY = {
@@ -213,6 +219,70 @@ def _ensure_30(names_list, city, seed_base):
         idx += 1
     return out[:30]
 
+def poi_rng_base(seed: int, dest_index: int) -> int:
+    """Seed base used for all POIs of the destination at position dest_index."""
+    return seed + dest_index * 101
+
+# cities with more POIs than this get no dense travel_to table (use poi_index / geo on demand)
+DENSE_TRAVEL_MAX_POIS = 60
+
+def make_poi(dest_id: str, i: int, pname: str, rng_base: int, dest: Optional[Dict] = None) -> Dict:
+    """Build the i-th POI of a destination (without its travel_to row). dest: {"name", "lat", "lon"}."""
+    rng = random.Random(rng_base + i * 13)
+    # choose a category heuristically from name or default
+    category = None
+    lname = pname.lower()
+    if any(k in lname for k in ["temple","mandir","gurudwara","mosque"]):
+        category = "temple"
+    elif any(k in lname for k in ["museum","gallery","palace","fort"]):
+        category = "historic"
+    elif any(k in lname for k in ["beach","lake","river","falls"]):
+        category = "nature"
+    elif any(k in lname for k in ["market","bazaar","mall","street"]):
+        category = "market"
+    elif any(k in lname for k in ["garden","park","botanic"]):
+        category = "park"
+    else:
+        category = rng.choice(DEFAULT_CATEGORIES)
+
+    duration = rng.choice([45, 60, 75, 90, 120])
+    profile = city_profile((dest or {}).get("name"))
+    center = dest_center(dest)
+    spread = CITY_SPREAD_KM[profile]
+    lat, lon = offset_point(center, rng.gauss(0.0, spread), rng.gauss(0.0, spread))
+    mins, cost = travel_estimate(haversine_km(center[0], center[1], lat, lon), profile)
+
+    return {
+        "id": f"{dest_id}_poi_{i}",
+        "name": pname,
+        "category": category,
+        "duration_mins": duration,
+        "lat": lat,
+        "lon": lon,
+        "approx_travel_mins_from_hotel": max(5, int(mins)),
+        "approx_cost_from_hotel": max(15, int(cost)),
+        "travel_to": {}
+    }
+
+def travel_rows(sources: List[Dict], targets: List[Dict], profile: str = "town") -> List[Dict[str, Dict]]:
+    """{target_id: {"mins", "cost"}} for each source POI (one vectorized distance matrix)."""
+    if not sources or not targets:
+        return [{} for _ in sources]
+    km = haversine_km(np.array([[p["lat"]] for p in sources]), np.array([[p["lon"]] for p in sources]),
+                      np.array([q["lat"] for q in targets]), np.array([q["lon"] for q in targets]))
+    mins, cost = travel_estimate(km, profile)
+    ids = [q["id"] for q in targets]
+    return [{qid: {"mins": m, "cost": c} for qid, m, c in zip(ids, mrow, crow)}
+            for mrow, crow in zip(mins.tolist(), cost.tolist())]
+
+def fill_travel_to(poi_list: List[Dict], profile: str = "town") -> bool:
+    """Precompute the dense travel_to table of a small city; False (and empty rows) above DENSE_TRAVEL_MAX_POIS."""
+    dense = len(poi_list) <= DENSE_TRAVEL_MAX_POIS
+    rows = travel_rows(poi_list, poi_list, profile) if dense else [{} for _ in poi_list]
+    for p, row in zip(poi_list, rows):
+        p["travel_to"] = row
+    return dense
+
 def get_pois_map(destinations: List[Dict], seed: int = 42) -> Dict[str, List[Dict]]:
     """
     Build POI objects for each destination in the destinations list.
@@ -225,53 +295,10 @@ def get_pois_map(destinations: List[Dict], seed: int = 42) -> Dict[str, List[Dic
         dest_id = dest.get("id", f"dest_{di}")
         curated = POIS_BY_CITY.get(city_name, [])
         curated30 = _ensure_30(curated, city_name, seed + di)
-        rng_base = seed + di * 101
-
-        poi_list = []
-        for i, pname in enumerate(curated30):
-            rng = random.Random(rng_base + i * 13)
-            # choose a category heuristically from name or default
-            category = None
-            lname = pname.lower()
-            if any(k in lname for k in ["temple","mandir","gurudwara","mosque"]):
-                category = "temple"
-            elif any(k in lname for k in ["museum","gallery","palace","fort"]):
-                category = "historic"
-            elif any(k in lname for k in ["beach","lake","river","falls"]):
-                category = "nature"
-            elif any(k in lname for k in ["market","bazaar","mall","street"]):
-                category = "market"
-            elif any(k in lname for k in ["garden","park","botanic"]):
-                category = "park"
-            else:
-                category = rng.choice(DEFAULT_CATEGORIES)
-
-            duration = rng.choice([45, 60, 75, 90, 120])
-            mins_from_hotel = rng.choice([8,10,12,15,18,20,25,30,35,40])
-            cost_from_hotel = int(max(15, mins_from_hotel * rng.uniform(2.0, 5.5)))
-
-            poi_id = f"{dest_id}_poi_{i}"
-            poi = {
-                "id": poi_id,
-                "name": pname,
-                "category": category,
-                "duration_mins": duration,
-                "approx_travel_mins_from_hotel": mins_from_hotel,
-                "approx_cost_from_hotel": cost_from_hotel,
-                "travel_to": {}
-            }
-            poi_list.append(poi)
+        rng_base = poi_rng_base(seed, di)
 
-        # fill pairwise travel_to (symmetric-ish)
-        for i, p in enumerate(poi_list):
-            for j, q in enumerate(poi_list):
-                if i == j:
-                    p["travel_to"][q["id"]] = {"mins": 0, "cost": 0}
-                    continue
-                rng = random.Random(rng_base + i * 37 + j * 17)
-                mins = int(rng.uniform(5, 60))
-                cost = int(max(10, mins * rng.uniform(1.2, 4.0)))
-                p["travel_to"][q["id"]] = {"mins": mins, "cost": cost}
+        poi_list = [make_poi(dest_id, i, pname, rng_base, dest) for i, pname in enumerate(curated30)]
+        fill_travel_to(poi_list, city_profile(city_name))
 
         pois_map[dest_id] = poi_list
     return pois_map
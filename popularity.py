@@ -0,0 +1,194 @@
+# popularity.py
+"""
+Live popularity from user events: exponentially time-decayed counts per
+hotel / destination / POI, updated in O(1) per event.
+
+    tracker = PopularityTracker(half_life_s=3 * 3600)
+    tracker.add("hotel", "hotel_3", weight=1.0, ts=event_ts)
+    tracker.maybe_publish()               # writer side only
+    live = tracker.live("hotel")          # None until the first published event
+    live.get("hotel_3")                   # 0..1 (log-scaled against the kind's top item)
+
+Decay uses a landmark ("forward decay"): an event at ts adds
+weight * exp(rate * (ts - landmark)), and reading divides by
+exp(rate * (now - landmark)), so nothing is touched per tick and events can
+arrive out of order. Everything is rescaled to a new landmark once the
+exponent gets large (rare, O(items)).
+
+Per kind, the busiest items (up to head_size) are counted exactly in a dict;
+everything else goes into a count-min sketch (depth x width, over-estimates
+only). A tail item whose sketch estimate reaches the head floor is promoted
+while there is room; publish() demotes the weakest head items back into the
+sketch when the head fills up. Head and tail are normalised against the same
+top value, so promoting an item doesn't move anyone else's popularity.
+
+Readers never lock and never publish: live() returns the last
+PopularitySnapshot, built by publish() and swapped in with one assignment.
+Writers (the event sink's flush thread, start-up replay) share one lock and
+call maybe_publish() after adding events and on idle ticks, so the last
+events of a burst still show up within snapshot_interval_s.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+HALF_LIFE_S = 3 * 3600.0
+HEAD_SIZE = 1024
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+# decayed weight a tail item needs before it gets an exact counter
+PROMOTE_MIN = 2.0
+SNAPSHOT_INTERVAL_S = 2.0
+# rescale once stored values reach ~e^50
+_RENORMALIZE_AT = 50.0
+
+
+def _cells(key, depth, width):
+    # hash() of a str is per-process; sketches never leave the process
+    return [hash((r, key)) % width for r in range(depth)]
+
+
+class PopularitySnapshot:
+    """Read-only view of one kind at publish time: get(item_id) -> 0..1."""
+
+    def __init__(self, head: Dict[str, float], sketch, decay: float, top: float):
+        self._head = head              # already normalised
+        self._sketch = sketch          # scaled values; copy, never written again
+        self._decay = decay
+        self._log_top = math.log1p(top) if top > 0 else 1.0
+        self.width = len(sketch[0]) if sketch else 0
+
+    def get(self, item_id, default: float = 0.0) -> float:
+        v = self._head.get(item_id)
+        if v is not None:
+            return v
+        if not self.width:
+            return default
+        est = min(row[c] for row, c in zip(self._sketch, _cells(item_id, len(self._sketch), self.width)))
+        if est <= 0:
+            return default
+        return min(1.0, math.log1p(est * self._decay) / self._log_top)
+
+    def top(self, n: int = 10):
+        """[(item_id, popularity)] of the exactly-counted head, most popular first."""
+        return sorted(self._head.items(), key=lambda kv: -kv[1])[:n]
+
+
+class DecayedCounts:
+    def __init__(self, half_life_s: float = HALF_LIFE_S, head_size: int = HEAD_SIZE,
+                 width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.rate = math.log(2.0) / half_life_s
+        self.head_size = head_size
+        self.width = width
+        self.depth = depth
+        self.landmark = None
+        self.head: Dict[str, float] = {}
+        # sketch estimate each head item was promoted with (already counted in the sketch)
+        self.seed: Dict[str, float] = {}
+        self.sketch = [[0.0] * width for _ in range(depth)]
+        self.floor = PROMOTE_MIN
+        # largest scaled sketch estimate seen; with the head max this is the normalisation top
+        self.tail_max = 0.0
+
+    def _scale(self, ts):
+        return math.exp(self.rate * (ts - self.landmark))
+
+    def _renormalize(self, ts):
+        f = 1.0 / self._scale(ts)
+        self.landmark = ts
+        for k in self.head:
+            self.head[k] *= f
+            self.seed[k] *= f
+        for row in self.sketch:
+            for c in range(self.width):
+                row[c] *= f
+        self.tail_max *= f
+
+    def add(self, key, weight: float, ts: float):
+        if self.landmark is None:
+            self.landmark = ts
+        elif self.rate * (ts - self.landmark) > _RENORMALIZE_AT:
+            self._renormalize(ts)
+        scale = self._scale(ts)
+        v = weight * scale
+        if key in self.head:
+            self.head[key] += v
+            return
+        cols = _cells(key, self.depth, self.width)
+        est = None
+        for row, c in zip(self.sketch, cols):
+            row[c] += v
+            est = row[c] if est is None or row[c] < est else est
+        if est > self.tail_max:
+            self.tail_max = est
+        if len(self.head) < self.head_size and est >= self.floor * scale:
+            # exact counter from here on; the sketch keeps what it has (est may include other keys'
+            # collisions, so taking it back out could leave a neighbour under its true count)
+            self.head[key] = self.seed[key] = est
+
+    def snapshot(self, now: float) -> PopularitySnapshot:
+        if self.landmark is None:
+            return PopularitySnapshot({}, [], 1.0, 0.0)
+        decay = 1.0 / self._scale(now)
+        if len(self.head) >= self.head_size:
+            # make room: the weakest tenth go back to the sketch and set the bar for promotion
+            weakest = sorted(self.head, key=self.head.__getitem__)[:max(1, self.head_size // 10)]
+            for key in weakest:
+                v = self.head.pop(key) - self.seed.pop(key)
+                cols = _cells(key, self.depth, self.width)
+                for row, c in zip(self.sketch, cols):
+                    row[c] += v
+                self.tail_max = max(self.tail_max, min(row[c] for row, c in zip(self.sketch, cols)))
+            self.floor = max(PROMOTE_MIN, self.head and min(self.head.values()) * decay or 0.0)
+        # a promoted item's exact count starts at its tail estimate, so the top never drops when it moves
+        top = max(max(self.head.values(), default=0.0), self.tail_max) * decay
+        log_top = math.log1p(top) if top > 0 else 1.0
+        head = {k: min(1.0, math.log1p(v * decay) / log_top) for k, v in self.head.items()}
+        return PopularitySnapshot(head, [row[:] for row in self.sketch], decay, top)
+
+
+class PopularityTracker:
+    def __init__(self, half_life_s: float = HALF_LIFE_S, head_size: int = HEAD_SIZE, width: int = SKETCH_WIDTH,
+                 depth: int = SKETCH_DEPTH, snapshot_interval_s: float = SNAPSHOT_INTERVAL_S):
+        self.half_life_s = half_life_s
+        self._new = lambda: DecayedCounts(half_life_s, head_size, width, depth)
+        self.snapshot_interval_s = snapshot_interval_s
+        self._counts: Dict[str, DecayedCounts] = {}
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, PopularitySnapshot] = {}
+        self._published = 0.0
+        self._dirty = False
+        self.events = 0
+
+    def add(self, kind: str, key: str, weight: float = 1.0, ts: Optional[float] = None):
+        self.add_many([(kind, key, weight, ts)])
+
+    def add_many(self, updates: Iterable[Tuple[str, str, float, Optional[float]]]):
+        now = time.time()
+        with self._lock:
+            for kind, key, weight, ts in updates:
+                counts = self._counts.get(kind)
+                if counts is None:
+                    counts = self._counts[kind] = self._new()
+                counts.add(key, weight, now if ts is None else ts)
+                self.events += 1
+            self._dirty = True
+
+    def publish(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            snaps = {kind: c.snapshot(now) for kind, c in self._counts.items()}
+            self._published = time.monotonic()
+            self._dirty = False
+            self._snapshots = snaps
+
+    def maybe_publish(self):
+        """publish() if events arrived since the last one and snapshot_interval_s has passed (writer side)."""
+        if self._dirty and time.monotonic() - self._published >= self.snapshot_interval_s:
+            self.publish()
+
+    def live(self, kind: str) -> Optional[PopularitySnapshot]:
+        """Last published snapshot for kind, or None before its first event is published. Never publishes."""
+        return self._snapshots.get(kind)
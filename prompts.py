@@ -0,0 +1,96 @@
+# prompts.py
+"""
+Compact prompts for the remote parser.
+
+The system message depends only on the requested fields, so it is identical
+across users and queries and providers that cache prompt prefixes can reuse
+it; everything per-request (profile, query) goes last, in one short user
+message. The profile is reduced to the fields that change the parse.
+
+    messages, n_in, max_out = build_parse_messages("3 nights in goa under 20k", profile)
+
+estimate_tokens() is a local, slightly pessimistic count (no tokenizer
+download). build_parse_messages() keeps input + output within
+PARSE_TOKEN_BUDGET: the profile is dropped first, then the query is cut.
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PARSE_FIELDS = ("destination", "destination_id", "origin", "trip_type", "nights", "budget_max", "tags", "max_stops")
+# the itinerary search also wants the implied pace
+ITINERARY_FIELDS = PARSE_FIELDS + ("pace",)
+PACES = ("relaxed", "normal", "packed")
+
+# minified JSON of ~9 short fields is well under this
+PARSE_MAX_OUTPUT_TOKENS = 120
+PARSE_TOKEN_BUDGET = 400
+MAX_QUERY_CHARS = 400
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_system_cache: Dict[Tuple[str, ...], str] = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count: letters in ~4-char pieces, digits in ~3s, one per symbol."""
+    n = 0
+    for piece in _PIECE.findall(text or ""):
+        if piece[0].isalpha():
+            n += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            n += math.ceil(len(piece) / 3)
+        else:
+            n += 1
+    return n
+
+
+def parse_system_prompt(fields: Sequence[str] = PARSE_FIELDS) -> str:
+    key = tuple(fields)
+    prompt = _system_cache.get(key)
+    if prompt is None:
+        rules = "nights,budget_max,max_stops: integers (budget in INR). tags: short lowercase interests."
+        if "pace" in key:
+            rules += " pace: one of " + "/".join(PACES) + "."
+        prompt = ("Parse a travel search into minified JSON with keys: " + ",".join(key) + ". "
+                  + rules + " Omit unknown keys. Output JSON only.")
+        _system_cache[key] = prompt
+    return prompt
+
+
+def compact_profile(user_profile: Optional[Dict[str, Any]]) -> str:
+    """'interests=beach,nightlife;budget=5000-12000;trip=solo' (empty if nothing relevant)."""
+    p = user_profile or {}
+    parts = []
+    if p.get("interests"):
+        parts.append("interests=" + ",".join(str(i) for i in p["interests"]))
+    budget = p.get("budget") or {}
+    if budget.get("min") is not None or budget.get("max") is not None:
+        parts.append(f"budget={budget.get('min', '') or ''}-{budget.get('max', '') or ''}")
+    if p.get("trip_type"):
+        parts.append(f"trip={p['trip_type']}")
+    return ";".join(parts)
+
+
+def build_parse_messages(query: str, user_profile: Optional[Dict[str, Any]] = None,
+                         fields: Sequence[str] = PARSE_FIELDS, budget: int = PARSE_TOKEN_BUDGET,
+                         max_output: int = PARSE_MAX_OUTPUT_TOKENS) -> Tuple[List[Dict[str, str]], int, int]:
+    """(chat messages, estimated input tokens, max output tokens) within `budget` tokens in total."""
+    system = parse_system_prompt(fields)
+    query = " ".join(str(query or "").split())[:MAX_QUERY_CHARS]
+    profile = compact_profile(user_profile)
+    # ~4 tokens of chat framing per message
+    fixed = estimate_tokens(system) + 8
+
+    def user_text(q, prof):
+        return f"profile:{prof}\nq:{q}" if prof else f"q:{q}"
+
+    text = user_text(query, profile)
+    if fixed + estimate_tokens(text) + max_output > budget:
+        text = user_text(query, "")
+    while fixed + estimate_tokens(text) + max_output > budget and len(query) > 20:
+        query = query[:int(len(query) * 0.8)]
+        text = user_text(query, "")
+    messages = [{"role": "system", "content": system}, {"role": "user", "content": text}]
+    return messages, fixed + estimate_tokens(text), max_output
+
@@ -0,0 +1,141 @@
+# ratelimit.py
+"""
+Client-side quota for the remote LLM: token buckets (requests/min, tokens/min)
+shared by priority lanes.
+
+    limiter = PriorityLimiter({"requests": TokenBucket.per_minute(30), "tokens": TokenBucket.per_minute(6000)},
+                              lanes=("parse", "explain", "background"))
+    if limiter.acquire("parse", cost={"requests": 1, "tokens": 600}, timeout=3.0):
+        ... call the provider ...
+    else:
+        ... deadline passed / lane queue full: use the local fallback ...
+
+Callers queue per lane (bounded by max_queue). Only the head of the highest
+non-empty lane may take tokens, so a parse arriving behind fifty background
+prefetches goes first; lanes can also be told to leave part of every bucket
+untouched (reserve) so bulk work can't drain the quota interactive calls
+need. A waiter whose timeout passes leaves the queue and gets False. After a
+429, backoff(retry_after) pauses every bucket so nobody fires until the
+provider's Retry-After has passed.
+"""
+
+import collections
+import threading
+import time
+from typing import Dict, Optional, Sequence, Union
+
+from metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_QUEUE_DROPPED
+
+
+class TokenBucket:
+    """capacity tokens, refilled continuously at rate tokens/second. Not thread-safe on its own."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._ts = time.monotonic()
+        self.paused_until = 0.0
+
+    @classmethod
+    def per_minute(cls, n: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(n / 60.0, burst if burst is not None else n)
+
+    def _refill(self, now):
+        if now > self._ts:
+            self.tokens = min(self.capacity, self.tokens + (now - self._ts) * self.rate)
+            self._ts = now
+
+    def wait_time(self, need: float, now: float) -> float:
+        """Seconds until `need` tokens are available (need is capped at capacity)."""
+        self._refill(now)
+        short = min(need, self.capacity) - self.tokens
+        return max(0.0 if short <= 0 else short / self.rate, self.paused_until - now)
+
+    def take(self, n: float, now: float):
+        self._refill(now)
+        self.tokens -= min(n, self.capacity)
+
+    def pause(self, seconds: float, now: float):
+        """Hand out nothing for `seconds` (tokens keep refilling meanwhile)."""
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class PriorityLimiter:
+    def __init__(self, buckets: Dict[str, TokenBucket], lanes: Sequence[str] = ("parse", "explain", "background"),
+                 max_queue: Union[int, Dict[str, int]] = 32, reserve: Optional[Dict[str, float]] = None,
+                 name: str = "llm"):
+        """lanes in priority order; reserve: {lane: fraction of each bucket that lane must leave unused}."""
+        self.buckets = buckets
+        self.lanes = tuple(lanes)
+        self.name = name
+        self.max_queue = max_queue if isinstance(max_queue, dict) else {l: max_queue for l in self.lanes}
+        self.reserve = dict(reserve or {})
+        self._queues = {l: collections.deque() for l in self.lanes}
+        self._cond = threading.Condition()
+
+    def depth(self, lane: str) -> int:
+        with self._cond:
+            return len(self._queues[lane])
+
+    def _depth_metric(self, lane):
+        LLM_QUEUE_DEPTH.set(len(self._queues[lane]), limiter=self.name, lane=lane)
+
+    def _is_next(self, lane, ticket) -> bool:
+        for l in self.lanes:
+            q = self._queues[l]
+            if l == lane:
+                return q[0] is ticket
+            if q:
+                return False
+        return False
+
+    def acquire(self, lane: str, cost: Optional[Dict[str, float]] = None, timeout: Optional[float] = None) -> bool:
+        """Wait (up to timeout seconds, None = forever) for this lane's turn and the tokens; False if dropped."""
+        if lane not in self._queues:
+            raise ValueError(f"unknown lane: {lane}")
+        cost = cost or {"requests": 1}
+        t0 = time.monotonic()
+        deadline = None if timeout is None else t0 + timeout
+        ticket = object()
+        with self._cond:
+            q = self._queues[lane]
+            if len(q) >= self.max_queue.get(lane, 32):
+                LLM_QUEUE_DROPPED.inc(limiter=self.name, lane=lane, reason="queue_full")
+                return False
+            q.append(ticket)
+            self._depth_metric(lane)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._is_next(lane, ticket):
+                        keep = self.reserve.get(lane, 0.0)
+                        wait = max([b.wait_time(cost.get(k, 0) + keep * b.capacity, now)
+                                    for k, b in self.buckets.items() if cost.get(k)] or [0.0])
+                        if wait <= 0:
+                            for k, b in self.buckets.items():
+                                if cost.get(k):
+                                    b.take(cost[k], now)
+                            LLM_QUEUE_WAIT_SECONDS.observe(now - t0, limiter=self.name, lane=lane)
+                            return True
+                    if deadline is not None and now >= deadline:
+                        LLM_QUEUE_DROPPED.inc(limiter=self.name, lane=lane, reason="deadline")
+                        return False
+                    limit = None if deadline is None else deadline - now
+                    if wait is not None:
+                        limit = wait if limit is None else min(limit, wait)
+                    self._cond.wait(limit)
+            finally:
+                q.remove(ticket)
+                self._depth_metric(lane)
+                # the next waiter (maybe in a lower lane) may be able to go now
+                self._cond.notify_all()
+
+    def backoff(self, seconds: float):
+        """Provider said slow down (HTTP 429): nobody acquires for `seconds`."""
+        with self._cond:
+            now = time.monotonic()
+            for b in self.buckets.values():
+                b.pause(seconds, now)
+            self._cond.notify_all()
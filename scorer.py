@@ -3,6 +3,20 @@
 Scoring utilities for ranking hotels/destinations/travel options.
 """
 
+import heapq
+from collections import Counter
+
+# item score weights (tunable); score_item, score_items and batch.BatchScorer all use these
+W_TAG = 1.3
+W_BUDGET = 1.0
+W_POP = 0.5
+W_RECENCY = 0.7
+W_PAST = 0.9
+# budget score multiplier for items above the searched budget
+OVER_SEARCH_BUDGET = 0.6
+# share of the popularity term taken from live (event-decayed) popularity when it's available
+LIVE_POPULARITY_WEIGHT = 0.6
+
 def tag_match_score(item_tags, user_tags):
     if not item_tags or not user_tags:
         return 0.0
@@ -31,30 +45,85 @@ def past_similarity_score(item_tags, past_trips):
     matches = sum(1 for tag in item_tags if tag in past_tags)
     return matches / max(1, len(set(past_tags)))
 
-def score_item(item, user_profile, signals=None, user_past_trips=None):
+def item_popularity(item, live=None):
+    """Catalog popularity, blended with live popularity (popularity.PopularitySnapshot or {id: 0..1}) if given."""
+    static = item.get("popularity", 0.5)
+    if live is None:
+        return static
+    return (1.0 - LIVE_POPULARITY_WEIGHT) * static + LIVE_POPULARITY_WEIGHT * live.get(item.get("id"), 0.0)
+
+def score_item(item, user_profile, signals=None, user_past_trips=None, popularity=None):
     """
     item: hotel or destination dict (with 'tags', 'price' or 'avg_price')
     user_profile: {interests:[], budget:{min,max}}
     signals: optional dict from search parsing, e.g. {'recentBehaviorMatch':True, 'search_budget_max':12000, 'tags':[...]}
     user_past_trips: list of past_trips
+    popularity: optional live popularity of this kind of item (see item_popularity)
     """
-    # weights (tunable)
-    w_tag = 1.3
-    w_budget = 1.0
-    w_pop = 0.5
-    w_recency = 0.7
-    w_past = 0.9
-
     tag_score = tag_match_score(item.get("tags", []), user_profile.get("interests", []))
     b_score = budget_score(item.get("price", item.get("avg_price", 0)), user_profile.get("budget", {}))
-    popularity = item.get("popularity", 0.5)
+    pop = item_popularity(item, popularity)
     recency = 1.0 if signals and signals.get("recentBehaviorMatch") else 0.0
     past_score = past_similarity_score(item.get("tags", []), user_past_trips or [])
 
     # apply search budget constraint if present
     if signals and signals.get("search_budget_max") and item.get("price"):
         if item["price"] > signals["search_budget_max"]:
-            b_score *= 0.6
+            b_score *= OVER_SEARCH_BUDGET
 
-    score = (w_tag * tag_score) + (w_budget * b_score) + (w_pop * popularity) + (w_recency * recency) + (w_past * past_score)
+    score = (W_TAG * tag_score) + (W_BUDGET * b_score) + (W_POP * pop) + (W_RECENCY * recency) + (W_PAST * past_score)
     return score
+
+
+def score_items(items, user_profile, signals=None, user_past_trips=None, popularity=None):
+    """score_item for many items at once: user-side inputs are prepared once, not per item."""
+    interests = user_profile.get("interests") or []
+    budget = user_profile.get("budget", {})
+    n_interests = max(1, len(interests))
+    interest_set = set(interests)
+    past_tags = set(t for trip in (user_past_trips or []) for t in trip.get("tags", []))
+    n_past = max(1, len(past_tags))
+    recency = W_RECENCY if signals and signals.get("recentBehaviorMatch") else 0.0
+    search_max = signals.get("search_budget_max") if signals else None
+    out = []
+    for item in items:
+        tags = item.get("tags", [])
+        s = W_TAG * sum(1 for t in tags if t in interest_set) / n_interests if interests else 0.0
+        b = budget_score(item.get("price", item.get("avg_price", 0)), budget)
+        if search_max and item.get("price") and item["price"] > search_max:
+            b *= OVER_SEARCH_BUDGET
+        s += W_BUDGET * b + W_POP * item_popularity(item, popularity) + recency
+        if past_tags and tags:
+            s += W_PAST * sum(1 for t in tags if t in past_tags) / n_past
+        out.append(s)
+    return out
+
+
+class DestinationScoreTable:
+    """
+    Precomputed per-user destination scores (tag overlap + seasonality).
+    Only the budget-proximity term depends on budget_max, so it is applied at
+    rank() time and the table survives budget slider / parsed budget changes.
+    """
+    def __init__(self, destinations, interests):
+        self.destinations = list(destinations)
+        counts = Counter(interests or [])
+        self.base = []
+        self.prices = []
+        for d in self.destinations:
+            tags = d.get("tags", [])
+            s = sum(2.0 * c for t, c in counts.items() if t in tags)
+            s += float(d.get("seasonality", 0.6))
+            self.base.append(s)
+            self.prices.append(d.get("avg_price", 0))
+
+    def scores(self, budget_max=None):
+        if not budget_max:
+            return list(self.base)
+        denom = budget_max + 1
+        return [b + max(0, (1.0 - abs(p - budget_max) / denom)) * 0.5 for b, p in zip(self.base, self.prices)]
+
+    def rank(self, budget_max=None, limit=6):
+        s = self.scores(budget_max)
+        top = heapq.nlargest(limit, range(len(s)), key=s.__getitem__)
+        return [self.destinations[i] for i in top]
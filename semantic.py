@@ -0,0 +1,364 @@
+# semantic.py
+"""
+Offline semantic similarity for catalog items (destinations, hotels, POIs)
+and free-text queries. No network, no model download, numpy only.
+
+Embedding: two blocks, concatenated and weighted so that
+cosine = CONCEPT_SHARE * concept cosine + (1 - CONCEPT_SHARE) * lexical cosine.
+
+- concepts: one exact dimension per CONCEPTS entry. "hill station", "trek",
+  "valley" and "mountains" all count towards "mountains", so they meet even
+  though they share no words.
+- lexical: words (lightly stemmed) and word bigrams, hashed with crc32 (stable
+  across processes) into HASH_BUCKETS, TF-IDF weighted over the catalog and
+  projected to DIM dimensions with a sparse random projection (each bucket adds
+  +-1 to PROJ_NNZ seeded dimensions). The projection is two small tables built
+  once per process and shared by every index.
+
+Retrieval: IVFIndex clusters the vectors with spherical k-means (~sqrt(N)
+lists) and a query scans only the nprobe closest lists. Below IVF_MIN_ITEMS
+it just does an exact scan.
+
+    sem = SemanticIndex(catalog)
+    sem.search("hill station with treks", "destination", k=5)   # [(item, similarity)]
+    sem = sem.updated(catalog, changed_dest_ids)   # after a catalog delta
+
+updated() re-embeds only the items of the changed destinations (with the same
+IDF weights) and files them into the existing IVF lists; everything else is
+carried over. Once more than REBUILD_FRACTION of the items were re-embedded
+that way it builds from scratch instead, refreshing IDF and clusters.
+"""
+
+import functools
+import math
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from poi_search import tokenize
+
+DIM = 128
+HASH_BUCKETS = 1 << 16
+PROJ_NNZ = 4
+CONCEPT_SHARE = 0.6
+IVF_MIN_ITEMS = 4096
+IVF_NPROBE = 32
+KMEANS_ITERS = 8
+KMEANS_SAMPLE = 50000
+SEED = 7
+REBUILD_FRACTION = 0.2
+
+# concept -> words / phrases that imply it (matched on stemmed tokens)
+CONCEPTS = {
+    "mountains": ["mountain", "hill", "hill station", "himalaya", "himalayan", "snow", "valley", "peak",
+                  "ridge", "trek", "trekking", "pass", "glacier", "ski", "skiing", "mall road", "top station"],
+    "adventure": ["adventure", "trek", "trekking", "hiking", "hike", "rafting", "paragliding", "camping",
+                  "safari", "ski", "skiing", "climbing", "bike", "biking", "pass", "border"],
+    "beach": ["beach", "sea", "coast", "coastal", "island", "surf", "surfing", "seaside", "shore", "bay",
+              "marine drive", "fishing net"],
+    "nightlife": ["nightlife", "party", "club", "bar", "pub", "night market", "live music"],
+    "culture": ["culture", "cultural", "heritage", "historic", "history", "museum", "fort", "palace", "art",
+                "gallery", "monument", "architecture", "haveli", "mahal", "tomb", "memorial"],
+    "spiritual": ["spiritual", "temple", "ghat", "pilgrimage", "mosque", "masjid", "church", "basilica",
+                  "gurudwara", "monastery", "stupa", "shrine", "dargah", "yoga", "ashram", "meditation"],
+    "nature": ["nature", "lake", "waterfall", "fall", "forest", "garden", "bagh", "park", "wildlife",
+               "national park", "river", "tea", "backwater", "bird", "hill", "valley", "hot spring"],
+    "relax": ["relax", "relaxing", "spa", "wellness", "calm", "peaceful", "quiet", "retreat", "unwind", "slow",
+              "houseboat", "hot spring", "boat"],
+    "shopping": ["shopping", "shop", "market", "bazaar", "mall", "street", "causeway"],
+    "family": ["family", "kid", "child", "children", "zoo", "aquarium", "science city", "film city"],
+    "city": ["city", "urban", "metro", "cafe", "food"],
+    "romantic": ["romantic", "honeymoon", "couple", "sunset"],
+}
+CONCEPT_NAMES = sorted(CONCEPTS)
+
+
+def _concept_lookup():
+    single, double = {}, {}
+    for concept, words in CONCEPTS.items():
+        for w in words:
+            toks = tuple(tokenize(w))
+            if len(toks) == 1:
+                single.setdefault(toks[0], set()).add(concept)
+            else:
+                double.setdefault(toks, set()).add(concept)
+    return single, double
+
+
+_CONCEPT_1, _CONCEPT_2 = _concept_lookup()
+
+
+def features(text: str) -> Tuple[Counter, Counter]:
+    """(hashed word/bigram counts, concept counts) of one text."""
+    toks = tokenize(text)
+    lexical, concepts = Counter(), Counter()
+    for t in toks:
+        lexical["w:" + t] += 1
+        concepts.update(_CONCEPT_1.get(t, ()))
+    for a, b in zip(toks, toks[1:]):
+        lexical["b:" + a + " " + b] += 1
+        concepts.update(_CONCEPT_2.get((a, b), ()))
+    hashed = Counter()
+    for f, v in lexical.items():
+        hashed[zlib.crc32(f.encode("utf-8")) % HASH_BUCKETS] += v
+    return hashed, concepts
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-9)
+
+
+@functools.lru_cache(maxsize=4)
+def projection(dim: int = DIM, seed: int = SEED) -> Tuple[np.ndarray, np.ndarray]:
+    """(dims, weights), both HASH_BUCKETS x PROJ_NNZ: bucket h adds weights[h] to columns dims[h]."""
+    rng = np.random.default_rng(seed)
+    dims = rng.integers(0, dim, size=(HASH_BUCKETS, PROJ_NNZ)).astype(np.int16)
+    weights = (rng.choice([-1.0, 1.0], size=(HASH_BUCKETS, PROJ_NNZ)) / math.sqrt(PROJ_NNZ)).astype(np.float32)
+    dims.flags.writeable = weights.flags.writeable = False
+    return dims, weights
+
+
+class Embedder:
+    """features() -> unit vectors of len(CONCEPT_NAMES) + dim floats."""
+
+    def __init__(self, corpus_features: Sequence[Tuple[Counter, Counter]], dim: int = DIM, seed: int = SEED):
+        self.dim = dim
+        df = np.zeros(HASH_BUCKETS, dtype=np.float32)
+        for lexical, _ in corpus_features:
+            for h in lexical:
+                df[h] += 1.0
+        n = max(1, len(corpus_features))
+        self.idf = np.log((1.0 + n) / (1.0 + df)).astype(np.float32) + 1.0
+        self.proj_dims, self.proj_weights = projection(dim, seed)
+        self._concept_col = {c: i for i, c in enumerate(CONCEPT_NAMES)}
+
+    def embed(self, feats: Sequence[Tuple[Counter, Counter]], chunk: int = 20000) -> np.ndarray:
+        nc = len(CONCEPT_NAMES)
+        out = np.zeros((len(feats), nc + self.dim), dtype=np.float32)
+        for lo in range(0, len(feats), chunk):
+            part = feats[lo:lo + chunk]
+            rows, cols, vals = [], [], []
+            concept_block = np.zeros((len(part), nc), dtype=np.float32)
+            for r, (lexical, concepts) in enumerate(part):
+                for h, v in lexical.items():
+                    rows.append(r)
+                    cols.append(h)
+                    vals.append(1.0 + math.log(v))    # sublinear tf
+                for c, v in concepts.items():
+                    concept_block[r, self._concept_col[c]] = 1.0 + math.log(v)
+            lexical_block = np.zeros((len(part), self.dim), dtype=np.float32)
+            if rows:
+                cols_a = np.asarray(cols)
+                w = np.asarray(vals, dtype=np.float32) * self.idf[cols_a]
+                np.add.at(lexical_block, (np.asarray(rows)[:, None], self.proj_dims[cols_a]),
+                          w[:, None] * self.proj_weights[cols_a])
+            out[lo:lo + len(part), :nc] = _unit_rows(concept_block) * math.sqrt(CONCEPT_SHARE)
+            out[lo:lo + len(part), nc:] = _unit_rows(lexical_block) * math.sqrt(1.0 - CONCEPT_SHARE)
+        # rows with only one non-empty block are rescaled to unit length
+        return _unit_rows(out)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed([features(text)])[0]
+
+
+class IVFIndex:
+    """Inverted-file ANN over unit vectors (inner product)."""
+
+    def __init__(self, vectors: np.ndarray, nlist: Optional[int] = None, seed: int = SEED):
+        n = len(vectors)
+        if n < IVF_MIN_ITEMS:
+            self._exact(vectors)
+            return
+        nlist = nlist or max(1, int(math.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=min(n, KMEANS_SAMPLE), replace=False)]
+        cent = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERS):
+            assign = np.argmax(sample @ cent.T, axis=1)
+            sums = np.zeros_like(cent)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            # re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            cent = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-9)
+        cent = cent.astype(np.float32)
+        self._lists(vectors, cent, _nearest(vectors, cent))
+
+    def _exact(self, vectors):
+        self.n = len(vectors)
+        self.centroids = None
+        self.assign = None
+        self.vectors = vectors
+        self.ids = np.arange(self.n)
+        self.pos = self.ids
+
+    def _lists(self, vectors, centroids, assign):
+        """Store vectors grouped by list (assign: row id -> list)."""
+        order = np.argsort(assign, kind="stable")
+        self.n = len(vectors)
+        self.centroids = centroids
+        self.assign = assign
+        self.vectors = vectors[order]
+        self.ids = order
+        self.pos = np.argsort(order)        # row id -> position in self.vectors
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+
+    def rows(self, row_ids: Sequence[int]) -> np.ndarray:
+        return self.vectors[self.pos[np.asarray(row_ids, dtype=np.int64)]]
+
+    def updated(self, keep: Sequence[int], new_vectors: np.ndarray) -> "IVFIndex":
+        """
+        Index over rows `keep` of this one (renumbered 0..len(keep)-1) followed by new_vectors.
+        The clusters are kept: only the new vectors are assigned to a list.
+        """
+        keep = np.asarray(keep, dtype=np.int64)
+        vectors = np.concatenate([self.rows(keep), new_vectors]) if len(keep) else new_vectors
+        if self.centroids is None or len(vectors) < IVF_MIN_ITEMS:
+            # still small, or just grew past IVF_MIN_ITEMS (clustered once here)
+            return IVFIndex(vectors)
+        out = IVFIndex.__new__(IVFIndex)
+        out._lists(vectors, self.centroids, np.concatenate([self.assign[keep], _nearest(new_vectors, self.centroids)]))
+        return out
+
+    def search(self, q: np.ndarray, k: int = 10, nprobe: int = IVF_NPROBE) -> List[Tuple[int, float]]:
+        """[(row id, similarity)] best first."""
+        if self.n == 0:
+            return []
+        if self.centroids is None:
+            sims = self.vectors @ q
+            ids = self.ids
+        else:
+            cs = self.centroids @ q
+            nprobe = min(nprobe, len(cs))
+            probe = np.argpartition(-cs, nprobe - 1)[:nprobe]
+            # lists are contiguous row ranges, so each probe is a slice (no gather copy)
+            spans = [(self.offsets[c], self.offsets[c + 1]) for c in probe]
+            sims = np.concatenate([self.vectors[a:b] @ q for a, b in spans])
+            ids = np.concatenate([self.ids[a:b] for a, b in spans])
+        k = min(k, len(sims))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(int(ids[i]), float(sims[i])) for i in top]
+
+    def similarities(self, q: np.ndarray, row_ids: Sequence[int]) -> np.ndarray:
+        """Exact similarity of q to the given rows."""
+        if not len(row_ids):
+            return np.zeros(0, dtype=np.float32)
+        return self.rows(row_ids) @ q
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    if not len(vectors):
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([np.argmax(vectors[lo:lo + 65536] @ centroids.T, axis=1)
+                           for lo in range(0, len(vectors), 65536)])
+
+
+def _destination_text(d: Dict[str, Any], pois: Iterable[Dict[str, Any]]) -> str:
+    poi_text = " ".join(f"{p.get('name', '')} {p.get('category', '')}" for p in pois)
+    return " ".join([d.get("name", ""), " ".join(d.get("tags", [])) * 2, poi_text])
+
+
+def _hotel_text(h: Dict[str, Any], dest: Optional[Dict[str, Any]]) -> str:
+    dest_part = f"{dest.get('name', '')} {' '.join(dest.get('tags', []))}" if dest else ""
+    return " ".join([h.get("name", ""), " ".join(h.get("tags", [])) * 2, dest_part])
+
+
+def _poi_text(p: Dict[str, Any]) -> str:
+    return f"{p.get('name', '')} {p.get('category', '')}"
+
+
+def _kind_rows(catalog, kind: str, dest_ids: Optional[Sequence[str]] = None) -> List[Tuple[Dict[str, Any], Any, str]]:
+    """[(item, destination id, text)] of one kind: the whole catalog, or only the given destinations."""
+    dest_map = catalog.dest_map
+    if kind == "destination":
+        dests = catalog.destinations if dest_ids is None else [dest_map[d] for d in dest_ids if d in dest_map]
+        return [(d, d["id"], _destination_text(d, catalog.pois_map.get(d["id"], []))) for d in dests]
+    if kind == "hotel":
+        hotels = catalog.hotels if dest_ids is None else [h for d in dest_ids for h in catalog.hotels_by_dest.get(d, [])]
+        return [(h, h.get("destination_id"), _hotel_text(h, dest_map.get(h.get("destination_id")))) for h in hotels]
+    cities = catalog.pois_map.items() if dest_ids is None else [(d, catalog.pois_map.get(d, [])) for d in dest_ids]
+    return [(p, d, _poi_text(p)) for d, plist in cities for p in plist]
+
+
+class SemanticIndex:
+    """Embeddings + IVF index per item kind ("destination", "hotel", "poi") for one catalog version."""
+
+    KINDS = ("destination", "hotel", "poi")
+
+    def __init__(self, catalog, dim: int = DIM):
+        self.version = catalog.version
+        rows = {k: _kind_rows(catalog, k) for k in self.KINDS}
+        feats = {k: [features(text) for _, _, text in rows[k]] for k in self.KINDS}
+        self.embedder = Embedder([f for k in self.KINDS for f in feats[k]], dim=dim)
+        self._set(rows, {k: IVFIndex(self.embedder.embed(feats[k])) for k in self.KINDS})
+        self.patched = 0        # items re-embedded by updated() since this full build
+        self._lock = threading.Lock()
+        self._query_cache: Dict[str, np.ndarray] = {}
+
+    def _set(self, rows, indexes):
+        self.items = {k: [item for item, _, _ in rows[k]] for k in self.KINDS}
+        self._dest = {k: [d for _, d, _ in rows[k]] for k in self.KINDS}
+        self._row = {k: {item["id"]: i for i, item in enumerate(self.items[k])} for k in self.KINDS}
+        self.indexes = indexes
+
+    def updated(self, catalog, changed_dest_ids: Iterable[str]) -> "SemanticIndex":
+        """
+        Index for the catalog's current version, given the destinations changed since
+        self.version: their destinations / hotels / POIs are re-embedded, the rest is reused.
+        self is left as it was (readers may still hold it).
+        """
+        version = catalog.version
+        changed = sorted(changed_dest_ids)
+        fresh = {k: _kind_rows(catalog, k, changed) for k in self.KINDS}
+        n_fresh = sum(len(v) for v in fresh.values())
+        if self.patched + n_fresh > REBUILD_FRACTION * max(1, sum(len(v) for v in self.items.values())):
+            return SemanticIndex(catalog, self.embedder.dim)
+        out = SemanticIndex.__new__(SemanticIndex)
+        out.version = version
+        out.embedder = self.embedder
+        out.patched = self.patched + n_fresh
+        # same embedder, so query vectors stay valid
+        out._lock, out._query_cache = self._lock, self._query_cache
+        gone = set(changed)
+        rows, indexes = {}, {}
+        for k in self.KINDS:
+            keep = [i for i, d in enumerate(self._dest[k]) if d not in gone]
+            rows[k] = [(self.items[k][i], self._dest[k][i], None) for i in keep] + fresh[k]
+            vectors = self.embedder.embed([features(text) for _, _, text in fresh[k]])
+            indexes[k] = self.indexes[k].updated(keep, vectors)
+        out._set(rows, indexes)
+        return out
+
+    def query_vector(self, text: str) -> np.ndarray:
+        with self._lock:
+            v = self._query_cache.get(text)
+        if v is None:
+            v = self.embedder.embed_text(text)
+            with self._lock:
+                if len(self._query_cache) > 4096:
+                    self._query_cache.clear()
+                self._query_cache[text] = v
+        return v
+
+    def search(self, text: str, kind: str, k: int = 10, min_sim: float = 0.0) -> List[Tuple[Dict[str, Any], float]]:
+        """[(item, cosine similarity)] of the given kind closest to text."""
+        if not text or not text.strip():
+            return []
+        q = self.query_vector(text)
+        return [(self.items[kind][i], s) for i, s in self.indexes[kind].search(q, k) if s >= min_sim]
+
+    def score(self, text: str, kind: str, ids: Iterable[Any]) -> Dict[Any, float]:
+        """{id: exact similarity to text} for the given items of kind (unknown ids are skipped)."""
+        row = self._row[kind]
+        ids = [i for i in ids if i in row]
+        if not ids or not text or not text.strip():
+            return {}
+        sims = self.indexes[kind].similarities(self.query_vector(text), [row[i] for i in ids])
+        return {i: float(s) for i, s in zip(ids, sims)}
@@ -0,0 +1,217 @@
+# shared_catalog.py
+"""
+Read-only catalog snapshots that several worker processes can attach to.
+
+The parent builds the Catalog once and publishes it into a single buffer, either
+a multiprocessing.shared_memory block or an mmap'd snapshot file:
+
+    [magic][meta length][meta JSON][records JSON][int32 travel mins][int32 travel cost]
+
+Records (destinations, hotels, flights, trains, POIs without travel_to, users)
+are linear in size and decoded once per worker. The per-city POI travel
+matrices grow quadratically, so they stay in the shared buffer as flat int32
+arrays; each POI's "travel_to" in a worker is a read-only TravelRow view over
+its row, and no page of the buffer is ever written after publishing. Cities
+without a precomputed matrix (too many POIs) take no space; their travel is
+estimated from coordinates on demand, as in the parent.
+
+That is all that is shared. Each worker still decodes every record into its
+own dicts and builds its own indexes (place, POI search, hotel-POI, semantic),
+so the build is paid once per worker and per-worker memory is NOT near the
+interpreter baseline. Measured with the mock catalog (spawned worker, Linux
+RSS): bare interpreter 15 MiB, after imports 46 MiB, attached catalog 48 MiB,
+engine with its indexes built 59 MiB. That private part grows linearly with
+the catalog, and only cities small enough for a dense travel matrix
+(pois_real.DENSE_TRAVEL_MAX_POIS) have anything to share.
+
+    snap = publish_snapshot(catalog, users)            # parent (shared memory)
+    catalog, users = attach_snapshot(snap.name)        # worker
+    ...
+    snap.close(); snap.unlink()                        # parent, on shutdown
+"""
+
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from catalog import Catalog
+
+SNAPSHOT_MAGIC = b"TRCATSN1"
+_HEADER = struct.Struct("<8sQ")
+_MISSING = -1  # travel pair absent in the source travel_to dict
+
+
+def _align(n: int, to: int = 8) -> int:
+    return (n + to - 1) // to * to
+
+
+class TravelRow(Mapping):
+    """travel_to of one POI: {other_poi_id: {"mins", "cost"}} backed by shared int32 arrays."""
+    __slots__ = ("_mins", "_cost", "_ids", "_index", "_base")
+
+    def __init__(self, mins, cost, ids, index, row):
+        self._mins = mins
+        self._cost = cost
+        self._ids = ids
+        self._index = index
+        self._base = row * len(ids)
+
+    def __getitem__(self, poi_id):
+        j = self._index[poi_id]
+        m = self._mins[self._base + j]
+        if m == _MISSING:
+            raise KeyError(poi_id)
+        return {"mins": m, "cost": self._cost[self._base + j]}
+
+    def __iter__(self):
+        base = self._base
+        return (pid for j, pid in enumerate(self._ids) if self._mins[base + j] != _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class SnapshotCatalog(Catalog):
+    """Catalog attached to a published snapshot. Read-only: publish a new snapshot to change it."""
+
+    def apply_deltas(self, deltas):
+        raise RuntimeError("catalog snapshots are read-only; apply deltas in the parent and publish a new snapshot")
+
+
+def _layout(catalog: Catalog, users: List[Dict[str, Any]]) -> Tuple[bytes, bytes, List[Tuple[List[int], List[int]]]]:
+    pois_plain = {did: [{k: v for k, v in p.items() if k != "travel_to"} for p in plist]
+                  for did, plist in catalog.pois_map.items()}
+    records = json.dumps({
+        "destinations": catalog.destinations,
+        "hotels": catalog.hotels,
+        "flights": catalog.flights,
+        "trains": catalog.trains,
+        "pois": pois_plain,
+        "users": users,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    travel = {}
+    matrices = []
+    offset = 0
+    for did, plist in catalog.pois_map.items():
+        if not any(p.get("travel_to") for p in plist):
+            continue
+        ids = [p["id"] for p in plist]
+        n = len(ids)
+        mins = [_MISSING] * (n * n)
+        cost = [_MISSING] * (n * n)
+        for i, p in enumerate(plist):
+            row = p.get("travel_to") or {}
+            for j, qid in enumerate(ids):
+                t = row.get(qid)
+                if t is not None:
+                    mins[i * n + j] = int(t.get("mins", 0))
+                    cost[i * n + j] = int(t.get("cost", 0))
+        travel[did] = {"n": n, "at": offset}
+        matrices.append((mins, cost))
+        offset += n * n
+
+    meta = {"seed": catalog.seed, "version": catalog.version, "records_len": len(records),
+            "cells": offset, "travel": travel}
+    return json.dumps(meta).encode("utf-8"), records, matrices
+
+
+def _write(buf, meta: bytes, records: bytes, matrices) -> None:
+    pos = _HEADER.size
+    _HEADER.pack_into(buf, 0, SNAPSHOT_MAGIC, len(meta))
+    buf[pos:pos + len(meta)] = meta
+    pos = _align(pos + len(meta))
+    buf[pos:pos + len(records)] = records
+    pos = _align(pos + len(records))
+    cells = sum(len(m) for m, _ in matrices)
+    mins_view = buf[pos:pos + 4 * cells].cast("i")
+    cost_view = buf[pos + 4 * cells:pos + 8 * cells].cast("i")
+    at = 0
+    for mins, cost in matrices:
+        mins_view[at:at + len(mins)] = array("i", mins)
+        cost_view[at:at + len(cost)] = array("i", cost)
+        at += len(mins)
+    mins_view.release()
+    cost_view.release()
+
+
+def _snapshot_size(meta: bytes, records: bytes, matrices) -> int:
+    cells = sum(len(m) for m, _ in matrices)
+    return _align(_align(_HEADER.size + len(meta)) + len(records)) + 8 * cells
+
+
+def publish_snapshot(catalog: Catalog, users: List[Dict[str, Any]], path: Optional[str] = None):
+    """
+    Write catalog + users into a new shared memory block (returned, caller unlinks it)
+    or, when path is given, into a snapshot file (returns the path).
+    """
+    meta, records, matrices = _layout(catalog, users)
+    size = _snapshot_size(meta, records, matrices)
+    if path:
+        with open(path, "wb") as fh:
+            fh.truncate(size)
+        with open(path, "r+b") as fh, mmap.mmap(fh.fileno(), size) as mm:
+            _write(memoryview(mm), meta, records, matrices)
+            mm.flush()
+        return path
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    _write(shm.buf, meta, records, matrices)
+    return shm
+
+
+def _open(source: str):
+    """Map a snapshot file or shared memory block (by name) read-only. Returns (holder, buffer)."""
+    path = source
+    if not os.path.exists(path) and os.path.exists(os.path.join("/dev/shm", source.lstrip("/"))):
+        # POSIX shared memory: map it directly so workers can't write to it and
+        # don't register the block with the resource tracker
+        path = os.path.join("/dev/shm", source.lstrip("/"))
+    if not os.path.exists(path):
+        shm = shared_memory.SharedMemory(name=source)
+        return shm, shm.buf
+    with open(path, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    return mm, memoryview(mm)
+
+
+def attach_snapshot(source: str) -> Tuple[SnapshotCatalog, List[Dict[str, Any]]]:
+    """Attach to a published snapshot (shared memory name or file path); returns (catalog, users)."""
+    holder, buf = _open(source)
+    magic, meta_len = _HEADER.unpack_from(buf, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{source!r} is not a catalog snapshot")
+    pos = _HEADER.size
+    meta = json.loads(bytes(buf[pos:pos + meta_len]))
+    pos = _align(pos + meta_len)
+    records = json.loads(bytes(buf[pos:pos + meta["records_len"]]))
+    pos = _align(pos + meta["records_len"])
+    cells = meta["cells"]
+    mins = buf[pos:pos + 4 * cells].cast("i")
+    cost = buf[pos + 4 * cells:pos + 8 * cells].cast("i")
+
+    pois_map = records["pois"]
+    for did, plist in pois_map.items():
+        t = meta["travel"].get(did)
+        ids = [p["id"] for p in plist]
+        index = {pid: j for j, pid in enumerate(ids)}
+        n = len(ids)
+        if t is None or t["n"] != n:
+            for p in plist:
+                p["travel_to"] = {}
+            continue
+        lo, hi = t["at"], t["at"] + n * n
+        dest_mins, dest_cost = mins[lo:hi], cost[lo:hi]
+        for i, p in enumerate(plist):
+            p["travel_to"] = TravelRow(dest_mins, dest_cost, ids, index, i)
+
+    catalog = SnapshotCatalog(records["destinations"], records["hotels"], records["flights"],
+                              records["trains"], pois_map, seed=meta["seed"])
+    catalog.version = meta["version"]
+    # keep the mapping alive for as long as the catalog (TravelRow views point into it)
+    catalog._snapshot = holder
+    return catalog, records["users"]
@@ -0,0 +1,86 @@
+# singleflight.py
+"""
+Coalesce identical concurrent calls: the first caller for a key runs the
+function, callers arriving while it is in flight wait and get its result.
+Nothing is cached once the call finishes (that's the memos' job).
+
+    flights = SingleFlight("parse")
+    parsed = flights.do(("parse", normalized_query), lambda: remote_parse(query))
+
+Works across threads of one process, which is what Streamlit sessions are
+(one script thread per session). Waiters get a deep copy of the result, so
+callers can mutate what they receive. If the leading thread is torn down
+mid-call (Streamlit stops a script thread on rerun by raising a
+BaseException inside it), waiters don't inherit that: one of them retries.
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from metrics import SINGLEFLIGHT_CALLS
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "aborted", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.aborted = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                return self._lead(key, call, fn)
+            call.done.wait()
+            if call.aborted:
+                continue
+            SINGLEFLIGHT_CALLS.inc(name=self.name, role="shared")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.value)
+
+    def _lead(self, key, call, fn):
+        SINGLEFLIGHT_CALLS.inc(name=self.name, role="leader")
+        try:
+            value = fn()
+        except Exception as e:
+            call.error = e
+            self._release(key, call)
+            raise
+        except BaseException:
+            call.aborted = True
+            self._release(key, call)
+            raise
+        call.value = value
+        # waiters copy call.value, so the leader's caller must not get that same object
+        return copy.deepcopy(value) if self._release(key, call) else value
+
+    def _release(self, key, call) -> bool:
+        """Retire the call (later callers start a new one) and wake waiters; True if there were any."""
+        with self._lock:
+            self._calls.pop(key, None)
+            shared = call.waiters > 0
+        call.done.set()
+        return shared
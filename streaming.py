@@ -0,0 +1,145 @@
+# streaming.py
+"""
+Helpers for streamed (server-sent events) LLM completions.
+
+sse_text_chunks() turns the raw SSE lines of an OpenAI-compatible
+`"stream": true` response into content deltas. IncrementalJSONParser is fed
+those deltas and reports each top-level field of the first JSON object the
+moment its value is complete, so callers can act on "destination" while the
+model is still writing "tags":
+
+    p = IncrementalJSONParser()
+    for chunk in sse_text_chunks(resp.iter_lines(decode_unicode=True)):
+        for key, value in p.feed(chunk):
+            ...
+    p.fields      # everything seen; p.done once the object closed
+
+String values complete at their closing quote, arrays / objects when they
+close, bare scalars (numbers, true/false/null) at the next ',' or '}'. Text
+before the object (a "Here is the JSON:" preamble, a ``` fence) is skipped.
+Values that aren't strict JSON get the same lenient retry as
+gemini_wrapper._safe_extract_json (Python None/True/False, single quotes).
+"""
+
+import json
+import re
+from typing import Any, Iterable, Iterator, List, Tuple
+
+_SENTINEL = object()
+
+
+def sse_text_chunks(lines: Iterable) -> Iterator[str]:
+    """Content deltas from OpenAI-style SSE lines ("data: {...}", ending with "data: [DONE]")."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            j = json.loads(data)
+            ch = j["choices"][0]
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+        text = (ch.get("delta") or {}).get("content") or ch.get("text") or ""
+        if text:
+            yield text
+
+
+def _load(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    lenient = re.sub(r"\bNone\b", "null", text.replace("'", '"'))
+    lenient = re.sub(r"\bTrue\b", "true", lenient)
+    lenient = re.sub(r"\bFalse\b", "false", lenient)
+    try:
+        return json.loads(lenient)
+    except ValueError:
+        return _SENTINEL
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._text = []          # characters of the object seen so far
+        self._depth = 0
+        self._in_str = False
+        self._quote = '"'
+        self._esc = False
+        self._state = "key"      # key -> colon -> value -> comma -> key ...
+        self._key = None
+        self._start = None       # index in _text where the current key / value began
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume more text; returns the (key, value) fields completed by it."""
+        out = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._text.append(ch)
+                continue
+            i = len(self._text)
+            self._text.append(ch)
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == self._quote:
+                    self._in_str = False
+                    if self._depth == 1:
+                        self._string_closed(i, out)
+                continue
+            if ch in "\"'":
+                self._in_str, self._quote = True, ch
+                if self._depth == 1 and self._state in ("key", "value") and self._start is None:
+                    self._start = i
+                continue
+            if ch in "{[":
+                if self._depth == 1 and self._state == "value" and self._start is None:
+                    self._start = i
+                self._depth += 1
+                continue
+            if ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == "value":
+                    self._emit(i, out)
+                elif self._depth == 0:
+                    if self._state == "value" and self._start is not None:
+                        self._emit(i - 1, out)
+                    self.done = True
+                continue
+            if self._depth != 1:
+                continue
+            if ch == ":" and self._state == "colon":
+                self._state, self._start = "value", None
+            elif ch == ",":
+                if self._state == "value" and self._start is not None:
+                    self._emit(i - 1, out)
+                self._state, self._start = "key", None
+            elif not ch.isspace() and self._state == "value" and self._start is None:
+                self._start = i          # bare scalar
+        return out
+
+    def _string_closed(self, i, out):
+        if self._state == "key" and self._start is not None:
+            k = _load("".join(self._text[self._start:i + 1]))
+            self._key = k if isinstance(k, str) else None
+            self._state, self._start = "colon", None
+        elif self._state == "value" and self._start is not None:
+            self._emit(i, out)
+
+    def _emit(self, end, out):
+        value = _load("".join(self._text[self._start:end + 1]).strip())
+        if self._key is not None and value is not _SENTINEL:
+            self.fields[self._key] = value
+            out.append((self._key, value))
+        self._state, self._start = "comma", None
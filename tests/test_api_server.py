@@ -0,0 +1,53 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from api_server import AsyncJSONServer, RecommendationAPI
+from engine import RecommendationEngine
+from events import EventSink
+
+
+@pytest.fixture(scope="module")
+def server():
+    mp = pytest.MonkeyPatch()
+    mp.setattr("api_server.log_query", lambda *a, **k: None)     # keep the query log out of tests
+    srv = AsyncJSONServer(RecommendationAPI(RecommendationEngine.from_mock_data(), events=EventSink(None)), workers=2)
+    ready = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(srv.serve("127.0.0.1", 0, ready=ready)), daemon=True).start()
+    assert ready.wait(10)
+    yield srv
+    mp.undo()
+
+
+def _request(port, head: bytes, body: bytes = b""):
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as s:
+        s.sendall(head + body)
+        data = b""
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    status_line, _, rest = data.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+def test_parse_route(server):
+    body = json.dumps({"query": "3 nights in goa under 8000"}).encode()
+    status, payload = _request(server.port, b"POST /v1/parse HTTP/1.1\r\nConnection: close\r\n"
+                               b"Content-Length: %d\r\n\r\n" % len(body), body)
+    assert status == 200 and payload["parsed"]["destination_id"] == "dest_5"
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1.5"])
+def test_bad_content_length_is_a_400(server, length):
+    status, payload = _request(server.port, b"POST /v1/parse HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+    assert status == 400 and "Content-Length" in payload["error"]
+
+
+def test_body_too_large(server):
+    status, _ = _request(server.port, b"POST /v1/parse HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")
+    assert status == 413
@@ -0,0 +1,18 @@
+import pytest
+
+from batch import BatchScorer
+from engine import RecommendationEngine
+from scorer import score_items
+
+
+def test_hotel_scores_match_scorer():
+    engine = RecommendationEngine.from_mock_data()
+    batch = BatchScorer(engine.catalog, top_k=len(engine.catalog.hotels))
+    users = [{"user_id": u["id"], "profile": u["profile"], "past_trips": u.get("past_trips", [])} for u in engine.users]
+    users.append({"user_id": "no_budget", "profile": {"interests": ["beach"]}, "past_trips": []})
+    for user, res in zip(users, batch.recommend(users)):
+        expected = dict(zip([h["id"] for h in batch.hotels],
+                            score_items(batch.hotels, user["profile"], user_past_trips=user["past_trips"])))
+        assert res["hotels"]
+        for h in res["hotels"]:
+            assert h["score"] == pytest.approx(expected[h["id"]], abs=1e-4)
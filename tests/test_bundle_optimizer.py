@@ -0,0 +1,50 @@
+import itertools
+import random
+
+from bundle_optimizer import optimize_bundles, option
+
+
+def brute_force(levels, budget_max, top_n):
+    bundles = []
+    for combo in itertools.product(*levels):
+        cost = sum(o["cost"] for o in combo)
+        if budget_max is None or cost <= budget_max:
+            bundles.append((cost, sum(o["score"] for o in combo)))
+    best = sorted((s for _, s in bundles), reverse=True)[:top_n]
+    front, top = [], None
+    for cost, score in sorted(bundles, key=lambda b: (b[0], -b[1])):
+        if top is None or score > top:
+            front.append((cost, score))
+            top = score
+    return best, front
+
+
+def random_levels(rng):
+    return [[option(rng.randint(0, 50), rng.randint(0, 20), item=(i, j)) for j in range(rng.randint(1, 6))]
+            for i in range(rng.randint(1, 4))]
+
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(300):
+        levels = random_levels(rng)
+        budget = rng.choice([None, rng.randint(0, 150)])
+        top_n = rng.randint(1, 5)
+        res = optimize_bundles(levels, budget, top_n)
+        best, front = brute_force(levels, budget, top_n)
+        assert [b["score"] for b in res["best"]] == best
+        assert [(b["cost"], b["score"]) for b in res["pareto"]] == front
+
+
+def test_bundle_totals_match_picks():
+    levels = [[option(10, 3, "a"), option(30, 9, "b")], [option(5, 1, "x"), option(25, 6, "y")]]
+    res = optimize_bundles(levels, budget_max=40, top_n=3)
+    for b in res["best"] + res["pareto"]:
+        assert b["cost"] == sum(p["cost"] for p in b["picks"]) <= 40
+        assert b["score"] == sum(p["score"] for p in b["picks"])
+    assert [p["item"] for p in res["best"][0]["picks"]] == ["b", "x"]
+
+
+def test_infeasible():
+    assert optimize_bundles([[option(10, 1)], []])["best"] == []
+    assert optimize_bundles([[option(10, 1)]], budget_max=5) == {"best": [], "pareto": [], "explored": 0}
@@ -0,0 +1,99 @@
+import pytest
+
+from catalog import Catalog
+from pois_real import get_pois_map
+
+CITIES = ["Mumbai", "Delhi", "Goa", "Jaipur", "Agra", "Kochi", "Pune"]
+
+
+@pytest.fixture
+def catalog():
+    destinations = [{"id": f"dest_{i}", "name": c, "avg_price": 5000, "tags": ["culture"], "seasonality": 0.8}
+                    for i, c in enumerate(CITIES)]
+    hotels = [{"id": f"hotel_{i}", "name": f"Hotel {i}", "destination_id": f"dest_{i % len(CITIES)}",
+               "price": 1000 + 100 * i, "tags": ["wifi"]} for i in range(14)]
+    flights = [{"id": "fl_0", "from": "Delhi", "to": "Goa", "price": 4000, "stops": 0}]
+    trains = [{"id": "tr_0", "from": "Delhi", "to": "Agra", "price": 500}]
+    return Catalog(destinations, hotels, flights, trains, get_pois_map(destinations, seed=42))
+
+
+def _hotel_delta(op, **record):
+    return {"op": op, "kind": "hotel", "record": record}
+
+
+def test_upsert_update_and_delete(catalog):
+    seen = []
+    catalog.subscribe(lambda version, changed: seen.append((version, set(changed))))
+    h = catalog.hotels[0]
+    dest = h["destination_id"]
+
+    changed = catalog.apply_deltas([_hotel_delta("update", id=h["id"], price=7)])
+    assert changed == {dest} and catalog.get("hotel", h["id"])["price"] == 7
+    assert catalog.version == 1 and catalog.dest_version(dest) == 1 and seen == [(1, {dest})]
+
+    # add of an existing id updates it; update of a missing id adds it
+    catalog.apply_deltas([_hotel_delta("add", id=h["id"], price=9),
+                          _hotel_delta("update", id="hotel_new", destination_id="dest_3", price=100, name="New")])
+    assert catalog.get("hotel", h["id"])["price"] == 9
+    assert catalog.get("hotel", "hotel_new") in catalog.hotels_by_dest["dest_3"]
+
+    # moving a hotel changes both partitions
+    changed = catalog.apply_deltas([_hotel_delta("update", id="hotel_new", destination_id="dest_4")])
+    assert changed == {"dest_3", "dest_4"}
+    assert catalog.get("hotel", "hotel_new") in catalog.hotels_by_dest["dest_4"]
+    assert all(x["id"] != "hotel_new" for x in catalog.hotels_by_dest["dest_3"])
+
+    n = len(catalog.hotels)
+    catalog.apply_deltas([_hotel_delta("delete", id=h["id"])])
+    assert catalog.get("hotel", h["id"]) is None and len(catalog.hotels) == n - 1
+    assert all(catalog.get("hotel", x["id"]) is x for x in catalog.hotels)
+    assert catalog.changed_since(1) == {dest, "dest_3", "dest_4"}
+    assert catalog.apply_deltas([_hotel_delta("delete", id="no_such_hotel")]) == set()
+
+
+def test_poi_add_and_delete(catalog):
+    dest = "dest_3"
+    before = len(catalog.pois_map[dest])
+    catalog.apply_deltas([{"op": "add", "kind": "poi", "record": {"id": "poi_x", "destination_id": dest, "name": "X"}}])
+    poi = catalog.get("poi", "poi_x")
+    assert poi in catalog.pois_map[dest] and len(catalog.pois_map[dest]) == before + 1
+    catalog.apply_deltas([{"op": "delete", "kind": "poi", "record": {"id": "poi_x"}}])
+    assert catalog.get("poi", "poi_x") is None
+    assert all("poi_x" not in (q.get("travel_to") or {}) for q in catalog.pois_map[dest])
+
+
+@pytest.mark.parametrize("bad", [
+    {"op": "upsert", "kind": "hotel", "record": {"id": "hotel_1"}},
+    {"op": "upsert", "kind": "hotel", "record": {"id": "no_such_hotel"}},
+    {"op": "update", "kind": "cruise", "record": {"id": "c1"}},
+    {"op": "update", "kind": "hotel", "record": {}},
+    {"op": "add", "kind": "hotel", "record": {"id": "hotel_nowhere", "price": 1}},
+    {"op": "add", "kind": "poi", "record": {"id": "poi_y", "destination_id": "dest_999"}},
+])
+def test_bad_delta_rejects_the_whole_batch(catalog, bad):
+    seen = []
+    catalog.subscribe(lambda version, changed: seen.append(version))
+    h = catalog.hotels[0]
+    price = h["price"]
+    with pytest.raises(ValueError):
+        catalog.apply_deltas([_hotel_delta("update", id=h["id"], price=7), bad])
+    assert h["price"] == price and catalog.version == 0 and seen == []
+
+
+def test_failure_partway_still_versions_and_notifies(catalog, monkeypatch):
+    seen = []
+    catalog.subscribe(lambda version, changed: 1 / 0)          # a broken listener doesn't stop the rest
+    catalog.subscribe(lambda version, changed: seen.append((version, set(changed))))
+    h = catalog.hotels[0]
+    real = catalog._apply_flat
+
+    def flaky(kind, op, rec):
+        if rec["id"] == "hotel_2":
+            raise RuntimeError("disk on fire")
+        return real(kind, op, rec)
+
+    monkeypatch.setattr(catalog, "_apply_flat", flaky)
+    with pytest.raises(RuntimeError):
+        catalog.apply_deltas([_hotel_delta("update", id=h["id"], price=7), _hotel_delta("update", id="hotel_2", price=8)])
+    assert h["price"] == 7
+    assert catalog.version == 1 and seen == [(1, {h["destination_id"]})]
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from concurrency import run_stages
+
+
+def boom():
+    raise ValueError("boom")
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_errors_and_timeouts_reported_separately(parallel):
+    stages = {"ok": lambda: 1, "bad": boom, "slow": lambda: time.sleep(0.3) or 2}
+    if not parallel:
+        # inline stages can only miss the deadline before they start
+        stages["late"] = lambda: 3
+    results, timed_out, errors = run_stages(stages, deadline_s=0.1, parallel=parallel)
+    assert results["ok"] == 1
+    assert list(errors) == ["bad"] and isinstance(errors["bad"], ValueError)
+    assert timed_out == (["slow"] if parallel else ["late"])
+
+
+def test_bundle_reports_failed_stage(caplog):
+    from engine import RecommendationEngine
+    eng = RecommendationEngine.from_mock_data()
+    eng.filter_trains = lambda filters: boom()
+    user = eng.users[0]
+    bundle = eng.build_itinerary_bundle(user["profile"], {"destination_id": "dest_8"}, user["id"], deadline_s=None)
+    assert bundle["failed"] == {"trains": "ValueError('boom')"}
+    assert bundle["timed_out"] == []
+    assert "bundle stage trains failed" in caplog.text
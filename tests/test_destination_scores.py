@@ -0,0 +1,45 @@
+import random
+
+from scorer import DestinationScoreTable
+
+TAGS = ["beach", "culture", "mountains", "adventure", "nature", "relax", "city", "heritage", "nightlife"]
+
+
+def make_destinations(rng, n=20):
+    return [{"id": f"dest_{i}", "tags": rng.sample(TAGS, 2), "avg_price": rng.randint(4000, 15000),
+             "seasonality": round(rng.uniform(0.4, 1.0), 2)} for i in range(n)]
+
+
+def reference_rank(destinations, interests, budget_max, limit):
+    """The per-call scoring the table replaces."""
+    def score_dest(d):
+        s = 0.0
+        for t in interests:
+            if t in d.get("tags", []):
+                s += 2.0
+        s += float(d.get("seasonality", 0.6))
+        if budget_max:
+            s += max(0, (1.0 - abs(d.get("avg_price", 0) - budget_max) / (budget_max + 1))) * 0.5
+        return s
+    return sorted(destinations, key=score_dest, reverse=True)[:limit]
+
+
+def test_rank_matches_per_call_scoring():
+    rng = random.Random(4)
+    destinations = make_destinations(rng)
+    for _ in range(100):
+        interests = [rng.choice(TAGS) for _ in range(rng.randint(0, 4))]     # repeats count twice
+        table = DestinationScoreTable(destinations, interests)
+        for budget_max in (None, 0, rng.randint(2000, 20000)):
+            limit = rng.randint(1, 10)
+            got = [d["id"] for d in table.rank(budget_max, limit)]
+            assert got == [d["id"] for d in reference_rank(destinations, interests, budget_max, limit)]
+
+
+def test_budget_only_touches_the_budget_term():
+    destinations = make_destinations(random.Random(5))
+    table = DestinationScoreTable(destinations, ["beach"])
+    base = table.scores()
+    for b, s in zip(base, table.scores(9000)):
+        assert 0 <= s - b <= 0.5
+    assert table.scores() == base
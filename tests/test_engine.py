@@ -0,0 +1,49 @@
+import pytest
+
+from engine import RecommendationEngine
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RecommendationEngine.from_mock_data()
+
+
+def test_parse_search_returns_copies(engine):
+    first = engine.parse_search("3 nights in Jaipur under 5000")
+    first["tags"] = ["changed"]
+    first.clear()
+    assert engine.parse_search("3 nights in Jaipur under 5000") != {}
+    cache = {}
+    assert engine.parse_search("3 nights in Jaipur under 5000", cache=cache) is not engine.parse_search("3 nights in Jaipur under 5000")
+
+
+def test_explore_view_keyed_on_profile_override(engine):
+    user = engine.users[0]
+    stored = engine.build_explore_view("dest_8", user["profile"], {}, user["id"])
+    other = dict(user["profile"], interests=["nightlife"], budget={"min": 500, "max": 1500})
+    overridden = engine.build_explore_view("dest_8", other, {}, user["id"], past_trips=[])
+    assert overridden is not stored
+    fresh = engine._compute_explore_view("dest_8", other, {}, user["id"], past_trips=[])
+    strip = lambda view: {k: v for k, v in view.items() if k != "hotel_cascade"}   # timings differ
+    assert strip(overridden) == strip(fresh)
+    assert engine.build_explore_view("dest_8", user["profile"], {}, user["id"]) is stored
+
+
+def test_deltas_invalidate_engine_caches():
+    engine = RecommendationEngine.from_mock_data()
+    user = engine.users[0]
+    h = engine.catalog.hotels[0]
+    dest = h["destination_id"]
+    delta = lambda op, **rec: [{"op": op, "kind": "hotel", "record": dict(rec, id=h["id"])}]
+    view = engine.build_explore_view(dest, user["profile"], {}, user["id"])
+    assert engine.build_explore_view(dest, user["profile"], {}, user["id"]) is view
+
+    engine.catalog.apply_deltas(delta("update", price=1))
+    fresh = engine.build_explore_view(dest, user["profile"], {}, user["id"])
+    assert fresh is not view
+    assert engine.build_explore_view(dest, user["profile"], {}, user["id"]) is fresh
+
+    engine.catalog.apply_deltas(delta("delete"))
+    after = engine.build_explore_view(dest, user["profile"], {}, user["id"])
+    assert after is not fresh and (after["recommended_hotel"] or {}).get("id") != h["id"]
+    assert h["id"] not in [x["id"] for x in engine.hotel_recommendations(user["profile"], {"destination_id": dest}, limit=50)]
@@ -0,0 +1,91 @@
+import sqlite3
+import time
+
+import pytest
+
+from events import EventSink
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "events.db")
+
+
+def test_flush_and_recent(db):
+    sink = EventSink(db)
+    assert sink.emit("book_hotel", "u1", "hotel_1", channel="web")
+    assert sink.emit("click", "u2", "dest_5")
+    assert sink.depth() == 2
+    assert sink.flush() == 2 and sink.depth() == 0 and sink.written == 2
+    recent = sink.recent()
+    assert [r["event"] for r in recent] == ["click", "book_hotel"]
+    assert recent[1]["channel"] == "web"
+    assert [r["item"] for r in sink.recent(user_id="u1")] == ["hotel_1"]
+    sink.close()
+
+
+def test_full_ring_drops_instead_of_blocking(db):
+    sink = EventSink(db, capacity=3)
+    results = [sink.emit("click", "u", f"i{i}") for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert sink.dropped == 2 and sink.flush() == 3
+    sink.close()
+
+
+def test_failed_batch_is_retried(db, monkeypatch):
+    sink = EventSink(db)
+    real = sink._connect
+    calls = {"n": 0}
+
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return real()
+
+    monkeypatch.setattr(sink, "_connect", flaky)
+    sink.emit("click", "u", "a")
+    sink.emit("click", "u", "b")
+    assert sink.flush() == 0 and sink.depth() == 2      # kept for the next attempt
+    sink.emit("click", "u", "c")
+    assert sink.flush() == 3
+    assert [r["item"] for r in sink.recent()] == ["c", "b", "a"]
+    sink.close()
+
+
+def test_disabled_sink(tmp_path):
+    sink = EventSink(None).start()
+    assert not sink.emit("click", "u", "a")
+    assert sink.flush() == 0 and sink.recent() == [] and sink.read_since(0) == []
+    sink.close()
+
+
+def test_listeners_replay_then_follow_every_writer(db):
+    a, b = EventSink(db), EventSink(db)                # two workers sharing one file
+    a.emit("click", "u", "old", ts=time.time() - 10_000)
+    a.emit("click", "u", "recent", ts=time.time() - 10)
+    a.flush()
+    seen = []
+    a.subscribe(lambda rows: seen.extend(r[3] for r in rows), replay_since=time.time() - 100)
+    assert seen == ["recent"]                          # replay: stored rows from replay_since on
+    b.emit("book_hotel", "u", "from_b")
+    b.flush()
+    a.emit("click", "u", "from_a")
+    a.flush()
+    assert seen == ["recent", "from_b", "from_a"]      # no gap, no repeat, other writers included
+    a.close()
+    b.close()
+
+
+def test_background_flush(db):
+    sink = EventSink(db, flush_interval_s=0.02)
+    got, ticks = [], []
+    sink.subscribe(got.extend)
+    sink.on_tick(lambda: ticks.append(1))
+    sink.start()
+    sink.emit("click", "u", "x")
+    deadline = time.monotonic() + 2.0
+    while not got and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sink.close()
+    assert [r[3] for r in got] == ["x"] and ticks
@@ -0,0 +1,85 @@
+import pytest
+
+from fuzzy import PlaceIndex, edit_similarity, origin_span
+from gemini_wrapper import _parse_search_local
+from engine import RecommendationEngine
+
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Kolkata", "Varanasi", "Jaipur"]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RecommendationEngine.from_mock_data()
+
+
+@pytest.mark.parametrize("typo,city", [("kolkatta", "Kolkata"), ("banglore", "Bengaluru"), ("varansi", "Varanasi"),
+                                       ("calcutta", "Kolkata"), ("bombay", "Mumbai"), ("jaipr", "Jaipur")])
+def test_search_typos_and_aliases(typo, city):
+    hits = PlaceIndex.for_cities(CITIES).search(typo)
+    assert hits and hits[0].value == city
+
+
+def test_ordinary_words_are_not_places():
+    idx = PlaceIndex.for_cities(CITIES)
+    assert [m.value for m in idx.find_in_text("3 nights itenary in kolkatta with family")] == ["Kolkata"]
+
+
+def test_edit_similarity():
+    assert edit_similarity("abc", "abc") == 1.0
+    assert edit_similarity("varansi", "varanasi") == pytest.approx(1 - 1 / 8)
+    assert edit_similarity("ab", "ba") == pytest.approx(0.5)   # one transposition
+
+
+def test_origin_span():
+    assert origin_span("kolkatta from banglore") == (9, 22)
+    assert origin_span("from banglore to kolkatta") == (0, 14)
+    assert origin_span("trip to goa") is None
+
+
+@pytest.mark.parametrize("query,dest_id,origin", [
+    ("3 nights itenary in kolkatta from banglore", "dest_4", "Bangalore"),
+    ("calcutta from bombay", "dest_4", "Mumbai"),
+    ("trip to varansi from delhi", "dest_9", "Delhi"),
+    ("from banglore to kolkatta 3 nights", "dest_4", "Bangalore"),
+    ("weekend from banglore", None, "Bangalore"),
+    ("3 nights in varansi from delhi", "dest_9", "Delhi"),     # exact origin, misspelled destination
+    ("3 nights in jaipur from delhi", "dest_6", "Delhi"),      # both exact: position decides, not dict order
+    ("goa from mumbai", "dest_5", "Mumbai"),
+    ("trip to agra from delhi", "dest_8", "Delhi"),
+    ("trip to kochi from delhi", None, "Delhi"),              # unknown to the local map: no id, never Delhi
+])
+def test_local_parse_keeps_origin_out_of_destination(query, dest_id, origin):
+    out = _parse_search_local(query)
+    assert (out["destination_id"], out["origin"]) == (dest_id, origin)
+
+
+def test_local_parse_names_destination_after_to():
+    assert _parse_search_local("trip to kochi from delhi")["destination"] == "Kochi"
+
+
+@pytest.mark.parametrize("query,itinerary", [
+    ("itinerary for goa", True), ("3 day itineraries in goa", True), ("itenary for goa", True),
+    ("itineray goa", True), ("literary festival in jaipur", False), ("itinerant musicians goa", False),
+])
+def test_local_parse_itinerary_words(query, itinerary):
+    assert (_parse_search_local(query)["trip_type"] == "itinerary") is itinerary
+
+
+@pytest.mark.parametrize("query,dest_id,origin", [
+    ("3 nights itenary in kolkatta from banglore", "dest_4", "Bengaluru"),
+    ("calcutta from bombay", "dest_4", "Mumbai"),
+    ("trip to varansi from delhi", "dest_9", "Delhi"),
+    ("weekend from banglore", None, "Bengaluru"),
+    ("3 nights in varansi from delhi", "dest_9", "Delhi"),
+    ("trip to kochi from delhi", "dest_17", "Delhi"),
+])
+def test_engine_parse_typos(engine, query, dest_id, origin):
+    assert engine.detect_destination_in_text(query) == dest_id
+    parsed = engine.parse_search(query)
+    assert (parsed.get("destination_id"), parsed.get("origin")) == (dest_id, origin)
+
+
+def test_resolve_city_name_typos(engine):
+    assert engine.resolve_city_name("kolkatta") == "Kolkata"
+    assert engine.resolve_city_name("banglore") == "Bengaluru"
+    assert engine.resolve_city_name("varansi") == "Varanasi"
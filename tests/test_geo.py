@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from geo import CITY_COORDS, GeoGrid, haversine_km, scatter_point
+
+
+def _points(n, center, spread_km, seed):
+    return np.array([scatter_point(center, f"p{i}", spread_km, seed=seed) for i in range(n)])
+
+
+@pytest.mark.parametrize("cell_km", [0.3, 1.0, 3.0])
+def test_within_and_nearest_match_brute_force(cell_km):
+    rng = np.random.default_rng(11)
+    for city, center in list(CITY_COORDS.items())[:4]:
+        pts = _points(300, center, 6.0, seed=len(city))
+        grid = GeoGrid(pts[:, 0], pts[:, 1], cell_km=cell_km)
+        for _ in range(20):
+            qlat, qlon = center[0] + rng.normal(0, 0.05), center[1] + rng.normal(0, 0.05)
+            km = haversine_km(qlat, qlon, pts[:, 0], pts[:, 1])
+            radius = float(rng.uniform(0.2, 5.0))
+            idx, dist = grid.within(qlat, qlon, radius)
+            assert set(idx.tolist()) == set(np.flatnonzero(km <= radius).tolist())
+            assert np.all(np.diff(dist) >= 0) and np.allclose(dist, km[idx])
+            k = int(rng.integers(1, 40))
+            idx, dist = grid.nearest(qlat, qlon, k)
+            assert len(idx) == k
+            assert np.allclose(dist, np.sort(km)[:k])
+
+
+def test_far_query_and_empty_grid():
+    pts = _points(50, CITY_COORDS[next(iter(CITY_COORDS))], 3.0, seed=1)
+    grid = GeoGrid(pts[:, 0], pts[:, 1])
+    idx, dist = grid.nearest(0.0, 0.0, 5)                     # thousands of km away
+    km = haversine_km(0.0, 0.0, pts[:, 0], pts[:, 1])
+    assert np.allclose(dist, np.sort(km)[:5])
+    assert len(grid.within(0.0, 0.0, 10.0)[0]) == 0
+    assert len(grid.nearest(pts[0, 0], pts[0, 1], 500)[0]) == 50
+    empty = GeoGrid([], [])
+    assert len(empty) == 0 and len(empty.within(0.0, 0.0, 1.0)[0]) == 0 and len(empty.nearest(0.0, 0.0, 3)[0]) == 0
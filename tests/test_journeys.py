@@ -0,0 +1,85 @@
+import collections
+import random
+
+import pytest
+
+from journeys import DAY_MINS, MAX_JOURNEY_MINS, MAX_LAYOVER_MINS, JourneyPlanner, _clock
+from mock_data import generate_mock_data
+
+
+def brute_force(planner, origin, max_transfers, depart_after="00:00", window_mins=DAY_MINS, max_price=None):
+    """{destination: {(price, duration, transfers)}} over every chain of expanded connections."""
+    start = _clock(depart_after)
+    last_dep, end = start + window_mins, start + window_mins + MAX_JOURNEY_MINS
+    by_city = collections.defaultdict(list)
+    for day in range(start // DAY_MINS, end // DAY_MINS + 1):
+        for dep, dur, u, v, price, kind, _ in planner._rows:
+            t = day * DAY_MINS + dep
+            if start <= t and t + dur <= end:
+                by_city[u].append((t, t + dur, v, price, kind))
+    src = planner._city[origin.lower()]
+    found = collections.defaultdict(set)
+
+    def extend(city, dep0, arr, price, kind, legs):
+        if legs > max_transfers:
+            return
+        for t, a, v, p, k in by_city[city]:
+            wait = t - arr
+            if v != src and planner._mct[kind][k] <= wait <= MAX_LAYOVER_MINS:
+                walk(v, dep0, a, price + p, k, legs + 1)
+
+    def walk(city, dep0, arr, price, kind, legs):
+        if max_price is not None and price > max_price:
+            return
+        found[city].add((price, arr - dep0, legs - 1))
+        extend(city, dep0, arr, price, kind, legs)
+
+    for t, a, v, p, k in by_city[src]:
+        if t <= last_dep and v != src:
+            walk(v, t, a, p, k, 1)
+    return {city: pareto(points) for city, points in found.items()}
+
+
+def pareto(points):
+    return {p for p in points if not any(q != p and all(x <= y for x, y in zip(q, p)) for q in points)}
+
+
+def check_all_pairs(planner, max_transfers, **kw):
+    for origin in planner.names.values():
+        expected = brute_force(planner, origin, max_transfers, **kw)
+        for dest_key, dest in planner.names.items():
+            if dest_key == origin.lower():
+                continue
+            got = planner.search(origin, dest, max_transfers=max_transfers, limit=10000, **kw)
+            assert {(j["price"], j["duration_mins"], j["transfers"]) for j in got} == \
+                expected.get(planner._city[dest_key], set()), (origin, dest)
+
+
+def test_mock_catalog_matches_brute_force():
+    d = generate_mock_data(42)
+    check_all_pairs(JourneyPlanner(d["flights"], d["trains"]), max_transfers=1)
+
+
+def test_layover_cap_keeps_later_arrival():
+    # ab1 leaves later and lands earlier than ab2 at the same price, but lands more than
+    # MAX_LAYOVER_MINS before the only B -> C service; ab2 makes it
+    svc = lambda i, a, b, dep, dur: {"id": i, "from": a, "to": b, "departure_time": dep,
+                                     "duration_mins": dur, "price": 100}
+    flights = [svc("ab1", "A", "B", "01:00", 60), svc("ab2", "A", "B", "00:30", 750), svc("bc", "B", "C", "23:00", 60)]
+    assert 23 * 60 - 2 * 60 > MAX_LAYOVER_MINS >= 23 * 60 - (30 + 750)
+    planner = JourneyPlanner(flights, [], reverse_services=False)
+    got = planner.search("A", "C", depart_after="00:00", window_mins=120)
+    assert [[leg["id"] for leg in j["legs"]] for j in got] == [["ab2", "bc"]]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_network_matches_brute_force(seed):
+    rng = random.Random(seed)
+    cities = [f"C{i}" for i in range(6)]
+    recs = lambda prefix, n: [{"id": f"{prefix}{i}", "from": rng.choice(cities), "to": rng.choice(cities),
+                               "departure_time": f"{rng.randrange(24):02d}:{rng.choice([0, 15, 30, 45]):02d}",
+                               "duration_mins": rng.randint(45, 900), "price": rng.randint(300, 6000)}
+                              for i in range(n)]
+    planner = JourneyPlanner(recs("f", 25), recs("t", 25))
+    check_all_pairs(planner, max_transfers=2, depart_after="06:00", window_mins=12 * 60,
+                    max_price=rng.choice([None, 9000]))
@@ -0,0 +1,41 @@
+import threading
+
+from memo import LRUMemo
+
+
+def test_hits_misses_and_lru_eviction():
+    memo = LRUMemo(maxsize=2)
+    calls = []
+    compute = lambda k: memo.get_or_compute(k, lambda: calls.append(k) or k.upper())
+    assert compute("a") == "A" and compute("b") == "B"
+    assert compute("a") == "A"                      # hit; "a" is now the most recent
+    compute("c")                                    # evicts "b", the least recently used
+    assert calls == ["a", "b", "c"]
+    assert (memo.hits, memo.misses, memo.evictions, len(memo)) == (1, 3, 1, 2)
+    compute("a")
+    compute("b")
+    assert calls == ["a", "b", "c", "b"]
+
+
+def test_invalidate_by_key_predicate():
+    memo = LRUMemo()
+    for user in ("u1", "u2"):
+        for dest in ("dest_1", "dest_2"):
+            memo.get_or_compute((user, dest), lambda: object())
+    kept = memo.get_or_compute(("u1", "dest_1"), lambda: None)
+    assert memo.invalidate(lambda k: k[1] == "dest_2") == 2
+    assert len(memo) == 2 and memo.get_or_compute(("u1", "dest_1"), lambda: None) is kept
+    memo.clear()
+    assert len(memo) == 0
+
+
+def test_concurrent_callers_get_a_value():
+    memo = LRUMemo(maxsize=8)
+    out = []
+    threads = [threading.Thread(target=lambda i=i: out.append(memo.get_or_compute(i % 4, lambda: i % 4)))
+               for i in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(out) == sorted(i % 4 for i in range(32)) and len(memo) == 4
@@ -0,0 +1,75 @@
+import json
+import urllib.request
+
+import pytest
+
+import gemini_wrapper
+from engine import RecommendationEngine
+from metrics import PARSE_SECONDS, Registry, start_http_server
+
+
+def _sample(metric, name, **labels):
+    want = sorted(labels.items())
+    for n, pairs, value in metric.samples():
+        if n == name and sorted(pairs) == want:
+            return value
+    return 0
+
+
+def test_exposition_format():
+    reg = Registry()
+    c = reg.counter("t_requests_total", "Requests.", ["route"])
+    c.inc(route='/v1/"parse"')
+    c.inc(2, route='/v1/"parse"')
+    h = reg.histogram("t_seconds", "Latency.", buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v)
+    reg.callback("t_size", "Sizes.", "gauge", ["cache"], lambda: {("a",): 3})
+    text = reg.expose()
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{route="/v1/\\"parse\\""} 3' in text
+    assert 't_seconds_bucket{le="0.1"} 1' in text and 't_seconds_bucket{le="1"} 2' in text
+    assert 't_seconds_bucket{le="+Inf"} 3' in text and "t_seconds_count 3" in text and "t_seconds_sum 5.55" in text
+    assert 't_size{cache="a"} 3' in text
+    assert reg.counter("t_requests_total", "again") is c          # re-registering returns the same metric
+    with pytest.raises(ValueError):
+        c.inc(path="/")
+    with pytest.raises(ValueError):
+        c.inc(-1, route="/")
+
+
+def test_http_endpoint():
+    reg = Registry()
+    reg.gauge("t_up", "Up.").set(1)
+    server = start_http_server(port=0, registry=reg)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5) as r:
+            assert r.status == 200 and "t_up 1" in r.read().decode()
+    finally:
+        server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RecommendationEngine.from_mock_data()
+
+
+def test_parse_seconds_labelled_by_parser_used(engine, monkeypatch):
+    count = lambda source: _sample(PARSE_SECONDS, "travel_reco_parse_seconds_count", source=source)
+    before = {s: count(s) for s in ("gemini", "heuristic")}
+    monkeypatch.setattr(gemini_wrapper, "USE_GEMINI", True)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(gemini_wrapper, "_call_remote_parse", broken)
+    parsed = engine.parse_search("4 nights in jaipur metrics fallback")
+    assert parsed["destination_id"] == "dest_6" and "_source" not in parsed
+    assert count("heuristic") == before["heuristic"] + 1 and count("gemini") == before["gemini"]
+
+    monkeypatch.setattr(gemini_wrapper, "_call_remote_parse",
+                        lambda *a, **k: json.dumps({"destination": "Goa", "tags": ["beach"], "nights": 3}))
+    parsed = engine.parse_search("three nights somewhere sunny metrics remote")
+    assert parsed["destination_id"] == "dest_5"
+    assert parsed["_field_sources"]["destination"] == "gemini"
+    assert count("gemini") == before["gemini"] + 1
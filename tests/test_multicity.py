@@ -0,0 +1,68 @@
+import itertools
+import random
+
+import pytest
+
+import multicity
+from multicity import CONNECTION_MINS, INF, TransportGraph, _weight, allocate_nights, order_cities
+
+
+def random_weights(rng, names):
+    w = {(a, b): rng.randint(1, 100) for a in names for b in names if a != b}
+    return lambda a, b: 0.0 if a == b else w[(a, b)]
+
+
+def tour_cost(origin, order, weight, back):
+    stops = [origin] + list(order) + ([origin] if back else [])
+    return sum(weight(a, b) for a, b in zip(stops, stops[1:]))
+
+
+@pytest.mark.parametrize("back", [True, False])
+def test_dp_order_is_optimal(back):
+    rng = random.Random(3)
+    for n in range(1, 7):
+        for _ in range(20):
+            cities = [f"c{i}" for i in range(n)]
+            weight = random_weights(rng, ["o"] + cities)
+            order, total, method, _ = order_cities("o", cities, weight, back)
+            assert method == "dp" and sorted(order) == cities
+            assert total == pytest.approx(tour_cost("o", order, weight, back))
+            assert total == pytest.approx(min(tour_cost("o", p, weight, back) for p in itertools.permutations(cities)))
+
+
+def test_beam_order_is_a_valid_tour(monkeypatch):
+    monkeypatch.setattr(multicity, "DP_MAX_CITIES", 3)
+    rng = random.Random(5)
+    cities = [f"c{i}" for i in range(7)]
+    weight = random_weights(rng, ["o"] + cities)
+    order, total, method, _ = order_cities("o", cities, weight)
+    assert method == "beam" and sorted(order) == cities
+    assert total == pytest.approx(tour_cost("o", order, weight, True))
+    assert total >= min(tour_cost("o", p, weight, True) for p in itertools.permutations(cities)) - 1e-9
+
+
+def test_graph_routes_match_weights():
+    rng = random.Random(11)
+    cities = [f"C{i}" for i in range(7)]
+    flights = [{"id": f"f{i}", "from": rng.choice(cities), "to": rng.choice(cities),
+                "price": rng.randint(500, 5000), "duration_mins": rng.randint(60, 300)} for i in range(12)]
+    g = TransportGraph(flights, [])
+    for a in g.names.values():
+        for b in g.names.values():
+            route = g.route(a, b)
+            if route is None:
+                assert g.weight(a, b) == INF
+                continue
+            cost = sum(_weight(s["price"], s["duration_mins"]) for s in route)
+            cost += _weight(0, CONNECTION_MINS) * max(0, len(route) - 1)
+            assert cost == pytest.approx(g.weight(a, b))
+            # never beaten by a single direct service
+            direct = [_weight(f["price"], f["duration_mins"]) for f in flights
+                      if {f["from"].lower(), f["to"].lower()} == {a.lower(), b.lower()} and a != b]
+            assert all(g.weight(a, b) <= d + 1e-9 for d in direct)
+
+
+def test_allocate_nights():
+    nights = allocate_nights(7, [1000, 1000, 1000], [1.0, 0.5, 0.1])
+    assert sum(nights) == 7 and min(nights) >= 1
+    assert nights[0] >= nights[1] >= nights[2]
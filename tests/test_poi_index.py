@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import poi_index
+from catalog import Catalog
+from geo import haversine_km, point_of, travel_estimate, city_profile
+from mock_data import generate_mock_data
+from poi_index import HotelPOIIndex
+from pois_real import get_pois_map
+
+
+@pytest.fixture
+def catalog():
+    d = generate_mock_data(42)
+    return Catalog(d["destinations"], d["hotels"], d["flights"], d["trains"], get_pois_map(d["destinations"], seed=42))
+
+
+def _dest_with_hotel(catalog):
+    return next(d for d, hs in catalog.hotels_by_dest.items() if hs and catalog.pois_map.get(d))
+
+
+def test_travel_matches_direct_estimate(catalog):
+    dest_id = _dest_with_hotel(catalog)
+    dest = catalog.dest_map[dest_id]
+    hotel = catalog.hotels_by_dest[dest_id][0]
+    pois = catalog.pois_map[dest_id]
+    block = HotelPOIIndex(catalog).for_destination(dest_id)
+    hpt = point_of(hotel, dest, catalog.seed)
+    km = np.array([haversine_km(*hpt, *point_of(p, dest, catalog.seed)) for p in pois])
+    mins, cost = travel_estimate(km, city_profile(dest["name"]))
+    got = block.travel_many(hotel["id"], [p["id"] for p in pois])
+    assert [got[p["id"]]["mins"] for p in pois] == mins.tolist()
+    assert [got[p["id"]]["cost"] for p in pois] == cost.tolist()
+
+    near = block.nearest_pois(hotel["id"], k=5)
+    assert [m for _, m, _ in near] == sorted(mins.tolist())[:5]
+    reach = sorted(mins.tolist())[len(pois) // 2]
+    within = block.within(hotel["id"], reach)
+    assert sorted(p["id"] for p, _, _ in within) == sorted(p["id"] for p, m in zip(pois, mins.tolist()) if m <= reach)
+    assert block.travel("no_such_hotel", pois[0]["id"]) is None
+
+
+def test_blocks_follow_deltas(catalog):
+    idx = HotelPOIIndex(catalog)
+    dest_id = _dest_with_hotel(catalog)
+    first = idx.for_destination(dest_id)
+    assert idx.for_destination(dest_id) is first
+    catalog.apply_deltas([{"op": "add", "kind": "hotel", "record": {"id": "h_new", "destination_id": dest_id, "price": 100}}])
+    fresh = idx.for_destination(dest_id)
+    assert fresh is not first and "h_new" in fresh.hotel_pt
+
+
+def test_block_built_during_a_delta_is_not_kept(catalog, monkeypatch):
+    idx = HotelPOIIndex(catalog)
+    dest_id = _dest_with_hotel(catalog)
+    real = poi_index.DestinationTravelIndex
+    calls = []
+
+    def racing(*args, **kwargs):
+        block = real(*args, **kwargs)                  # built from the old records...
+        if not calls:
+            # ...while a delta (and its invalidation) lands before the block is stored
+            catalog.apply_deltas([{"op": "add", "kind": "hotel",
+                                   "record": {"id": "h_race", "destination_id": dest_id, "price": 100}}])
+        calls.append(1)
+        return block
+
+    monkeypatch.setattr(poi_index, "DestinationTravelIndex", racing)
+    stale = idx.for_destination(dest_id)
+    assert "h_race" not in stale.hotel_pt
+    assert "h_race" in idx.for_destination(dest_id).hotel_pt
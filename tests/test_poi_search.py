@@ -0,0 +1,71 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from poi_search import B, K1, POISearchIndex, _doc_terms, tokenize
+
+WORDS = ["fort", "forts", "beach", "beaches", "temple", "museum", "market", "lake", "palace", "garden", "gallery"]
+
+
+def random_city(rng, dest_id, n):
+    return [{"id": f"{dest_id}_p{i}", "name": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))),
+             "category": rng.choice(["heritage", "nature", "shopping", "beach"])} for i in range(n)]
+
+
+def reference(pois_map, query):
+    """{poi_id: BM25} computed from scratch over every POI."""
+    docs = [(p["id"], _doc_terms(p)) for pois in pois_map.values() for p in pois]
+    n = len(docs)
+    avgdl = sum(sum(t.values()) for _, t in docs) / n
+    df = Counter(term for _, t in docs for term in t)
+    out = {}
+    for pid, terms in docs:
+        dl = sum(terms.values())
+        s = 0.0
+        for term, qtf in Counter(tokenize(query)).items():
+            tf = terms.get(term, 0)
+            if tf:
+                idf = math.log(1.0 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                s += qtf * idf * tf * (K1 + 1.0) / (tf + K1 * (1.0 - B + B * dl / avgdl))
+        if s:
+            out[pid] = s
+    return out
+
+
+def test_tokenize_stems_plurals():
+    assert tokenize("Forts, Beaches & Galleries") == ["fort", "beach", "gallery"]
+    assert tokenize("bus pass") == ["bus", "pass"]
+
+
+@pytest.mark.parametrize("query", ["fort", "beach temple", "museum museum garden", "nothing here"])
+def test_scores_match_reference(query):
+    rng = random.Random(2)
+    pois_map = {f"dest_{d}": random_city(rng, f"dest_{d}", rng.randint(5, 40)) for d in range(5)}
+    idx = POISearchIndex(pois_map)
+    ref = reference(pois_map, query)
+    got = {p["id"]: s for _, p, s in idx.search(query, limit=1000)}
+    assert got.keys() == ref.keys()
+    assert all(got[k] == pytest.approx(ref[k], abs=1e-4) for k in ref)
+    for dest_id, pois in pois_map.items():
+        city = {p["id"]: s for _, p, s in idx.search(query, dest_id=dest_id, limit=1000)}
+        assert city == {k: v for k, v in got.items() if k.startswith(dest_id + "_")}
+        assert idx.interest_scores(dest_id, [query]) == pytest.approx({k: ref[k] for k in city})
+    top = [s for _, _, s in idx.search(query, limit=5)]
+    assert top == sorted(top, reverse=True)
+
+
+def test_set_city_matches_fresh_build():
+    rng = random.Random(4)
+    pois_map = {f"dest_{d}": random_city(rng, f"dest_{d}", 20) for d in range(4)}
+    idx = POISearchIndex(pois_map)
+    idx.search("fort beach")      # build the global arrays before the update
+    pois_map["dest_1"] = random_city(rng, "dest_1", 7)
+    idx.set_city("dest_1", pois_map["dest_1"])
+    idx.remove_city("dest_3")
+    del pois_map["dest_3"]
+    fresh = POISearchIndex(pois_map)
+    assert len(idx) == len(fresh)
+    for q in ["fort beach", "palace", "market lake"]:
+        assert idx.search(q, limit=100) == fresh.search(q, limit=100)
@@ -0,0 +1,144 @@
+import math
+import random
+
+import pytest
+
+from popularity import DecayedCounts, PopularityTracker, _cells
+from scorer import LIVE_POPULARITY_WEIGHT, item_popularity
+
+HL = 3600.0
+
+
+def _estimate(c, key, now):
+    """Decayed count the structure holds for key: exact if in the head, else the sketch minimum."""
+    raw = c.head.get(key)
+    if raw is None:
+        raw = min(row[col] for row, col in zip(c.sketch, _cells(key, c.depth, c.width)))
+    return raw / c._scale(now)
+
+
+def test_half_life_and_out_of_order_events():
+    c = DecayedCounts(half_life_s=HL)
+    c.add("a", 4.0, ts=1000.0)
+    c.add("b", 4.0, ts=1000.0 + HL)
+    c.add("a", 4.0, ts=1000.0 - HL)           # older event arriving late
+    now = 1000.0 + 2 * HL
+    assert _estimate(c, "a", now) == pytest.approx(4.0 / 4 + 4.0 / 8)
+    assert _estimate(c, "b", now) == pytest.approx(4.0 / 2)
+
+
+def test_renormalize_keeps_values():
+    c = DecayedCounts(half_life_s=1.0)
+    c.add("a", 4.0, ts=0.0)
+    for t in range(10, 400, 10):                # exponent passes the renormalize threshold several times
+        c.add("b", 1.0, ts=float(t))
+    now = 400.0
+    truth_b = sum(2.0 ** -(now - t) for t in range(10, 400, 10))
+    assert c.landmark > 0
+    assert _estimate(c, "b", now) == pytest.approx(truth_b, rel=1e-9)
+    assert _estimate(c, "a", now) == pytest.approx(4.0 * 2.0 ** -400, abs=1e-12)
+
+
+def test_sketch_never_underestimates():
+    rng = random.Random(3)
+    c = DecayedCounts(half_life_s=HL, head_size=8, width=32, depth=3)
+    keys = [f"k{i}" for i in range(200)]
+    truth = {k: 0.0 for k in keys}
+    now = 0.0
+    for step in range(3000):
+        now = step * 5.0
+        k = keys[min(int(rng.paretovariate(1.2)) - 1, len(keys) - 1)]
+        c.add(k, 1.0, ts=now)
+        truth[k] += 2.0 ** (now / HL)
+        if step % 250 == 0:
+            c.snapshot(now)                     # demotes the weakest head items
+    for k in keys:
+        assert _estimate(c, k, now) >= truth[k] * 2.0 ** (-now / HL) - 1e-9
+    assert len(c.head) <= 8
+
+
+def test_head_ranking_matches_exact_counts():
+    rng = random.Random(5)
+    c = DecayedCounts(half_life_s=HL, head_size=16)
+    weights = {f"h{i}": 3.0 + i for i in range(10)}
+    events = [(k, w / 3) for k, w in weights.items() for _ in range(3)]
+    rng.shuffle(events)
+    for k, w in events:
+        c.add(k, w, ts=0.0)
+    snap = c.snapshot(0.0)
+    assert [k for k, _ in snap.top(10)] == sorted(weights, key=lambda k: -weights[k])
+    assert snap.top(1)[0][1] == 1.0
+    assert snap.get("h0") == pytest.approx(math.log1p(3.0) / math.log1p(12.0))
+    assert snap.get("never_seen") == 0.0
+
+
+def test_promotion_and_demotion():
+    c = DecayedCounts(half_life_s=HL, head_size=10)
+    for i in range(30):
+        c.add(f"x{i}", 1.0 + i, ts=0.0)
+    assert set(c.head) == {f"x{i}" for i in range(1, 11)}   # weight >= PROMOTE_MIN, while there's room
+    c.snapshot(0.0)
+    assert len(c.head) == 9 and "x1" not in c.head           # weakest tenth went back to the sketch
+    c.add("x29", 1.0, ts=0.0)
+    assert "x29" in c.head and c.head["x29"] == pytest.approx(31.0)
+
+
+def test_promotion_does_not_move_other_items():
+    c = DecayedCounts(half_life_s=HL)
+    c.add("steady", 1.5, ts=0.0)                # stays in the sketch (below PROMOTE_MIN)
+    c.add("rising", 1.0, ts=0.0)
+    before = c.snapshot(0.0).get("steady")
+    assert before == 1.0                        # the only top so far
+    c.add("rising", 1.0, ts=0.0)                # 2.0: promoted into the head
+    assert "rising" in c.head
+    after = c.snapshot(0.0)
+    assert after.get("steady") == pytest.approx(math.log1p(1.5) / math.log1p(2.0))
+    assert after.get("rising") == 1.0
+
+
+def test_tail_only_snapshot_is_blended():
+    t = PopularityTracker(half_life_s=HL, snapshot_interval_s=0.0)
+    t.add("hotel", "h1", weight=1.0)            # sketch only, nothing in the head yet
+    t.maybe_publish()
+    live = t.live("hotel")
+    assert live is not None and not live.top()
+    assert item_popularity({"id": "h1", "popularity": 0.2}, live) == pytest.approx(
+        (1 - LIVE_POPULARITY_WEIGHT) * 0.2 + LIVE_POPULARITY_WEIGHT * 1.0)
+    assert item_popularity({"id": "h2", "popularity": 0.2}, live) == pytest.approx((1 - LIVE_POPULARITY_WEIGHT) * 0.2)
+    assert item_popularity({"id": "h2", "popularity": 0.2}, None) == 0.2
+
+
+def test_live_is_a_pure_read():
+    t = PopularityTracker(half_life_s=HL, snapshot_interval_s=0.0)
+    t.add("hotel", "h1", weight=5.0)
+    assert t.live("hotel") is None              # nothing published yet
+    t.maybe_publish()
+    snap = t.live("hotel")
+    t.add("hotel", "h2", weight=5.0)
+    assert t.live("hotel") is snap              # reading doesn't publish
+    assert snap.get("h2") == 0.0
+    t.maybe_publish()
+    fresh = t.live("hotel")
+    assert fresh is not snap and fresh.get("h2") > 0
+    t.maybe_publish()                           # nothing new: keeps the snapshot
+    assert t.live("hotel") is fresh
+
+
+def test_sink_idle_tick_publishes_trailing_events(tmp_path):
+    import time
+
+    from events import EventSink
+
+    t = PopularityTracker(half_life_s=HL, snapshot_interval_s=0.0)
+    sink = EventSink(str(tmp_path / "events.db"), flush_interval_s=0.02)
+    sink.subscribe(lambda rows: t.add_many([("hotel", item, 1.0, ts) for ts, _e, _u, item, _x in rows]))
+    sink.on_tick(t.maybe_publish)
+    sink.start()
+    try:
+        sink.emit("book_hotel", "u1", "h1")
+        deadline = time.monotonic() + 2.0
+        while t.live("hotel") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert t.live("hotel") is not None and t.live("hotel").get("h1") == 1.0
+    finally:
+        sink.close()
@@ -0,0 +1,54 @@
+from prompts import (ITINERARY_FIELDS, MAX_QUERY_CHARS, PARSE_FIELDS, PARSE_TOKEN_BUDGET, build_parse_messages,
+                     compact_profile, estimate_tokens, parse_system_prompt)
+
+PROFILE = {"name": "Asha", "email": "asha@example.com", "interests": ["beach", "nightlife"],
+           "budget": {"min": 5000, "max": 12000}, "trip_type": "solo", "history": ["dest_1"] * 50}
+
+
+def test_estimate_tokens_counts_pieces():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("goa") == 1
+    assert estimate_tokens("beaches") == 2
+    assert estimate_tokens("20000") == 2
+    assert estimate_tokens("a, b!") == 4
+
+
+def test_system_prompt_is_shared_across_requests():
+    assert parse_system_prompt() is parse_system_prompt(PARSE_FIELDS)
+    assert "pace" not in parse_system_prompt() and "pace" in parse_system_prompt(ITINERARY_FIELDS)
+    a, _, _ = build_parse_messages("goa for 3 nights", PROFILE)
+    b, _, _ = build_parse_messages("kerala backwaters", {"interests": ["nature"]})
+    assert a[0] == b[0]
+    assert [m["role"] for m in a] == ["system", "user"]
+
+
+def test_compact_profile_keeps_only_parse_relevant_fields():
+    assert compact_profile(PROFILE) == "interests=beach,nightlife;budget=5000-12000;trip=solo"
+    assert compact_profile({"budget": {"max": 9000}}) == "budget=-9000"
+    assert compact_profile(None) == compact_profile({"name": "x"}) == ""
+
+
+def test_messages_fit_the_budget():
+    messages, n_in, max_out = build_parse_messages("  3 nights   in goa\nunder 20k ", PROFILE)
+    assert messages[1]["content"] == "profile:interests=beach,nightlife;budget=5000-12000;trip=solo\nq:3 nights in goa under 20k"
+    assert n_in + max_out <= PARSE_TOKEN_BUDGET
+
+    long_query = "beach resort with pool and spa near the old town " * 40
+    messages, n_in, max_out = build_parse_messages(long_query, PROFILE)
+    assert n_in + max_out <= PARSE_TOKEN_BUDGET
+    assert messages[1]["content"].endswith("\nq:" + " ".join(long_query.split())[:MAX_QUERY_CHARS])
+
+    # too long even without the profile: the query is cut until it fits
+    messages, n_in, max_out = build_parse_messages(long_query, PROFILE, budget=250)
+    assert n_in + max_out <= 250
+    assert messages[1]["content"].startswith("q:beach resort") and len(messages[1]["content"]) < MAX_QUERY_CHARS
+
+
+def test_profile_is_dropped_before_the_query_is_cut():
+    query = "quiet hill station with tea estates and short treks " * 3
+    full, n_full, _ = build_parse_messages(query, PROFILE)
+    assert "profile:" in full[1]["content"]
+    tight = n_full - 5 + 120
+    messages, n_in, max_out = build_parse_messages(query, PROFILE, budget=tight)
+    assert messages[1]["content"] == "q:" + " ".join(query.split())
+    assert n_in + max_out <= tight
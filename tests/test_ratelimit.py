@@ -0,0 +1,80 @@
+import threading
+import time
+
+from ratelimit import PriorityLimiter, TokenBucket
+
+
+def test_bucket_refill_and_pause():
+    b = TokenBucket(rate=2.0, capacity=4)
+    now = b._ts
+    assert b.wait_time(4, now) == 0.0
+    b.take(3, now)
+    assert b.wait_time(2, now) == 0.5        # one token left, two needed, 2 tokens/s
+    assert b.wait_time(10, now) == 1.5       # need is capped at capacity
+    assert b.wait_time(2, now + 100) == 0.0 and b.tokens == 4   # refill stops at capacity
+    b.pause(3.0, now + 100)
+    assert b.wait_time(1, now + 101) == 2.0
+
+
+def test_never_exceeds_rate():
+    limiter = PriorityLimiter({"requests": TokenBucket(rate=50.0, capacity=5)})
+    t0 = time.monotonic()
+    granted = []
+    while time.monotonic() - t0 < 0.3:
+        if limiter.acquire("parse", timeout=0.05):
+            granted.append(time.monotonic() - t0)
+    assert len(granted) <= 5 + 50 * 0.3 + 1
+    assert len(granted) >= 12
+
+
+def test_higher_lane_goes_first():
+    bucket = TokenBucket(rate=20.0, capacity=1)
+    bucket.take(1, time.monotonic())
+    limiter = PriorityLimiter({"requests": bucket}, lanes=("parse", "background"))
+    order = []
+
+    def worker(lane, tag):
+        if limiter.acquire(lane, timeout=2.0):
+            order.append(tag)
+
+    threads = [threading.Thread(target=worker, args=("background", f"bg{i}")) for i in range(3)]
+    for t in threads:
+        t.start()
+    while limiter.depth("background") < 3:
+        time.sleep(0.001)
+    parse = threading.Thread(target=worker, args=("parse", "parse"))
+    parse.start()
+    for t in threads + [parse]:
+        t.join()
+    # at most one background call was already past the gate when the parse arrived
+    assert order.index("parse") <= 1 and len(order) == 4
+
+
+def test_queue_full_and_deadline():
+    bucket = TokenBucket(rate=0.001, capacity=1)
+    bucket.take(1, time.monotonic())
+    limiter = PriorityLimiter({"requests": bucket}, max_queue=1)
+    results = []
+    t = threading.Thread(target=lambda: results.append(limiter.acquire("parse", timeout=0.2)))
+    t.start()
+    while limiter.depth("parse") < 1:
+        time.sleep(0.001)
+    assert limiter.acquire("parse", timeout=1.0) is False     # queue full: refused at once
+    t.join()
+    assert results == [False] and limiter.depth("parse") == 0
+
+
+def test_reserve_keeps_quota_for_interactive_lanes():
+    limiter = PriorityLimiter({"tokens": TokenBucket(rate=0.001, capacity=100)}, lanes=("parse", "background"),
+                              reserve={"background": 0.5})
+    assert limiter.acquire("background", cost={"tokens": 40}, timeout=0)
+    assert not limiter.acquire("background", cost={"tokens": 40}, timeout=0)
+    assert limiter.acquire("parse", cost={"tokens": 40}, timeout=0)
+
+
+def test_backoff_pauses_everyone():
+    limiter = PriorityLimiter({"requests": TokenBucket(rate=100.0, capacity=10)})
+    limiter.backoff(0.2)
+    t0 = time.monotonic()
+    assert limiter.acquire("parse", timeout=1.0)
+    assert time.monotonic() - t0 >= 0.19
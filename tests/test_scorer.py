@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+import scorer
+from scorer import score_item, score_items
+
+TAGS = ["beach", "culture", "adventure", "nightlife", "relax", "food"]
+
+
+def random_case(rng):
+    items = [{"id": f"h{i}", "tags": rng.sample(TAGS, rng.randint(0, 3)), "price": rng.randint(500, 15000),
+              "popularity": rng.random()} for i in range(20)]
+    profile = {"interests": rng.sample(TAGS, rng.randint(0, 3))}
+    if rng.random() < 0.8:
+        profile["budget"] = {"min": rng.randint(0, 2000), "max": rng.randint(3000, 12000)}
+    trips = [{"tags": rng.sample(TAGS, rng.randint(0, 2))} for _ in range(rng.randint(0, 3))]
+    signals = rng.choice([None, {"recentBehaviorMatch": True}, {"search_budget_max": rng.randint(2000, 9000)}])
+    live = rng.choice([None, {f"h{i}": rng.random() for i in range(0, 20, 3)}])
+    return items, profile, trips, signals, live
+
+
+def test_score_items_matches_score_item():
+    rng = random.Random(9)
+    for _ in range(200):
+        items, profile, trips, signals, live = random_case(rng)
+        expected = [score_item(h, profile, signals=signals, user_past_trips=trips, popularity=live) for h in items]
+        assert score_items(items, profile, signals=signals, user_past_trips=trips, popularity=live) == pytest.approx(expected)
+
+
+def test_weights_are_shared(monkeypatch):
+    items, profile, trips, signals, _ = random_case(random.Random(1))
+    monkeypatch.setattr(scorer, "W_TAG", 5.0)
+    monkeypatch.setattr(scorer, "W_RECENCY", 2.0)
+    signals = {"recentBehaviorMatch": True}
+    expected = [score_item(h, profile, signals=signals, user_past_trips=trips) for h in items]
+    assert score_items(items, profile, signals=signals, user_past_trips=trips) == pytest.approx(expected)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import semantic
+from semantic import IVF_MIN_ITEMS, IVFIndex, SemanticIndex, _unit_rows
+from engine import RecommendationEngine
+
+
+def clustered(rng, n, dim=32, centers=60):
+    c = rng.standard_normal((centers, dim))
+    return _unit_rows((c[rng.integers(0, centers, n)] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32))
+
+
+def test_ivf_recall_against_exact_scan():
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, IVF_MIN_ITEMS + 1000)
+    idx = IVFIndex(vectors)
+    assert idx.centroids is not None
+    hits = 0
+    for q in clustered(rng, 50):
+        exact = set(np.argsort(-(vectors @ q))[:10].tolist())
+        hits += len(exact & {i for i, _ in idx.search(q, 10)})
+    assert hits / 500 >= 0.9
+
+
+def test_ivf_updated_keeps_rows_and_finds_new_ones():
+    rng = np.random.default_rng(1)
+    vectors = clustered(rng, IVF_MIN_ITEMS + 500)
+    idx = IVFIndex(vectors)
+    keep = np.flatnonzero(np.arange(len(vectors)) % 10)
+    new = clustered(rng, 100)
+    up = idx.updated(keep, new)
+    assert up.centroids is idx.centroids and up.n == len(keep) + len(new)
+    np.testing.assert_array_equal(up.rows(np.arange(len(keep))), vectors[keep])
+    for j in (0, 42, 99):
+        (top, sim), = up.search(new[j], 1)
+        assert top == len(keep) + j and sim == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.fixture
+def engine():
+    return RecommendationEngine.from_mock_data()
+
+
+def test_updated_reembeds_only_changed_destinations(engine, monkeypatch):
+    monkeypatch.setattr(semantic, "REBUILD_FRACTION", 1.0)
+    before = engine.semantic_index()
+    hotel = engine.catalog.hotels_by_dest["dest_8"][0]
+    other = engine.catalog.hotels_by_dest["dest_6"][0]
+    other_vec = before.indexes["hotel"].rows([before._row["hotel"][other["id"]]])[0]
+    engine.catalog.apply_deltas([{"kind": "hotel", "op": "update", "record": {"id": hotel["id"], "name": "Glacier Ski Lodge"}}])
+    after = engine.semantic_index()
+    assert after is not before and after.version == engine.catalog.version
+    assert after.embedder is before.embedder
+    assert 0 < after.patched < sum(len(v) for v in after.items.values()) / 10
+    assert {h["id"] for h in after.items["hotel"]} == {h["id"] for h in engine.catalog.hotels}
+    np.testing.assert_array_equal(after.indexes["hotel"].rows([after._row["hotel"][other["id"]]])[0], other_vec)
+    assert after.search("glacier ski lodge", "hotel", 1)[0][0]["id"] == hotel["id"]
+    # the old index is untouched for readers still holding it
+    assert before.version < after.version and len(before.items["hotel"]) == len(after.items["hotel"])
+
+
+def test_full_rebuild_after_many_patches(engine, monkeypatch):
+    monkeypatch.setattr(semantic, "REBUILD_FRACTION", 0.0)
+    before = engine.semantic_index()
+    hotel = engine.catalog.hotels[0]
+    engine.catalog.apply_deltas([{"kind": "hotel", "op": "update", "record": {"id": hotel["id"], "price": 1234}}])
+    after = engine.semantic_index()
+    assert after.embedder is not before.embedder and after.patched == 0
+    # the projection tables are built once per process
+    assert after.embedder.proj_dims is before.embedder.proj_dims
+
+
+def test_unchanged_catalog_reuses_index(engine):
+    assert engine.semantic_index() is engine.semantic_index()
+    assert isinstance(engine.semantic_index(), SemanticIndex)
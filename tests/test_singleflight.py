@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def _run_concurrently(flights, n, key, fn):
+    started = threading.Barrier(n)
+    results, errors = [None] * n, [None] * n
+
+    def worker(i):
+        started.wait()
+        try:
+            results[i] = flights.do(key, fn)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def _wait_for_waiters(flights, key, n):
+    while True:
+        with flights._lock:
+            call = flights._calls.get(key)
+            if call is not None and call.waiters >= n:
+                return
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2.0)
+        return {"dest": "Goa", "tags": ["beach"]}
+
+    threads, results, _ = _run_concurrently(flights, 8, "q", fn)
+    _wait_for_waiters(flights, "q", 7)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r == {"dest": "Goa", "tags": ["beach"]} for r in results)
+    assert len({id(r) for r in results}) == 8          # every caller got its own copy
+    assert flights.in_flight() == 0
+    assert flights.do("q", lambda: "fresh") == "fresh"  # nothing is cached afterwards
+
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight("test")
+    release = threading.Event()
+
+    def fn():
+        release.wait(2.0)
+        raise ValueError("boom")
+
+    threads, _, errors = _run_concurrently(flights, 4, "q", fn)
+    _wait_for_waiters(flights, "q", 3)
+    release.set()
+    for t in threads:
+        t.join()
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_aborted_leader_hands_over_to_a_waiter():
+    flights = SingleFlight("test")
+    leader_in = threading.Event()
+    release = threading.Event()
+
+    class Stop(BaseException):
+        pass
+
+    def aborted():
+        leader_in.set()
+        release.wait(2.0)
+        raise Stop()
+
+    def leader():
+        with pytest.raises(Stop):
+            flights.do("q", aborted)
+
+    got = []
+    t1 = threading.Thread(target=leader)
+    t1.start()
+    leader_in.wait(2.0)
+    t2 = threading.Thread(target=lambda: got.append(flights.do("q", lambda: "retried")))
+    t2.start()
+    _wait_for_waiters(flights, "q", 1)
+    release.set()
+    t1.join()
+    t2.join()
+    assert got == ["retried"]
@@ -0,0 +1,69 @@
+import json
+import random
+
+from streaming import IncrementalJSONParser, sse_text_chunks
+
+DOC = {
+    "destination": "Goa, India",
+    "origin": "Delhi",
+    "budget": 25000,
+    "days": 4.5,
+    "flexible": True,
+    "month": None,
+    "tags": ["beach", "nightlife", "food"],
+    "notes": "say \"hi\", {not: a brace}, comma, ok",
+    "filters": {"max_price": [1, 2], "nested": {"a": "}"}},
+    "unicode": "café — नमस्ते",
+}
+
+
+def _feed_in_pieces(text, cuts):
+    p = IncrementalJSONParser()
+    events = []
+    prev = 0
+    for c in sorted(cuts) + [len(text)]:
+        events.extend(p.feed(text[prev:c]))
+        prev = c
+    return p, events
+
+
+def test_random_splits_match_json_loads():
+    rng = random.Random(7)
+    for indent in (None, 2):
+        text = "Here is the JSON:\n```json\n" + json.dumps(DOC, indent=indent, ensure_ascii=False) + "\n```"
+        for _ in range(200):
+            cuts = rng.sample(range(1, len(text)), rng.randint(1, 30))
+            p, events = _feed_in_pieces(text, cuts)
+            assert p.done
+            assert p.fields == DOC
+            assert [k for k, _ in events] == list(DOC)
+
+
+def test_field_reported_as_soon_as_value_completes():
+    p = IncrementalJSONParser()
+    assert p.feed('{"destination": "Go') == []
+    assert p.feed('a", "budget": 12') == [("destination", "Goa")]
+    assert p.feed("00") == []                       # a bare number isn't complete until ',' or '}'
+    assert p.feed(', "tags": ["a"') == [("budget", 1200)]
+    assert p.feed("]}") == [("tags", ["a"])]
+    assert p.done
+    assert p.feed('{"late": 1}') == []
+
+
+def test_lenient_values():
+    p, _ = _feed_in_pieces("{'destination': 'Goa', 'month': None, 'flexible': True}", [5, 17, 30])
+    assert p.fields == {"destination": "Goa", "month": None, "flexible": True}
+
+
+def test_sse_text_chunks():
+    lines = [
+        b"",
+        "data: " + json.dumps({"choices": [{"delta": {"role": "assistant"}}]}),
+        "data: " + json.dumps({"choices": [{"delta": {"content": '{"a":'}}]}),
+        ": keep-alive",
+        "data: not json",
+        ("data: " + json.dumps({"choices": [{"text": " 1}"}]})).encode(),
+        "data: [DONE]",
+        "data: " + json.dumps({"choices": [{"delta": {"content": "after done"}}]}),
+    ]
+    assert list(sse_text_chunks(lines)) == ['{"a":', " 1}"]
@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+
+import tracing
+from concurrency import run_stages
+from tracing import finish_run, span, start_run, traced
+
+
+@traced("work")
+def work(ms):
+    time.sleep(ms / 1000.0)
+    return ms
+
+
+def test_disabled_run_is_a_noop(tmp_path):
+    assert start_run("off", enabled=False) is None
+    with span("anything"):
+        pass
+    assert work(1) == 1 and tracing.current_trace() is None
+    assert finish_run(None, log_path=str(tmp_path / "t.jsonl")) is None
+    assert not (tmp_path / "t.jsonl").exists()
+
+
+def test_spans_aggregate_and_log(tmp_path):
+    trace = start_run("rerun", enabled=True)
+    with span("parse"):
+        time.sleep(0.01)
+    work(5)
+    work(1)
+    log = tmp_path / "trace.jsonl"
+    summary = finish_run(trace, log_path=str(log))
+    assert tracing.current_trace() is None
+    assert summary["run"] == "rerun" and set(summary["stages"]) == {"parse", "work"}
+    w = summary["stages"]["work"]
+    assert w["count"] == 2 and w["max_ms"] >= 5 and w["total_ms"] >= w["max_ms"]
+    assert summary["stages"]["parse"]["total_ms"] >= 10
+    assert json.loads(log.read_text().strip()) == summary
+
+
+def test_concurrent_runs_do_not_mix():
+    out = {}
+
+    def run(name, n):
+        trace = start_run(name, enabled=True)
+        for _ in range(n):
+            with span("step"):
+                pass
+        out[name] = finish_run(trace, log_path=None)
+
+    threads = [threading.Thread(target=run, args=(f"r{i}", i + 1)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert {k: v["stages"]["step"]["count"] for k, v in out.items()} == {"r0": 1, "r1": 2, "r2": 3, "r3": 4}
+
+
+def test_pool_stages_report_into_the_callers_trace():
+    trace = start_run("bundle", enabled=True)
+    run_stages({"a": lambda: work(1), "b": lambda: work(1)}, deadline_s=5.0)
+    summary = finish_run(trace, log_path=None)
+    assert summary["stages"]["work"]["count"] == 2
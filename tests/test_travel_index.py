@@ -0,0 +1,61 @@
+import pytest
+
+from catalog import Catalog
+from poi_index import HotelPOIIndex
+from pois_real import get_pois_map
+
+CITIES = ["Mumbai", "Delhi", "Goa", "Jaipur"]
+
+
+@pytest.fixture
+def catalog():
+    destinations = [{"id": f"dest_{i}", "name": c, "avg_price": 5000, "tags": ["culture"], "seasonality": 0.8}
+                    for i, c in enumerate(CITIES)]
+    hotels = [{"id": f"hotel_{i}", "name": f"Hotel {i}", "destination_id": f"dest_{i % len(CITIES)}",
+               "price": 1000 + 100 * i, "tags": ["wifi"]} for i in range(12)]
+    return Catalog(destinations, hotels, [], [], get_pois_map(destinations, seed=42))
+
+
+def _travel(idx, catalog, dest_id, hotel_id):
+    pois = catalog.pois_map[dest_id]
+    return idx.travel_map(dest_id, hotel_id, [p["id"] for p in pois])
+
+
+def test_nearest_and_within_agree_with_travel_map(catalog):
+    idx = HotelPOIIndex(catalog, k=4)
+    for dest_id, hotels in catalog.hotels_by_dest.items():
+        block = idx.for_destination(dest_id)
+        assert idx.for_destination(dest_id) is block
+        for h in hotels:
+            travel = _travel(idx, catalog, dest_id, h["id"])
+            assert len(travel) == len(catalog.pois_map[dest_id])
+            mins = sorted(t["mins"] for t in travel.values())
+
+            near = block.nearest_pois(h["id"])
+            assert [m for _, m, _ in near] == mins[:4]
+            assert all(travel[p["id"]] == {"mins": m, "cost": c} for p, m, c in near)
+
+            # one radius inside the k-nearest list, one that needs the full row scan
+            for reach in (mins[1], mins[len(mins) // 2]):
+                got = block.within(h["id"], reach)
+                assert [m for _, m, _ in got] == sorted(m for m in mins if m <= reach)
+                assert {p["id"] for p, _, _ in got} == {pid for pid, t in travel.items() if t["mins"] <= reach}
+
+
+def test_travel_is_stable_across_indexes(catalog):
+    a, b = HotelPOIIndex(catalog), HotelPOIIndex(catalog)
+    dest_id = "dest_2"
+    assert _travel(a, catalog, dest_id, "hotel_2") == _travel(b, catalog, dest_id, "hotel_2")
+    assert a.travel_map(dest_id, "no_such_hotel", ["x"]) == {}
+    assert a.for_destination(dest_id).nearest_pois("no_such_hotel") == []
+
+
+def test_delta_drops_only_the_changed_block(catalog):
+    idx = HotelPOIIndex(catalog)
+    kept, changed = idx.for_destination("dest_0"), idx.for_destination("dest_1")
+    catalog.apply_deltas([{"op": "add", "kind": "hotel",
+                           "record": {"id": "hotel_new", "destination_id": "dest_1", "price": 900}}])
+    assert idx.for_destination("dest_0") is kept
+    fresh = idx.for_destination("dest_1")
+    assert fresh is not changed
+    assert _travel(idx, catalog, "dest_1", "hotel_new")
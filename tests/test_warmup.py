@@ -0,0 +1,86 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from warmup import CacheWarmer, log_query, plan_warmup, read_recent
+
+
+class FakeEngine:
+    def __init__(self):
+        self.user_map = {"u1": {"profile": {"interests": ["beach"]}}}
+        self.catalog = SimpleNamespace(dest_map={"dest_1": {}, "dest_2": {}})
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _record(self, *call):
+        with self._lock:
+            self.calls.append(call)
+
+    def parse_search(self, query, lane="interactive"):
+        self._record("parse", query, lane)
+        if query == "boom":
+            raise RuntimeError("parse failed")
+        return {"destination_id": "dest_1"}
+
+    def build_explore_view(self, dest_id, profile, parsed, user_id):
+        self._record("explore", dest_id, user_id)
+
+    def build_itinerary_bundle(self, profile, parsed, user_id):
+        self._record("bundle", parsed["destination_id"], user_id)
+
+
+def test_log_round_trip(tmp_path):
+    path = str(tmp_path / "q.jsonl")
+    log_query("goa beaches", "u1", "dest_1", path=path)
+    log_query(dest_id="dest_2", path=path)
+    log_query(user_id="u1", path=path)            # nothing to record
+    log_query("ignored", path=None)
+    with open(path, "a") as fh:
+        fh.write("not json\n[1, 2]\n")
+    entries = read_recent(path)
+    assert [{k: v for k, v in e.items() if k != "ts"} for e in entries] == [
+        {"query": "goa beaches", "user": "u1", "dest": "dest_1"}, {"dest": "dest_2"}]
+    assert read_recent(str(tmp_path / "missing.jsonl")) == [] and read_recent(None) == []
+
+
+def test_read_recent_drops_the_cut_line(tmp_path):
+    path = tmp_path / "q.jsonl"
+    path.write_text("".join(json.dumps({"query": f"q{i}"}) + "\n" for i in range(100)))
+    tail = read_recent(str(path), max_bytes=50)
+    assert tail and [e["query"] for e in tail] == [f"q{i}" for i in range(100 - len(tail), 100)]
+
+
+def test_plan_ranks_by_count_then_recency():
+    entries = [{"query": "a"}, {"query": "b", "user": "u1", "dest": "d1"}, {"query": "a"},
+               {"query": "c"}, {"user": "u1", "dest": "d1"}, {"query": "b"}, {"query": "c", "user": "u2", "dest": "d2"}]
+    queries, pairs = plan_warmup(entries, top_queries=2, top_pairs=5)
+    assert queries == ["c", "b"]
+    assert pairs == [("u1", "d1", "b"), ("u2", "d2", "c")]
+
+
+def test_warmer_replays_log_into_the_engine(tmp_path):
+    path = str(tmp_path / "q.jsonl")
+    for q, u, d in [("goa", "u1", "dest_1"), ("goa", None, None), ("boom", None, None),
+                    (None, "u1", "dest_2"), (None, "nobody", "dest_1"), (None, "u1", "dest_x")]:
+        log_query(q, u, d, path=path)
+    engine = FakeEngine()
+    warmer = CacheWarmer(engine, path=path, workers=2).start()
+    assert warmer.wait(10)
+    progress = warmer.progress()
+    assert progress["state"] == "done" and progress["stopped"] is None
+    assert progress["total"] == 6 and (progress["done"], progress["failed"], progress["skipped"]) == (5, 1, 0)
+    assert {c for c in engine.calls if c[0] == "parse"} == {("parse", "goa", "background"), ("parse", "boom", "background")}
+    assert sorted(c for c in engine.calls if c[0] != "parse") == [
+        ("bundle", "dest_1", "u1"), ("bundle", "dest_2", "u1"), ("explore", "dest_1", "u1"), ("explore", "dest_2", "u1")]
+
+
+def test_warmer_stops_at_the_time_budget(tmp_path):
+    path = str(tmp_path / "q.jsonl")
+    for i in range(5):
+        log_query(f"q{i}", path=path)
+    engine = FakeEngine()
+    warmer = CacheWarmer(engine, path=path, time_budget_s=0.0).start()
+    assert warmer.wait(10)
+    progress = warmer.progress()
+    assert progress["state"] == "stopped" and progress["stopped"] == "time"
+    assert progress["skipped"] == 5 and engine.calls == []
@@ -0,0 +1,145 @@
+# tracing.py
+"""
+Lightweight per-run stage timing.
+
+    trace = start_run("rerun")          # None when tracing is off
+    with span("parse_search"): ...
+    @traced("filter_flights")
+    def filter_flights(...): ...
+    summary = finish_run(trace)         # also appended to TRACE_LOG_PATH as one JSON line
+
+The active trace lives in a contextvar, so concurrent Streamlit sessions don't mix
+their timings (concurrency.run_stages copies the context into pool threads).
+When no trace is active, span() returns a shared no-op and traced() adds a single
+contextvar lookup per call.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Set TRAVEL_RECO_TRACE=1 to trace every run (the app also traces while "Show parser debug" is on)
+TRACE_ENABLED = os.environ.get("TRAVEL_RECO_TRACE", "") not in ("", "0", "false", "False")
+TRACE_LOG_PATH = os.environ.get("TRAVEL_RECO_TRACE_LOG", "trace_log.jsonl")
+
+_current = contextvars.ContextVar("travel_reco_trace", default=None)
+_log_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.ts = time.time()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            st = self.stages.get(stage)
+            if st is None:
+                self.stages[stage] = {"count": 1, "total_ms": ms, "max_ms": ms}
+            else:
+                st["count"] += 1
+                st["total_ms"] += ms
+                if ms > st["max_ms"]:
+                    st["max_ms"] = ms
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {k: {"count": v["count"], "total_ms": round(v["total_ms"], 3), "max_ms": round(v["max_ms"], 3)}
+                      for k, v in sorted(self.stages.items(), key=lambda kv: -kv[1]["total_ms"])}
+        return {"run": self.name, "ts": int(self.ts), "total_ms": round((time.perf_counter() - self._t0) * 1000.0, 3), "stages": stages}
+
+
+class _Span:
+    __slots__ = ("trace", "name", "t0")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.record(self.name, (time.perf_counter() - self.t0) * 1000.0)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def start_run(name: str = "run", enabled: Optional[bool] = None) -> Optional[Trace]:
+    """Start collecting spans for this run (thread / context). Returns None when disabled."""
+    if enabled is None:
+        enabled = TRACE_ENABLED
+    if not enabled:
+        _current.set(None)
+        return None
+    trace = Trace(name)
+    _current.set(trace)
+    return trace
+
+
+def finish_run(trace: Optional[Trace], log_path: Optional[str] = TRACE_LOG_PATH) -> Optional[Dict[str, Any]]:
+    """Stop the run, append its summary to log_path (if set) and return the summary."""
+    if trace is None:
+        return None
+    if _current.get() is trace:
+        _current.set(None)
+    summary = trace.summary()
+    if log_path:
+        try:
+            line = json.dumps(summary, ensure_ascii=False)
+            with _log_lock:
+                with open(log_path, "a", encoding="utf-8") as fh:
+                    fh.write(line + "\n")
+        except Exception:
+            pass
+    return summary
+
+
+def span(name: str):
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording each call of the function as a span (default name: function name)."""
+    def deco(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.record(stage, (time.perf_counter() - t0) * 1000.0)
+        return wrapper
+    return deco
@@ -0,0 +1,234 @@
+# warmup.py
+"""
+Start-up cache warming from the recent query log.
+
+Front-ends append one JSON line per search / explore / bundle request to
+QUERY_LOG_PATH ({"ts", "query", "user", "dest"}; any of the last three may be
+missing). At start-up CacheWarmer reads the tail of that log, takes the most
+frequent recent queries and (user, destination) pairs, and replays them on a
+small background pool so the engine's parse / explore / itinerary / hotel
+decision caches are populated before the first real users arrive:
+
+    warmer = CacheWarmer(engine).start()     # returns immediately
+    warmer.progress()   # {"state", "done", "total", "skipped", "failed", "elapsed_s", "rss_growth_mb", "stopped"}
+
+Serving is never blocked: parses go through the "background" LLM lane (which
+leaves quota for interactive calls), and warming stops early once
+time_budget_s has passed or the process grew by more than memory_budget_mb.
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import WARMUP_TASKS
+
+# set TRAVEL_RECO_QUERY_LOG= (empty) to stop recording queries
+QUERY_LOG_PATH = os.environ.get("TRAVEL_RECO_QUERY_LOG", "query_log.jsonl")
+# only the last few MB of the log are read at start-up
+QUERY_LOG_TAIL_BYTES = 4 * 1024 * 1024
+
+WARM_TOP_QUERIES = 200
+WARM_TOP_PAIRS = 100
+WARM_WORKERS = 4
+WARM_TIME_BUDGET_S = 120.0
+WARM_MEMORY_BUDGET_MB = 256.0
+
+_log_lock = threading.Lock()
+
+
+def log_query(query: Optional[str] = None, user_id: Optional[str] = None, dest_id: Optional[str] = None,
+              path: Optional[str] = QUERY_LOG_PATH):
+    """Append one request to the query log (no-op without a path or anything to record)."""
+    if not path or not (query or dest_id):
+        return
+    entry = {"ts": int(time.time())}
+    if query:
+        entry["query"] = query
+    if user_id:
+        entry["user"] = user_id
+    if dest_id:
+        entry["dest"] = dest_id
+    try:
+        line = json.dumps(entry, ensure_ascii=False)
+        with _log_lock:
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+    except Exception:
+        pass
+
+
+def read_recent(path: Optional[str] = QUERY_LOG_PATH, max_bytes: int = QUERY_LOG_TAIL_BYTES) -> List[Dict[str, Any]]:
+    """Entries from the last max_bytes of the log, oldest first (unreadable lines are skipped)."""
+    if not path:
+        return []
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(0, os.SEEK_END)
+            size = fh.tell()
+            fh.seek(max(0, size - max_bytes))
+            data = fh.read()
+    except OSError:
+        return []
+    lines = data.decode("utf-8", "replace").splitlines()
+    if size > max_bytes and lines:
+        # the first line was cut in half by the seek
+        lines = lines[1:]
+    entries = []
+    for line in lines:
+        try:
+            e = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(e, dict):
+            entries.append(e)
+    return entries
+
+
+def plan_warmup(entries: List[Dict[str, Any]], top_queries: int = WARM_TOP_QUERIES,
+                top_pairs: int = WARM_TOP_PAIRS) -> Tuple[List[str], List[Tuple[str, str, Optional[str]]]]:
+    """
+    (queries, [(user, dest, query)]): the most frequent queries and (user, destination)
+    pairs, ties going to the most recent. Each pair keeps the last query seen with it,
+    so its explore view is warmed under the same parsed signals the user will send.
+    """
+    q_count, q_last = collections.Counter(), {}
+    p_count, p_last, p_query = collections.Counter(), {}, {}
+    for i, e in enumerate(entries):
+        q = (e.get("query") or "").strip()
+        if q:
+            q_count[q] += 1
+            q_last[q] = i
+        if e.get("user") and e.get("dest"):
+            pair = (e["user"], e["dest"])
+            p_count[pair] += 1
+            p_last[pair] = i
+            if q:
+                p_query[pair] = q
+    queries = sorted(q_count, key=lambda q: (-q_count[q], -q_last[q]))[:top_queries]
+    pairs = sorted(p_count, key=lambda p: (-p_count[p], -p_last[p]))[:top_pairs]
+    return queries, [(u, d, p_query.get((u, d))) for u, d in pairs]
+
+
+def _rss_mb() -> float:
+    """Resident set size of this process in MB (0.0 where it can't be read)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # peak, not current, but good enough as a budget check (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    except Exception:
+        return 0.0
+
+
+class CacheWarmer:
+    def __init__(self, engine, path: Optional[str] = QUERY_LOG_PATH, top_queries: int = WARM_TOP_QUERIES,
+                 top_pairs: int = WARM_TOP_PAIRS, workers: int = WARM_WORKERS,
+                 time_budget_s: float = WARM_TIME_BUDGET_S, memory_budget_mb: float = WARM_MEMORY_BUDGET_MB):
+        self.engine = engine
+        self.path = path
+        self.top_queries = top_queries
+        self.top_pairs = top_pairs
+        self.workers = workers
+        self.time_budget_s = time_budget_s
+        self.memory_budget_mb = memory_budget_mb
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+        self._t0 = None
+        self._rss0 = 0.0
+        self._counts = {"done": 0, "skipped": 0, "failed": 0}
+        self.total = 0
+        self.state = "idle"
+        self.stopped = None      # "time" / "memory" / "stopped" when cut short
+
+    def start(self) -> "CacheWarmer":
+        """Warm in a daemon thread; returns at once."""
+        with self._lock:
+            if self._thread is None:
+                self._t0 = time.monotonic()
+                self._rss0 = _rss_mb()
+                self.state = "running"
+                self._thread = threading.Thread(target=self._run, name="travel-reco-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._halt("stopped")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warming finished (tests / scripts); True if it did within timeout."""
+        return self._finished.wait(timeout)
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = 0.0 if self._t0 is None else time.monotonic() - self._t0
+            return dict(self._counts, state=self.state, total=self.total, elapsed_s=round(elapsed, 3),
+                        rss_growth_mb=round(max(0.0, _rss_mb() - self._rss0), 1) if self._t0 else 0.0,
+                        stopped=self.stopped)
+
+    def _halt(self, reason):
+        with self._lock:
+            if self.stopped is None and not self._finished.is_set():
+                self.stopped = reason
+        self._stop.set()
+
+    def _over_budget(self) -> bool:
+        if self._stop.is_set():
+            return True
+        if time.monotonic() - self._t0 > self.time_budget_s:
+            self._halt("time")
+        elif self.memory_budget_mb and _rss_mb() - self._rss0 > self.memory_budget_mb:
+            self._halt("memory")
+        return self._stop.is_set()
+
+    def _task(self, kind, fn, *args):
+        if self._over_budget():
+            result = "skipped"
+        else:
+            try:
+                fn(*args)
+                result = "done"
+            except Exception:
+                result = "failed"
+        WARMUP_TASKS.inc(kind=kind, result=result)
+        with self._lock:
+            self._counts[result] += 1
+
+    def _parse(self, query):
+        self.engine.parse_search(query, lane="background")
+
+    def _user_dest(self, user_id, dest_id, query):
+        user = self.engine.user_map.get(user_id)
+        if not user or dest_id not in self.engine.catalog.dest_map:
+            return
+        profile = user["profile"]
+        parsed = dict(self.engine.parse_search(query, lane="background")) if query else {}
+        self.engine.build_explore_view(dest_id, profile, parsed, user_id)
+        parsed["destination_id"] = dest_id
+        self.engine.build_itinerary_bundle(profile, parsed, user_id)
+
+    def _run(self):
+        try:
+            queries, pairs = plan_warmup(read_recent(self.path), self.top_queries, self.top_pairs)
+            with self._lock:
+                self.total = len(queries) + len(pairs)
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="travel-reco-warmup") as pool:
+                # parses first: the pair tasks reuse them
+                for f in [pool.submit(self._task, "parse", self._parse, q) for q in queries]:
+                    f.result()
+                for u, d, q in pairs:
+                    pool.submit(self._task, "user_dest", self._user_dest, u, d, q)
+        finally:
+            with self._lock:
+                self.state = "stopped" if self.stopped else "done"
+            self._finished.set()